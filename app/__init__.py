@@ -1,11 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
+import logging
 import os
 import sys
+import time
 from datetime import datetime, timezone
 
 # Add the parent directory to the path so we can import the config module
@@ -17,41 +19,42 @@ jwt = JWTManager()
 migrate = Migrate()
 bcrypt = Bcrypt()  # Add bcrypt instance
 
+logger = logging.getLogger(__name__)
+
 def create_app(config_name='default'):
     """Application factory function"""
-    print("\n=== Creating Flask Application ===")
+    boot_started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
-    print(f"Initialized with config: {config_name}")
     
     # Initialize extensions with app
+    from .utils import log
+    log.init_app(app)  # JSON logs through a queue, one access record per request
+    from .utils.metrics import metrics
+    metrics.init_app(app)  # Per-endpoint latency and SQL counts at /metrics
+    logger.info("Creating application with config %s", config_name)
+    from .utils import db_pool
+    db_pool.init_app(app)  # Pool sizing, pre-ping and recycle for server databases
     db.init_app(app)
     jwt.init_app(app)
     CORS(app, supports_credentials=True)
-    migrate.init_app(app, db)
+    migrate.init_app(app, db, render_as_batch=True)  # batch mode lets SQLite alter tables
     bcrypt.init_app(app)  # Initialize bcrypt
-    print("All extensions initialized")
-
-    # Set up request logging
-    @app.before_request
-    def log_request():
-        print(f"\n=== Incoming Request ===")
-        print(f"Request: {request.method} {request.path} from {request.remote_addr}")
-        if request.headers.get('Authorization'):
-            auth_header = request.headers.get('Authorization')
-            print(f"Auth header: {auth_header[:15]}...")
-    
-    @app.after_request
-    def log_response(response):
-        print(f"Response status: {response.status_code}")
-        return response
+    from .utils.cache import cache
+    cache.init_app(app)  # Response cache for the public catalogue
+    from .utils import revocation
+    revocation.init_app(app)  # In-memory JWT blocklist filter
+    from .utils.email_outbox import outbox
+    outbox.init_app(app)  # Background email delivery
+    from .utils.verification_codes import verification_codes
+    verification_codes.init_app(app)  # Shared password reset codes
+    from .utils import suggest
+    suggest.init_app(app)  # In-memory typeahead index
 
     # Import and register blueprints
-    print("\n=== Registering Blueprints ===")
-    
+    imports_started = time.perf_counter()
     try:
-        print("Importing blueprints...")        
         from .routes.auth import auth_bp
         from .routes.users import users_bp
         from .routes.medications import medications_bp
@@ -63,9 +66,10 @@ def create_app(config_name='default'):
         from .routes.admin import admin_bp
         from .routes.notifications import notifications_bp
         from .routes.mail import mail_bp
+        from .routes.cart import cart_bp
+        imports_seconds = time.perf_counter() - imports_started
         
-        print("All blueprints imported successfully")
-          # Register each blueprint and log it
+        # Register each blueprint
         blueprints = [
             (auth_bp, '/api/auth'),
             (farm_activities_bp, '/api'),
@@ -77,33 +81,32 @@ def create_app(config_name='default'):
             (appointments_bp, '/api'),
             (admin_bp, '/api/admin'),
             (notifications_bp, '/api/notifications'),
-            (mail_bp, '/api/mail')
+            (mail_bp, '/api/mail'),
+            (cart_bp, '/api/cart')
         ]
         
         for blueprint, url_prefix in blueprints:
-            print(f"Registering blueprint: {blueprint.name} with prefix: {url_prefix}")
             app.register_blueprint(blueprint, url_prefix=url_prefix)
-            print(f"Successfully registered {blueprint.name}")
-            
-        print("All blueprints registered successfully")
         
         # Log all registered routes
-        print("\n=== Registered Routes ===")
-        for rule in app.url_map.iter_rules():
-            print(f"{rule.endpoint}: {rule.rule}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for rule in app.url_map.iter_rules():
+                logger.debug("Route %s: %s", rule.endpoint, rule.rule)
             
-    except Exception as e:
-        print(f"\nERROR during blueprint registration: {str(e)}")
-        print("Full traceback:")
-        import traceback
-        print(traceback.format_exc())
+    except Exception:
+        imports_seconds = time.perf_counter() - imports_started
+        logger.exception("Error during blueprint registration")
     
-    # Create token blocklist table if it doesn't exist
-    from .models.user import TokenBlocklist
+    from . import models  # Registers every table with the metadata
+    from .utils import search  # Installs the medication search index on create_all
     
-    # This is the modern approach - create tables with app context
-    with app.app_context():
-        db.create_all()
+    # Production and tests get their schema from migrations / fixtures;
+    # creating it here costs a round trip per table on every boot
+    if app.config['BOOT_CREATE_SCHEMA']:
+        with app.app_context():
+            db.create_all()
+    if not app.testing:
+        app.extensions['suggestions'].warm()
     
     # JWT token error handlers
     @jwt.user_identity_loader
@@ -114,22 +117,19 @@ def create_app(config_name='default'):
     @jwt.user_lookup_loader
     def user_lookup_callback(_jwt_header, jwt_data):
         from .models.user import User
-        identity = jwt_data["sub"]
+        # Identities are stringified ids (see user_identity_lookup). This runs
+        # once per request; flask-jwt-extended caches the result on flask.g and
+        # app.utils.auth.get_current_user() hands it to every later caller
         try:
-            # Try both string and int versions
-            user = User.query.filter_by(id=identity).first()
-            if not user:
-                user = User.query.filter_by(id=int(identity)).first()
-            return user
-        except:
+            return db.session.get(User, int(jwt_data["sub"]))
+        except (TypeError, ValueError):
             return None
     
     # JWT token blocklist
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        jti = jwt_payload["jti"]
-        token = TokenBlocklist.query.filter_by(jti=jti).first()
-        return token is not None
+        from .utils.revocation import get_revocation_cache
+        return get_revocation_cache().is_revoked(jwt_payload["jti"])
     
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -147,4 +147,12 @@ def create_app(config_name='default'):
     def revoked_token_callback(jwt_header, jwt_payload):
         return jsonify({"message": "The token has been revoked", "error": "token_revoked"}), 401
     
+    boot_seconds = time.perf_counter() - boot_started
+    registry = app.extensions['metrics'].registry
+    registry.gauge('app_boot_seconds', 'Time spent in create_app', lambda: boot_seconds)
+    registry.gauge('app_blueprint_import_seconds', 'Time spent importing blueprints', lambda: imports_seconds)
+    logger.info("Application ready in %.0f ms (blueprint imports %.0f ms)",
+                boot_seconds * 1000, imports_seconds * 1000,
+                extra={'boot_ms': round(boot_seconds * 1000, 1), 'import_ms': round(imports_seconds * 1000, 1)})
+    
     return app
\ No newline at end of file
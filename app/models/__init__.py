@@ -2,13 +2,18 @@ from app.models.user import User, TokenBlocklist
 from app.models.animal_meds import AnimalMedication
 from app.models.human_meds import HumanMedication
 from app.models.cart import CartItem, Order, OrderItem
+from app.models.order_stats import DailyOrderStats
 from app.models.farm_activity import FarmActivity
 from app.models.appointment import Appointment
+from app.models.email_outbox import OutboxMessage, OutboxLease
+from app.models.verification_code import VerificationCode
+from app.models.cache_version import CacheVersion
 
 __all__ = [
     'User', 'TokenBlocklist',
     'AnimalMedication',
     'HumanMedication',
-    'CartItem', 'Order', 'OrderItem',
-    'FarmActivity', 'Appointment'
+    'CartItem', 'Order', 'OrderItem', 'DailyOrderStats',
+    'FarmActivity', 'Appointment',
+    'OutboxMessage', 'OutboxLease', 'VerificationCode', 'CacheVersion'
 ]
\ No newline at end of file
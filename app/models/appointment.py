@@ -3,6 +3,10 @@ from datetime import datetime
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # A user's appointments, paged by (created_at, id)
+        db.Index('ix_appointments_user_id_created_at', 'user_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
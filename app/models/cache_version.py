@@ -0,0 +1,11 @@
+from app import db
+
+class CacheVersion(db.Model):
+    """Response cache namespace version, shared by every worker process"""
+    __tablename__ = 'cache_versions'
+
+    key = db.Column(db.String(255), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.key}={self.version}>'
@@ -4,6 +4,12 @@ from datetime import datetime
 class Order(db.Model):
     """Order model"""
     __tablename__ = 'orders'
+    __table_args__ = (
+        # A user's order history, paged by (order_date, id)
+        db.Index('ix_orders_user_id_order_date', 'user_id', 'order_date', 'id'),
+        # Dashboard revenue by date range and status
+        db.Index('ix_orders_order_date_status', 'order_date', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -13,6 +19,8 @@ class Order(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, paid, delivered, cancelled
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # True when placing the order decremented medication stock (released on cancel)
+    stock_reserved = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
     # Relationships
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
@@ -21,8 +29,8 @@ class Order(db.Model):
     def __repr__(self):
         return f'<Order {self.id} - User {self.user_id}>'
     
-    def to_dict(self):
-        """Convert order to dictionary"""
+    def to_dict(self, items=None):
+        """Convert order to dictionary; pass already serialized ``items`` to skip loading them"""
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -32,12 +40,15 @@ class Order(db.Model):
             'status': self.status,
             'order_date': self.order_date.isoformat(),
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'items': [item.to_dict() for item in self.items]
+            'items': items if items is not None else [item.to_dict() for item in self.items]
         }
 
 class OrderItem(db.Model):
     """Order item model"""
     __tablename__ = 'order_items'
+    __table_args__ = (
+        db.Index('ix_order_items_order_id', 'order_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
@@ -62,10 +73,31 @@ class OrderItem(db.Model):
             'quantity': self.quantity,
             'subtotal': self.price * self.quantity
         }
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Same as to_dict, for a mapping of column values (e.g. a bulk insert row)"""
+        return {
+            'id': row['id'],
+            'item_id': row['item_id'],
+            'item_type': row['item_type'],
+            'name': row['name'],
+            'price': row['price'],
+            'quantity': row['quantity'],
+            'subtotal': row['price'] * row['quantity']
+        }
 
 class Cart(db.Model):
     """Cart model"""
     __tablename__ = 'carts'
+    __table_args__ = (
+        # Looking up a user's active cart
+        db.Index('ix_carts_user_id_status', 'user_id', 'status'),
+        # At most one active cart per user, so concurrent first adds share it
+        db.Index('uq_carts_user_id_active', 'user_id', unique=True,
+                 postgresql_where=db.text("status = 'active'"),
+                 sqlite_where=db.text("status = 'active'")),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -83,6 +115,10 @@ class Cart(db.Model):
 class CartItem(db.Model):
     """Cart item model"""
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        # One row per medication per cart; adding again upserts the quantity
+        db.Index('uq_cart_items_cart_medication', 'cart_id', 'medication_id', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey('carts.id'), nullable=False)
@@ -0,0 +1,39 @@
+from app import db
+from datetime import datetime
+
+class OutboxMessage(db.Model):
+    """Email waiting to be delivered by the outbox worker"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # The worker polls for due messages by status and time
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    # Blanked once sent
+    html_content = db.Column(db.Text, nullable=False)
+    text_content = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Earliest next delivery attempt; while 'sending' it is the claim's lease expiry
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} to {self.recipient} ({self.status})>'
+
+
+class OutboxLease(db.Model):
+    """Which process polls the outbox; the holder renews it before it expires"""
+    __tablename__ = 'email_outbox_leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<OutboxLease {self.name} held by {self.holder}>'
@@ -19,16 +19,20 @@ class Category(db.Model):
 class Medication(db.Model):
     """Model for medications (both human and animal)"""
     __tablename__ = 'medications'
+    __table_args__ = (
+        # Catalogue cursor pages are ordered by (created_at, id)
+        db.Index('ix_medications_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     full_details = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
-    stock_quantity = db.Column(db.Integer, default=0)
-    medication_type = db.Column(db.String(20), nullable=False)  # 'human' or 'animal'
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
-    requires_prescription = db.Column(db.Boolean, default=False)
+    price = db.Column(db.Float, nullable=False, index=True)
+    stock_quantity = db.Column(db.Integer, default=0, index=True)
+    medication_type = db.Column(db.String(20), nullable=False, index=True)  # 'human' or 'animal'
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), index=True)
+    requires_prescription = db.Column(db.Boolean, default=False, index=True)
     dosage_instructions = db.Column(db.Text)
     contraindications = db.Column(db.Text)
     side_effects = db.Column(db.Text)
@@ -37,18 +41,23 @@ class Medication(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    images = db.relationship('MedicationImage', backref='medication', lazy=True, cascade='all, delete-orphan')
+    images = db.relationship('MedicationImage', backref='medication', lazy=True, cascade='all, delete-orphan',
+                             order_by='MedicationImage.id')
     
     def get_thumbnail_url(self):
-        """Get the primary image URL or the first available image"""
-        primary_image = MedicationImage.query.filter_by(medication_id=self.id, is_primary=True).first()
-        if primary_image:
-            return primary_image.image_url
+        """Get the primary image URL or the first available image
+        
+        Works on the already loaded ``images`` collection, so callers that
+        eager-load images (see ``selectinload``) pay no extra queries here.
+        """
+        images = self.images
+        for image in images:
+            if image.is_primary:
+                return image.image_url
             
-        # If no primary image, get the first image
-        first_image = MedicationImage.query.filter_by(medication_id=self.id).first()
-        if first_image:
-            return first_image.image_url
+        # If no primary image, use the first image
+        if images:
+            return images[0].image_url
             
         # Default image if none available
         return '/static/images/default_medication.jpg'
@@ -59,6 +68,9 @@ class Medication(db.Model):
 class MedicationImage(db.Model):
     """Model for medication images"""
     __tablename__ = 'medication_images'
+    __table_args__ = (
+        db.Index('ix_medication_images_medication_id_is_primary', 'medication_id', 'is_primary'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     medication_id = db.Column(db.Integer, db.ForeignKey('medications.id'), nullable=False)
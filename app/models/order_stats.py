@@ -0,0 +1,68 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import case, func
+
+class DailyOrderStats(db.Model):
+    """Daily rollup of order counts and revenue for the admin dashboard
+
+    Days are UTC dates, matching order_date (stored with utcnow).
+    """
+    __tablename__ = 'daily_order_stats'
+
+    day = db.Column(db.Date, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)  # Excludes cancelled orders
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DailyOrderStats {self.day}>'
+
+    @classmethod
+    def record_order(cls, order):
+        """Count a newly placed order (call before committing it)"""
+        from app.utils.upsert import upsert_increment
+        upsert_increment(
+            cls,
+            {'day': (order.order_date or datetime.utcnow()).date()},
+            {'order_count': 1, 'cancelled_count': 0, 'revenue': order.total_amount},
+            {'updated_at': datetime.utcnow()}
+        )
+
+    @classmethod
+    def record_cancellation(cls, order):
+        """Move a cancelled order's amount out of its day's revenue"""
+        from app.utils.upsert import upsert_increment
+        upsert_increment(
+            cls,
+            {'day': order.order_date.date()},
+            {'order_count': 0, 'cancelled_count': 1, 'revenue': -order.total_amount},
+            {'updated_at': datetime.utcnow()}
+        )
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole rollup from the orders table (backfill / repair)"""
+        from app.models.cart import Order
+        day = func.date(Order.order_date)
+        rows = db.session.query(
+            day,
+            func.count(Order.id),
+            func.sum(case((Order.status == 'cancelled', 1), else_=0)),
+            func.sum(case((Order.status != 'cancelled', Order.total_amount), else_=0))
+        ).group_by(day).all()
+
+        cls.query.delete()
+        now = datetime.utcnow()
+        for day_value, order_count, cancelled_count, revenue in rows:
+            if isinstance(day_value, str):
+                day_value = datetime.strptime(day_value, '%Y-%m-%d').date()
+            db.session.add(cls(
+                day=day_value,
+                order_count=order_count,
+                cancelled_count=cancelled_count or 0,
+                revenue=revenue or 0.0,
+                updated_at=now
+            ))
+        db.session.commit()
+        return len(rows)
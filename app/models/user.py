@@ -62,7 +62,9 @@ class TokenBlocklist(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(36), nullable=False, index=True)
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Indexed for the overlap window re-read by each revocation refresh
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, index=True)  # When the revoked token would have expired anyway
     
     def __repr__(self):
         return f'<TokenBlocklist {self.jti}>'
\ No newline at end of file
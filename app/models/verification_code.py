@@ -1 +1,17 @@
- 
\ No newline at end of file
+from app import db
+from datetime import datetime
+
+class VerificationCode(db.Model):
+    """Pending password reset code, stored as an HMAC of the code"""
+    __tablename__ = 'verification_codes'
+
+    # One active code per email, looked up by primary key
+    email = db.Column(db.String(120), primary_key=True)
+    code_hash = db.Column(db.String(64), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Indexed for the bulk sweep of expired codes
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<VerificationCode {self.email}>'
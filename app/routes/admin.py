@@ -1,85 +1,88 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import User
 from app.models.medication import Medication
 from app.models.cart import Order
-from datetime import datetime, timedelta
-from sqlalchemy import func
-import traceback
+from app.models.order_stats import DailyOrderStats
+from app.utils.auth import get_current_user
+from app.utils.pagination import cursor_requested, get_limit, keyset_page
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, select
+import logging
+
+logger = logging.getLogger(__name__)
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.before_request
 def before_request():
-    """Log before processing any admin route request"""
-    print(f"\n=== Admin Route Request ===")
-    print(f"Method: {request.method}")
-    print(f"Path: {request.path}")
-    print(f"Headers: {dict(request.headers)}")
-    print(f"Data: {request.get_data()}\n")
+    """Log before processing any admin route request (headers and body are never logged)"""
+    logger.debug("Admin request %s %s", request.method, request.path,
+                 extra={'content_length': request.content_length})
 
 @admin_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 def get_dashboard_data():
     """Get admin dashboard statistics and data"""
-    print("\n=== Starting Admin Dashboard Request ===")
     try:
         # Get the user ID from the JWT token
         user_id = get_jwt_identity()
-        print(f"User ID from token: {user_id}")
         
         # Check if the user is an admin
-        user = User.query.get(user_id)
-        print(f"User found: {user is not None}")
-        if user:
-            print(f"User details - Email: {user.email}, Is admin: {user.is_admin}")
-        
+        user = get_current_user()
         if not user or not user.is_admin:
-            print(f"Admin access denied for user {user_id}")
+            logger.warning("Admin access denied for user %s", user_id)
             return jsonify({'message': 'Admin access required'}), 403
         
         # Calculate dashboard statistics
-        print("Calculating dashboard statistics...")
-        
-        total_products = Medication.query.count()
-        print(f"Total products: {total_products}")
-        
-        total_orders = Order.query.count()
-        print(f"Total orders: {total_orders}")
-        
-        total_users = User.query.filter_by(is_admin=False).count()
-        print(f"Total users: {total_users}")
-        
-        # Calculate today's revenue
-        today = datetime.now().date()
-        print(f"Calculating revenue for date: {today}")
-        
-        todays_orders = Order.query.filter(
-            func.date(Order.order_date) == today,
-            Order.status != 'cancelled'
-        ).all()
-        todays_revenue = sum(order.total_amount for order in todays_orders)
-        print(f"Today's revenue: {todays_revenue}")
-        print(f"Number of orders today: {len(todays_orders)}")
+        # Range predicate on order_date (rather than date(order_date)) so an
+        # index on the column can be used. Orders are stamped with utcnow and
+        # the rollup is keyed by UTC day, so "today" is the UTC date too
+        now = datetime.utcnow()
+        today = now.date()
+        day_start = datetime.combine(today, time.min)
+        day_end = day_start + timedelta(days=1)
+        
+        if current_app.config.get('DASHBOARD_USE_ROLLUP'):
+            # Order totals from the daily rollup maintained by order creation
+            # and cancellation - cost grows with days, not orders
+            total_orders_query = select(func.coalesce(func.sum(DailyOrderStats.order_count), 0))
+            todays_revenue_query = select(DailyOrderStats.revenue).where(DailyOrderStats.day == today)
+        else:
+            total_orders_query = select(func.count(Order.id))
+            todays_revenue_query = select(func.sum(Order.total_amount)).where(
+                Order.order_date >= day_start,
+                Order.order_date < day_end,
+                Order.status != 'cancelled'
+            )
+        
+        # All four statistics in a single round trip
+        total_products, total_orders, total_users, todays_revenue = db.session.query(
+            select(func.count(Medication.id)).scalar_subquery(),
+            total_orders_query.scalar_subquery(),
+            select(func.count(User.id)).where(User.is_admin == False).scalar_subquery(),
+            todays_revenue_query.scalar_subquery()
+        ).one()
+        todays_revenue = todays_revenue or 0
+        logger.debug("Dashboard totals - products: %s, orders: %s, users: %s, revenue today: %s",
+                     total_products, total_orders, total_users, todays_revenue)
         
         # Get recent activities
-        print("Fetching recent activities...")
         recent_activities = []
         
-        # Recent orders (last 7 days)
-        recent_orders = Order.query.filter(
-            Order.order_date >= datetime.now() - timedelta(days=7)
+        # Recent orders (last 7 days) with the customer's name joined in
+        recent_orders = db.session.query(
+            Order.id, Order.order_date, Order.total_amount, User.first_name, User.last_name
+        ).outerjoin(User, User.id == Order.user_id).filter(
+            Order.order_date >= now - timedelta(days=7)
         ).order_by(Order.order_date.desc()).limit(5).all()
         
-        print(f"Found {len(recent_orders)} recent orders")
-        
         for order in recent_orders:
-            user = User.query.get(order.user_id)
-            user_name = f"{user.first_name} {user.last_name}" if user else "Unknown User"
+            user_name = f"{order.first_name} {order.last_name}" if order.first_name is not None else "Unknown User"
             
             # Format time difference
-            time_diff = datetime.now() - order.order_date
+            time_diff = now - order.order_date
             if time_diff < timedelta(hours=1):
                 time_str = f"{time_diff.seconds // 60} minutes ago"
             elif time_diff < timedelta(days=1):
@@ -87,33 +90,28 @@ def get_dashboard_data():
             else:
                 time_str = f"{time_diff.days} days ago"
             
-            activity = {
+            recent_activities.append({
                 'type': 'order',
                 'title': f'New Order #{order.id}',
                 'description': f'Order placed by {user_name} - {time_str}',
                 'time': order.order_date.isoformat(),
                 'amount': order.total_amount
-            }
-            recent_activities.append(activity)
-            print(f"Added activity: {activity}")
+            })
         
-        # Get low stock items
-        print("Checking for low stock items...")
+        # Get low stock items (only the columns the dashboard shows)
         low_stock_threshold = 10
-        low_stock_items = Medication.query.filter(
+        low_stock_items = db.session.query(
+            Medication.id, Medication.name, Medication.stock_quantity
+        ).filter(
             Medication.stock_quantity <= low_stock_threshold
-        ).all()
-        
-        low_stock_data = []
-        for item in low_stock_items:
-            data = {
-                'id': item.id,
-                'name': item.name,
-                'currentStock': item.stock_quantity,
-                'threshold': low_stock_threshold
-            }
-            low_stock_data.append(data)
-            print(f"Added low stock item: {data}")
+        ).order_by(Medication.stock_quantity).all()
+        
+        low_stock_data = [{
+            'id': item.id,
+            'name': item.name,
+            'currentStock': item.stock_quantity,
+            'threshold': low_stock_threshold
+        } for item in low_stock_items]
         
         # Compile all dashboard data
         dashboard_data = {
@@ -125,35 +123,39 @@ def get_dashboard_data():
             'lowStockItems': low_stock_data
         }
         
-        print("Dashboard data compiled successfully")
-        print(f"Returning dashboard data: {dashboard_data}")
         return jsonify(dashboard_data), 200
         
     except Exception as e:
-        print(f"\nERROR in admin dashboard endpoint: {str(e)}")
-        print("Full traceback:")
-        print(traceback.format_exc())
+        logger.exception("Error in admin dashboard endpoint")
         return jsonify({'message': f'An error occurred: {str(e)}'}), 500
 
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 def get_users():
     """Get all users (admin only)"""
-    print("\n=== Starting Admin Users Request ===")
     try:
         # Check if user is admin
         user_id = get_jwt_identity()
-        print(f"User ID from token: {user_id}")
-        
-        user = User.query.get(user_id)
-        print(f"User found: {user is not None}")
+        user = get_current_user()
         
         if not user or not user.is_admin:
-            print(f"Admin access denied for user {user_id}")
+            logger.warning("Admin access denied for user %s", user_id)
             return jsonify({'message': 'Admin access required'}), 403
         
-        users = User.query.filter_by(is_admin=False).all()
-        print(f"Found {len(users)} non-admin users")
+        query = User.query.filter_by(is_admin=False)
+        
+        # Cursor mode: ?after=<cursor>&limit=, ordered by (created_at, id)
+        next_cursor = None
+        if cursor_requested():
+            try:
+                users, next_cursor = keyset_page(
+                    query, User.created_at, User.id,
+                    after=request.args.get('after'), limit=get_limit()
+                )
+            except ValueError:
+                return jsonify({'message': 'Invalid cursor'}), 400
+        else:
+            users = query.all()
         
         user_data = [{
             'id': user.id,
@@ -164,11 +166,10 @@ def get_users():
             'dateJoined': user.created_at.isoformat() if user.created_at else None
         } for user in users]
         
-        print("Successfully compiled user data")
+        if cursor_requested():
+            return jsonify({'users': user_data, 'next_cursor': next_cursor}), 200
         return jsonify(user_data), 200
         
     except Exception as e:
-        print(f"\nERROR in admin users endpoint: {str(e)}")
-        print("Full traceback:")
-        print(traceback.format_exc())
+        logger.exception("Error in admin users endpoint")
         return jsonify({'message': f'An error occurred: {str(e)}'}), 500
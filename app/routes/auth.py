@@ -13,10 +13,16 @@ from marshmallow import ValidationError
 from app import db
 from datetime import datetime, timedelta, timezone
 import bcrypt
+import logging
 import os
 from app.utils.validation import validate_email
 from app.utils.gmail_service import send_password_reset_email, verify_code, clear_verification_code
 from app.utils.error_formatting import format_validation_errors
+from app.utils.auth import get_current_user
+from app.utils.revocation import get_revocation_cache, token_expiry
+
+# Set up logging
+logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -51,14 +57,13 @@ def register():
                 'error': 'Date must be in format YYYY-MM-DD, MM/DD/YYYY, or DD/MM/YYYY'
             }), 400
 
-    print(f"Registration request data: {data}")  # Debug print
-    
     # Get and validate data using UserSchema
     schema = UserSchema()
     try:
         validated_data = schema.load(data)
     except ValidationError as err:
-        print(f"Validation error: {err.messages}")  # Debug print
+        # Field names only: the messages can echo submitted values
+        logger.info("Registration rejected, invalid fields: %s", sorted(err.messages))
         
         # Use the error formatting utility
         formatted_response = format_validation_errors(err.messages)
@@ -89,11 +94,10 @@ def register():
         try:
             from app.utils.gmail_service import send_welcome_email
             send_welcome_email(new_user.email, new_user.first_name)
-            print(f"Welcome email sent to {new_user.email}")
+            logger.info("Welcome email sent to %s", new_user.email)
         except Exception as e:
             # Don't interrupt registration if email fails
-            print(f"Error sending welcome email: {str(e)}")
-            current_app.logger.error(f"Welcome email error: {str(e)}")
+            logger.error("Error sending welcome email to %s: %s", new_user.email, e)
 
         return jsonify({
             'message': 'Registration successful',
@@ -167,7 +171,7 @@ def token_debug():
 def refresh_token():
     """Refresh access token"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -184,12 +188,19 @@ def refresh_token():
         'message': 'Token refreshed successfully'
     }), 200
 
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """Revoke the current access or refresh token"""
+    token = get_jwt()
+    get_revocation_cache().revoke(token['jti'], token_expiry(token))
+    return jsonify({'message': 'Successfully logged out'}), 200
+
 @auth_bp.route('/check-email', methods=['POST'])
 def check_email():
     """Check if email exists in the system"""
     try:
         data = request.get_json()
-        print(f"Check-email request data: {data}")
         
         # Validate input data using PasswordResetRequestSchema
         schema = PasswordResetRequestSchema()
@@ -205,7 +216,7 @@ def check_email():
         user = User.query.filter_by(email=email).first()
         
         if not user:
-            print(f"Email not found: {email}")
+            logger.info("Email not found: %s", email)
             return jsonify({
                 "message": "Email not found",
                 "field_errors": {
@@ -219,11 +230,9 @@ def check_email():
                 "total_errors": 1
             }), 404
         
-        print(f"Email exists: {email}")
         return jsonify({"message": "Email exists"}), 200
     except Exception as e:
-        print(f"Error in check-email: {str(e)}")
-        current_app.logger.error(f"check-email error: {str(e)}")
+        logger.exception("Error in check-email")
         return jsonify({"message": "Internal server error", "error": str(e)}), 500
 
 @auth_bp.route('/request-reset', methods=['POST'])
@@ -293,10 +302,9 @@ def reset_password():
     
     # Verify the code
     try:
-        print(f"Attempting to verify code: '{verification_code}' for email: '{email}'")
         is_valid = verify_code(email, verification_code)
-        print(f"Code verification result: {is_valid}")
         if not is_valid:
+            logger.info("Invalid verification code for %s", email)
             return jsonify({
                 "message": "Invalid verification code",
                 "field_errors": {
@@ -316,7 +324,7 @@ def reset_password():
         
         # Clear the verification code after successful reset
         clear_verification_code(email)
-        print(f"Password reset successful for email: {email}")
+        logger.info("Password reset for %s", email)
         
         return jsonify({"message": "Password reset successful"}), 200
     except Exception as e:
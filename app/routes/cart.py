@@ -3,7 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.cart import Cart, CartItem
 from app.models.medication import Medication
-from app.models.user import User
+from app.utils.upsert import insert_if_absent, upsert_increment
+from sqlalchemy import delete, select, update
 from datetime import datetime
 import logging
 
@@ -12,21 +13,40 @@ logger = logging.getLogger(__name__)
 
 cart_bp = Blueprint('cart', __name__)
 
+def _active_cart_id(user_id):
+    """Subquery selecting the id of the user's active cart"""
+    return select(Cart.id).where(
+        Cart.user_id == user_id, Cart.status == 'active'
+    ).order_by(Cart.id).limit(1).scalar_subquery()
+
+def _parse_quantity(data):
+    """Return the request's quantity as a positive int, or None if invalid"""
+    try:
+        quantity = int(data['quantity'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return quantity if quantity >= 1 else None
+
 @cart_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_cart():
     """Get the current user's cart"""
-    print("🛒 Getting user's cart...")
     user_id = get_jwt_identity()
-    print(f"👤 User ID: {user_id}")
+    logger.debug("Getting cart for user %s", user_id)
 
     try:
-        # Get user's active cart
-        cart = Cart.query.filter_by(user_id=user_id, status='active').first()
-        print(f"🛍️ Cart found: {cart}")
-
-        if not cart:
-            print("📭 No active cart found")
+        # Cart, items and current medication prices in one query
+        rows = db.session.query(
+            Cart.id.label('cart_id'),
+            CartItem.id, CartItem.medication_id, CartItem.quantity,
+            Medication.name, Medication.price
+        ).select_from(Cart).outerjoin(
+            CartItem, CartItem.cart_id == Cart.id
+        ).outerjoin(
+            Medication, Medication.id == CartItem.medication_id
+        ).filter(Cart.id == _active_cart_id(user_id)).order_by(CartItem.id).all()
+
+        if not rows:
             return jsonify({
                 'message': 'No active cart found',
                 'items': [],
@@ -35,87 +55,77 @@ def get_cart():
 
         # Get cart items with medication details
         cart_data = {
-            'id': cart.id,
+            'id': rows[0].cart_id,
             'items': [],
             'total': 0
         }
 
-        for item in cart.items:
-            medication = Medication.query.get(item.medication_id)
-            if medication:
-                item_data = {
-                    'id': item.id,
-                    'medication_id': medication.id,
-                    'name': medication.name,
-                    'price': medication.price,
-                    'quantity': item.quantity,
-                    'subtotal': medication.price * item.quantity
-                }
-                cart_data['items'].append(item_data)
-                cart_data['total'] += item_data['subtotal']
-
-        print(f"✅ Cart data compiled: {cart_data}")
+        for row in rows:
+            if row.name is None:
+                # Empty cart, or the medication no longer exists
+                continue
+            item_data = {
+                'id': row.id,
+                'medication_id': row.medication_id,
+                'name': row.name,
+                'price': row.price,
+                'quantity': row.quantity,
+                'subtotal': row.price * row.quantity
+            }
+            cart_data['items'].append(item_data)
+            cart_data['total'] += item_data['subtotal']
+
         return jsonify(cart_data), 200
 
     except Exception as e:
-        print(f"❌ Error getting cart: {str(e)}")
+        logger.exception("Error getting cart")
         return jsonify({'message': f'Error getting cart: {str(e)}'}), 500
 
 @cart_bp.route('/add', methods=['POST'])
 @jwt_required()
 def add_to_cart():
     """Add an item to the cart"""
-    print("➕ Adding item to cart...")
     user_id = get_jwt_identity()
-    print(f"👤 User ID: {user_id}")
-
     data = request.get_json()
-    print(f"📦 Request data: {data}")
+    logger.debug("Adding to cart for user %s", user_id)
 
     try:
         # Validate required fields
         if not data or 'medication_id' not in data or 'quantity' not in data:
-            print("❌ Missing required fields")
             return jsonify({'message': 'Missing required fields'}), 400
 
-        # Get or create active cart
-        cart = Cart.query.filter_by(user_id=user_id, status='active').first()
-        if not cart:
-            print("🛍️ Creating new cart")
-            cart = Cart(user_id=user_id, status='active')
-            db.session.add(cart)
-            db.session.flush()
+        quantity = _parse_quantity(data)
+        if quantity is None:
+            return jsonify({'message': 'Quantity must be a positive integer'}), 400
 
         # Check if medication exists
-        medication = Medication.query.get(data['medication_id'])
-        if not medication:
-            print(f"❌ Medication not found: {data['medication_id']}")
+        medication_id = db.session.query(Medication.id).filter_by(id=data['medication_id']).scalar()
+        if not medication_id:
+            logger.info("Medication not found: %s", data['medication_id'])
             return jsonify({'message': 'Medication not found'}), 404
 
-        # Check if item already in cart
-        cart_item = CartItem.query.filter_by(
-            cart_id=cart.id,
-            medication_id=data['medication_id']
-        ).first()
-
-        if cart_item:
-            print("📝 Updating existing cart item")
-            cart_item.quantity += data['quantity']
-        else:
-            print("📝 Creating new cart item")
-            cart_item = CartItem(
-                cart_id=cart.id,
-                medication_id=data['medication_id'],
-                quantity=data['quantity']
-            )
-            db.session.add(cart_item)
+        # Get or create the active cart; the partial unique index makes a
+        # concurrent first add reuse the cart the other request created
+        active_cart = db.session.query(Cart.id).filter_by(user_id=user_id, status='active')
+        cart_id = active_cart.scalar()
+        if not cart_id:
+            insert_if_absent(Cart, {'user_id': int(user_id), 'status': 'active'},
+                             ['user_id'], index_where=Cart.status == 'active')
+            cart_id = active_cart.scalar()
+
+        # Insert the item or add to its quantity in one statement
+        upsert_increment(
+            CartItem,
+            {'cart_id': cart_id, 'medication_id': medication_id},
+            {'quantity': quantity},
+            {'updated_at': datetime.utcnow()}
+        )
 
         db.session.commit()
-        print("✅ Item added to cart successfully")
         return jsonify({'message': 'Item added to cart successfully'}), 200
 
     except Exception as e:
-        print(f"❌ Error adding to cart: {str(e)}")
+        logger.exception("Error adding to cart")
         db.session.rollback()
         return jsonify({'message': f'Error adding to cart: {str(e)}'}), 500
 
@@ -123,38 +133,35 @@ def add_to_cart():
 @jwt_required()
 def update_cart_item(item_id):
     """Update cart item quantity"""
-    print(f"📝 Updating cart item {item_id}...")
     user_id = get_jwt_identity()
-    print(f"👤 User ID: {user_id}")
-
     data = request.get_json()
-    print(f"📦 Request data: {data}")
+    logger.debug("Updating cart item %s for user %s", item_id, user_id)
 
     try:
-        if 'quantity' not in data:
-            print("❌ Missing quantity field")
+        if not data or 'quantity' not in data:
             return jsonify({'message': 'Quantity is required'}), 400
 
-        # Get user's active cart
-        cart = Cart.query.filter_by(user_id=user_id, status='active').first()
-        if not cart:
-            print("❌ No active cart found")
-            return jsonify({'message': 'No active cart found'}), 404
-
-        # Find cart item
-        cart_item = CartItem.query.filter_by(id=item_id, cart_id=cart.id).first()
-        if not cart_item:
-            print("❌ Cart item not found")
+        quantity = _parse_quantity(data)
+        if quantity is None:
+            return jsonify({'message': 'Quantity must be a positive integer'}), 400
+
+        # Update the item only if it is in the user's active cart
+        updated = db.session.execute(
+            update(CartItem).where(
+                CartItem.id == item_id,
+                CartItem.cart_id == _active_cart_id(user_id)
+            ).values(quantity=quantity, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            db.session.rollback()
             return jsonify({'message': 'Cart item not found'}), 404
 
-        # Update quantity
-        cart_item.quantity = data['quantity']
         db.session.commit()
-        print("✅ Cart item updated successfully")
         return jsonify({'message': 'Cart item updated successfully'}), 200
 
     except Exception as e:
-        print(f"❌ Error updating cart item: {str(e)}")
+        logger.exception("Error updating cart item")
         db.session.rollback()
         return jsonify({'message': f'Error updating cart item: {str(e)}'}), 500
 
@@ -162,30 +169,26 @@ def update_cart_item(item_id):
 @jwt_required()
 def remove_from_cart(item_id):
     """Remove item from cart"""
-    print(f"🗑️ Removing item {item_id} from cart...")
     user_id = get_jwt_identity()
-    print(f"👤 User ID: {user_id}")
+    logger.debug("Removing cart item %s for user %s", item_id, user_id)
 
     try:
-        # Get user's active cart
-        cart = Cart.query.filter_by(user_id=user_id, status='active').first()
-        if not cart:
-            print("❌ No active cart found")
-            return jsonify({'message': 'No active cart found'}), 404
-
-        # Find and remove cart item
-        cart_item = CartItem.query.filter_by(id=item_id, cart_id=cart.id).first()
-        if not cart_item:
-            print("❌ Cart item not found")
+        # Delete the item only if it is in the user's active cart
+        removed = db.session.execute(
+            delete(CartItem).where(
+                CartItem.id == item_id,
+                CartItem.cart_id == _active_cart_id(user_id)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        if not removed:
+            db.session.rollback()
             return jsonify({'message': 'Cart item not found'}), 404
 
-        db.session.delete(cart_item)
         db.session.commit()
-        print("✅ Item removed from cart successfully")
         return jsonify({'message': 'Item removed from cart successfully'}), 200
 
     except Exception as e:
-        print(f"❌ Error removing from cart: {str(e)}")
+        logger.exception("Error removing from cart")
         db.session.rollback()
         return jsonify({'message': f'Error removing from cart: {str(e)}'}), 500
 
@@ -193,24 +196,21 @@ def remove_from_cart(item_id):
 @jwt_required()
 def clear_cart():
     """Clear all items from cart"""
-    print("🗑️ Clearing cart...")
     user_id = get_jwt_identity()
-    print(f"👤 User ID: {user_id}")
+    logger.debug("Clearing cart for user %s", user_id)
 
     try:
         # Get user's active cart
         cart = Cart.query.filter_by(user_id=user_id, status='active').first()
         if not cart:
-            print("❌ No active cart found")
             return jsonify({'message': 'No active cart found'}), 404
 
         # Remove all items
         CartItem.query.filter_by(cart_id=cart.id).delete()
         db.session.commit()
-        print("✅ Cart cleared successfully")
         return jsonify({'message': 'Cart cleared successfully'}), 200
 
     except Exception as e:
-        print(f"❌ Error clearing cart: {str(e)}")
+        logger.exception("Error clearing cart")
         db.session.rollback()
         return jsonify({'message': f'Error clearing cart: {str(e)}'}), 500
@@ -1,11 +1,47 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models.medication import Category
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from app.models.medication import Category, Medication
+from app.utils.auth import get_current_user
+from app.utils.cache import cache
+from app.utils.conditional import conditional_response
+from app.utils.suggest import get_suggestion_index
 from app import db
+from datetime import datetime
 
 categories_bp = Blueprint('categories', __name__)
 
+def _categories_state(**kwargs):
+    """Validator for the category list
+    
+    Categories have no updated_at of their own, so the (small) category rows
+    are fingerprinted directly; medication counts follow max(updated_at) and
+    the row count of the medications table.
+    """
+    rows = db.session.query(
+        Category.id, Category.name, Category.description, Category.medication_type
+    ).order_by(Category.id).all()
+    last_modified, medication_count = db.session.query(
+        func.max(Medication.updated_at), func.count(Medication.id)
+    ).one()
+    return (last_modified, medication_count, [tuple(row) for row in rows])
+
+def _category_state(category_id):
+    """Validator for a single category and its medications"""
+    category = db.session.query(
+        Category.name, Category.description, Category.medication_type
+    ).filter_by(id=category_id).first()
+    if not category:
+        return None
+    last_modified, medication_count = db.session.query(
+        func.max(Medication.updated_at), func.count(Medication.id)
+    ).filter_by(category_id=category_id).one()
+    return (last_modified, medication_count, tuple(category))
+
 @categories_bp.route('/', methods=['GET'])
+@conditional_response(_categories_state, collection=True)
+@cache.cached('categories')
 def get_all_categories():
     """Get all medication categories with optional filtering"""
     # Get query parameters for filtering
@@ -35,9 +71,13 @@ def get_all_categories():
     return jsonify(result), 200
 
 @categories_bp.route('/<int:category_id>', methods=['GET'])
+@conditional_response(_category_state, collection=True)
+@cache.cached('category', view_arg='category_id')
 def get_category(category_id):
     """Get a specific category by ID"""
-    category = Category.query.get_or_404(category_id)
+    category = Category.query.options(
+        selectinload(Category.medications).selectinload(Medication.images)
+    ).filter_by(id=category_id).first_or_404()
     
     result = {
         'id': category.id,
@@ -59,9 +99,7 @@ def get_category(category_id):
 def create_category():
     """Create a new category (admin only)"""
     # Verify the user is an admin
-    user_id = get_jwt_identity()
-    from app.models.user import User
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user or not user.is_admin:
         return jsonify({'message': 'Admin access required'}), 403
@@ -87,8 +125,11 @@ def create_category():
     )
     
     db.session.add(new_category)
+    cache.invalidate('categories')
     db.session.commit()
     
+    get_suggestion_index().add('category', new_category.id, new_category.name)
+    
     return jsonify({
         'message': 'Category created successfully',
         'category_id': new_category.id
@@ -99,9 +140,7 @@ def create_category():
 def update_category(category_id):
     """Update an existing category (admin only)"""
     # Verify the user is an admin
-    user_id = get_jwt_identity()
-    from app.models.user import User
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user or not user.is_admin:
         return jsonify({'message': 'Admin access required'}), 403
@@ -122,7 +161,21 @@ def update_category(category_id):
             return jsonify({'message': f'Invalid medication_type. Must be one of: {", ".join(valid_types)}'}), 400
         category.medication_type = data['medication_type']
     
+    # Medication responses embed the category name, so bump their updated_at
+    # for the ETag validators and drop their cached responses as well
+    Medication.query.filter_by(category_id=category_id).update(
+        {'updated_at': datetime.utcnow()}, synchronize_session=False)
+    
+    medication_ids = [med_id for (med_id,) in db.session.query(Medication.id).filter_by(category_id=category_id)]
+    cache.invalidate(
+        'categories',
+        f'category:{category_id}',
+        'medications',
+        *[f'medication:{med_id}' for med_id in medication_ids]
+    )
     db.session.commit()
+    if 'name' in data:
+        get_suggestion_index().add('category', category_id, category.name)
     
     return jsonify({'message': 'Category updated successfully'}), 200
 
@@ -131,9 +184,7 @@ def update_category(category_id):
 def delete_category(category_id):
     """Delete a category (admin only)"""
     # Verify the user is an admin
-    user_id = get_jwt_identity()
-    from app.models.user import User
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user or not user.is_admin:
         return jsonify({'message': 'Admin access required'}), 403
@@ -150,6 +201,9 @@ def delete_category(category_id):
     
     # Delete the category
     db.session.delete(category)
+    cache.invalidate('categories', f'category:{category_id}')
     db.session.commit()
     
+    get_suggestion_index().remove('category', category_id)
+    
     return jsonify({'message': 'Category deleted successfully'}), 200
\ No newline at end of file
@@ -4,15 +4,35 @@ from app.models.farm_activity import FarmActivity
 from app.models.appointment import Appointment
 from datetime import datetime
 from app.utils.auth import token_required
+from app.utils.cache import cache
+from app.utils.conditional import conditional_response
+from app.utils.pagination import cursor_requested, get_limit, keyset_page
+from sqlalchemy import func
+import logging
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('farm_activities', __name__)
 
+def _activities_state(**kwargs):
+    return tuple(db.session.query(func.max(FarmActivity.updated_at), func.count(FarmActivity.id)).one())
+
+def _activity_state(id):
+    row = db.session.query(FarmActivity.updated_at).filter_by(id=id).first()
+    return tuple(row) if row else None
+
+# Farm activities are only changed by the populate scripts, so their cached
+# responses are bounded by CACHE_DEFAULT_TIMEOUT rather than invalidated
 @bp.route('/farm-activities', methods=['GET'])
+@conditional_response(_activities_state, collection=True)
+@cache.cached('farm_activities')
 def get_farm_activities():
     activities = FarmActivity.query.all()
     return jsonify([activity.to_dict() for activity in activities])
 
 @bp.route('/farm-activities/<int:id>', methods=['GET'])
+@conditional_response(_activity_state)
+@cache.cached('farm_activity', view_arg='id')
 def get_farm_activity(id):
     activity = FarmActivity.query.get_or_404(id)
     return jsonify(activity.to_dict())
@@ -20,19 +40,12 @@ def get_farm_activity(id):
 @bp.route('/appointments', methods=['POST'])
 @token_required
 def create_appointment(current_user):
-    print('\n=== APPOINTMENT REQUEST RECEIVED ===')
-    print(f'User ID: {current_user.id}')
-    print('Request data:', request.json)
-    print('----------------------------------')
     data = request.get_json()
     
     # Validate required fields
     required_fields = ['farm_activity_id', 'appointment_date', 'appointment_time']
-    print('Validating required fields:', required_fields)
     if not all(field in data for field in required_fields):
-        print('Validation failed - missing fields:', [field for field in required_fields if field not in data])
         return jsonify({'message': 'Missing required fields'}), 400
-    print('All required fields present')
     
     # Get the farm activity to calculate total amount
     activity = FarmActivity.query.get_or_404(data['farm_activity_id'])
@@ -46,15 +59,10 @@ def create_appointment(current_user):
         total_amount=activity.price
     )
     
-    print('Creating appointment in database:', {
-        'user_id': current_user.id,
-        'activity_id': data['farm_activity_id'],
-        'date': data['appointment_date'],
-        'time': data['appointment_time']
-    })
     db.session.add(appointment)
     db.session.commit()
-    print('Appointment successfully created with ID:', appointment.id)
+    logger.info("Appointment %s created for activity %s", appointment.id, data['farm_activity_id'],
+                extra={'user_id': current_user.id})
     
     return jsonify(appointment.to_dict()), 201
 
@@ -78,5 +86,21 @@ def process_payment(current_user, id):
 @bp.route('/appointments/user', methods=['GET'])
 @token_required
 def get_user_appointments(current_user):
-    appointments = Appointment.query.filter_by(user_id=current_user.id).all()
+    query = Appointment.query.filter_by(user_id=current_user.id)
+    
+    # Cursor mode: ?after=<cursor>&limit=, ordered by (created_at, id)
+    if cursor_requested():
+        try:
+            appointments, next_cursor = keyset_page(
+                query, Appointment.created_at, Appointment.id,
+                after=request.args.get('after'), limit=get_limit()
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
+        return jsonify({
+            'appointments': [appointment.to_dict() for appointment in appointments],
+            'next_cursor': next_cursor
+        })
+    
+    appointments = query.all()
     return jsonify([appointment.to_dict() for appointment in appointments])
\ No newline at end of file
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app
-from app.utils.gmail_service import send_password_reset_email, generate_verification_code, store_verification_code
+from app.utils.gmail_service import send_password_reset_email, generate_verification_code, verify_code
 from app.models.user import User
 from app.utils.validation import validate_email
 import os
@@ -37,16 +37,15 @@ def send_reset():
         # Log password reset attempt
         current_app.logger.info(f"Sending password reset email to {email}")
         
-        # Send password reset email and get the generated code
-        result = send_password_reset_email(user.email, user.first_name)
-          # For easier debugging, include the verification code in the response during development
-        # In production, this should be removed for security
-        from app.utils.gmail_service import verification_codes
+        # Send password reset email with a code generated here
+        code = generate_verification_code()
+        result = send_password_reset_email(user.email, user.first_name, code=code)
+        
+        # For easier debugging, include the verification code in the response
+        # outside production
         debug_info = {}
-        if email in verification_codes:
-            # Always include the code in non-production environments
-            # You can add additional checks if needed
-            debug_info = {"code": verification_codes[email]['code']}
+        if current_app.debug or current_app.testing:
+            debug_info = {"code": code}
         
         if result:
             return jsonify({
@@ -83,7 +82,6 @@ def verify_reset_code():
             return jsonify({"message": "Invalid email or verification code"}), 400
         
         # Verify the code
-        from app.utils.gmail_service import verify_code
         if verify_code(email, code):
             return jsonify({"message": "Verification successful"}), 200
         else:
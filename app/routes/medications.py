@@ -1,72 +1,172 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload, selectinload
 from app.models.medication import Medication, Category, MedicationImage
+from app.utils.auth import get_current_user
+from app.utils.cache import cache
+from app.utils.conditional import conditional_response
+from app.utils.facets import facet_counts
+from app.utils.pagination import cursor_requested, get_limit, keyset_page, wants_total
+from app.utils.search import apply_search
+from app.utils.suggest import get_suggestion_index
 from app import db
+from datetime import datetime
 
 medications_bp = Blueprint('medications', __name__)
 
+def invalidate_medication_cache(medication_id, *category_ids):
+    """Drop cached catalogue responses that include the given medication (before commit)"""
+    cache.invalidate(
+        'medications',
+        f'medication:{medication_id}',
+        'categories',
+        *[f'category:{category_id}' for category_id in set(category_ids) if category_id]
+    )
+
+def _catalogue_state(**kwargs):
+    """Validator for the listing: any write touches a medication's updated_at"""
+    return tuple(db.session.query(func.max(Medication.updated_at), func.count(Medication.id)).one())
+
+def _medication_state(medication_id):
+    """Validator for a single medication"""
+    row = db.session.query(Medication.updated_at).filter_by(id=medication_id).first()
+    return tuple(row) if row else None
+
+def _categories_state(**kwargs):
+    """Validator for the bare category list (a handful of rows)"""
+    rows = db.session.query(
+        Category.id, Category.name, Category.description, Category.medication_type
+    ).order_by(Category.id).all()
+    return (None, [tuple(row) for row in rows])
+
+def _flag_arg(name):
+    """Read a boolean query parameter: True, False, or None when absent"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    return value.lower() in ('true', '1', 'yes')
+
+def _medication_summary(med):
+    """Format a medication for the listing (expects category and images loaded)"""
+    return {
+        'id': med.id,
+        'name': med.name,
+        'description': med.description,
+        'price': med.price,
+        'stock_quantity': med.stock_quantity,
+        'medication_type': med.medication_type,
+        'category_id': med.category_id,
+        'category_name': med.category.name if med.category else None,
+        'requires_prescription': med.requires_prescription,
+        'thumbnail_url': med.get_thumbnail_url(),
+        'images': [{
+            'id': img.id,
+            'url': img.image_url,
+            'is_primary': img.is_primary
+        } for img in med.images],
+        'created_at': med.created_at.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
 @medications_bp.route('/', methods=['GET'])
+@conditional_response(_catalogue_state, collection=True)
+@cache.cached('medications')
 def get_medications():
     """Get all medications with optional filtering"""
     # Get query parameters for filtering
     category_id = request.args.get('category_id', type=int)
     medication_type = request.args.get('type')  # 'human' or 'animal'
     search_query = request.args.get('q')
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    in_stock = _flag_arg('in_stock')
+    requires_prescription = _flag_arg('requires_prescription')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    # Base query
-    query = Medication.query
-    
     # Apply filters if provided
+    query = Medication.query.order_by(Medication.id)
     if category_id:
         query = query.filter_by(category_id=category_id)
     if medication_type:
         query = query.filter_by(medication_type=medication_type)
+    if min_price is not None:
+        query = query.filter(Medication.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Medication.price <= max_price)
+    if in_stock is not None:
+        query = query.filter(Medication.stock_quantity > 0 if in_stock else Medication.stock_quantity <= 0)
+    if requires_prescription:
+        query = query.filter(Medication.requires_prescription.is_(True))
+    elif requires_prescription is not None:
+        # Rows predating the column default may hold NULL, which counts as OTC
+        query = query.filter(or_(Medication.requires_prescription.is_(False),
+                                 Medication.requires_prescription.is_(None)))
     if search_query:
-        query = query.filter(Medication.name.ilike(f'%{search_query}%'))
-    
-    # Paginate results
-    paginated_medications = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    # Format response
-    medications = []
-    for med in paginated_medications.items:
-        # Get medication images
-        images = []
-        for img in med.images:
-            images.append({
-                'id': img.id,
-                'url': img.image_url,
-                'is_primary': img.is_primary
-            })
-            
-        medications.append({
-            'id': med.id,
-            'name': med.name,
-            'description': med.description,
-            'price': med.price,
-            'stock_quantity': med.stock_quantity,
-            'medication_type': med.medication_type,
-            'category_id': med.category_id,
-            'category_name': med.category.name if med.category else None,
-            'requires_prescription': med.requires_prescription,
-            'thumbnail_url': med.get_thumbnail_url(),
-            'images': images,
-            'created_at': med.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        })
+        # Cursors follow (created_at, id), which would drop the rank order
+        if cursor_requested():
+            return jsonify({'message': 'Search results are paged with page/per_page, not cursors'}), 400
+        # Full-text match on name, category, description and dosage, best first
+        query = apply_search(query, search_query)
     
-    return jsonify({
-        'medications': medications,
+    # ?facets=true adds counts per facet over all filtered rows (one query)
+    facets = facet_counts(query) if _flag_arg('facets') else None
+    
+    # Load each page's categories (joined) and images (one extra SELECT ... IN
+    # for the whole page) up front to avoid per-row lazy loads
+    query = query.options(
+        joinedload(Medication.category),
+        selectinload(Medication.images)
+    )
+    
+    # Cursor mode: ?after=<cursor>&limit=, ordered by (created_at, id)
+    if cursor_requested():
+        try:
+            items, next_cursor = keyset_page(
+                query, Medication.created_at, Medication.id,
+                after=request.args.get('after'), limit=get_limit()
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
+        
+        result = {
+            'medications': [_medication_summary(med) for med in items],
+            'next_cursor': next_cursor
+        }
+        if facets is not None:
+            result['facets'] = facets
+        return jsonify(result), 200
+    
+    # Paginate results (?count=false skips the COUNT(*) query)
+    paginated_medications = query.paginate(page=page, per_page=per_page, error_out=False, count=wants_total())
+    
+    result = {
+        'medications': [_medication_summary(med) for med in paginated_medications.items],
         'total': paginated_medications.total,
         'pages': paginated_medications.pages,
         'current_page': paginated_medications.page
+    }
+    if facets is not None:
+        result['facets'] = facets
+    return jsonify(result), 200
+
+@medications_bp.route('/suggest', methods=['GET'])
+def suggest_medications():
+    """Typeahead suggestions of medication and category names, served from memory"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 25)
+    return jsonify({
+        'suggestions': get_suggestion_index().suggest(request.args.get('q', ''), limit=limit)
     }), 200
 
 @medications_bp.route('/<int:medication_id>', methods=['GET'])
+@conditional_response(_medication_state)
+@cache.cached('medication', view_arg='medication_id')
 def get_medication(medication_id):
     """Get a specific medication by ID"""
-    medication = Medication.query.get_or_404(medication_id)
+    medication = Medication.query.options(
+        joinedload(Medication.category),
+        selectinload(Medication.images)
+    ).filter_by(id=medication_id).first_or_404()
     
     # Get all images for this medication
     images = []
@@ -100,6 +200,8 @@ def get_medication(medication_id):
     return jsonify(result), 200
 
 @medications_bp.route('/categories', methods=['GET'])
+@conditional_response(_categories_state)
+@cache.cached('categories')
 def get_categories():
     """Get all medication categories"""
     categories = Category.query.all()
@@ -120,9 +222,7 @@ def get_categories():
 def create_medication():
     """Create a new medication (admin only)"""
     # Verify the user is an admin
-    user_id = get_jwt_identity()
-    from app.models.user import User
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user or not user.is_admin:
         return jsonify({'message': 'Admin access required'}), 403
@@ -152,7 +252,7 @@ def create_medication():
     )
     
     db.session.add(new_medication)
-    db.session.commit()
+    db.session.flush()  # To get the medication ID
     
     # Handle images if provided
     if 'images' in data and isinstance(data['images'], list):
@@ -163,8 +263,10 @@ def create_medication():
                 is_primary=img_data.get('is_primary', False)
             )
             db.session.add(image)
-        
-        db.session.commit()
+    
+    invalidate_medication_cache(new_medication.id, new_medication.category_id)
+    db.session.commit()
+    get_suggestion_index().add('medication', new_medication.id, new_medication.name)
     
     return jsonify({
         'message': 'Medication created successfully',
@@ -176,15 +278,14 @@ def create_medication():
 def update_medication(medication_id):
     """Update an existing medication (admin only)"""
     # Verify the user is an admin
-    user_id = get_jwt_identity()
-    from app.models.user import User
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user or not user.is_admin:
         return jsonify({'message': 'Admin access required'}), 403
     
     # Find the medication
     medication = Medication.query.get_or_404(medication_id)
+    previous_category_id = medication.category_id
     
     data = request.get_json()
     
@@ -213,8 +314,10 @@ def update_medication(medication_id):
         medication.side_effects = data['side_effects']
     if 'storage_instructions' in data:
         medication.storage_instructions = data['storage_instructions']
-    
-    db.session.commit()
+    if 'images' in data:
+        # Image rows have no timestamp of their own; bump the medication so
+        # ETag validators built on updated_at see the change
+        medication.updated_at = datetime.utcnow()
     
     # Handle images if provided - this is a simplified approach
     # For a more complete solution, you'd want to handle adding, updating, and removing specific images
@@ -230,8 +333,11 @@ def update_medication(medication_id):
                 is_primary=img_data.get('is_primary', False)
             )
             db.session.add(image)
-        
-        db.session.commit()
+    
+    invalidate_medication_cache(medication_id, previous_category_id, medication.category_id)
+    db.session.commit()
+    if 'name' in data:
+        get_suggestion_index().add('medication', medication_id, medication.name)
     
     return jsonify({'message': 'Medication updated successfully'}), 200
 
@@ -240,9 +346,7 @@ def update_medication(medication_id):
 def delete_medication(medication_id):
     """Delete a medication (admin only)"""
     # Verify the user is an admin
-    user_id = get_jwt_identity()
-    from app.models.user import User
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user or not user.is_admin:
         return jsonify({'message': 'Admin access required'}), 403
@@ -254,7 +358,11 @@ def delete_medication(medication_id):
     MedicationImage.query.filter_by(medication_id=medication_id).delete()
     
     # Delete the medication
+    category_id = medication.category_id
     db.session.delete(medication)
+    invalidate_medication_cache(medication_id, category_id)
     db.session.commit()
     
+    get_suggestion_index().remove('medication', medication_id)
+    
     return jsonify({'message': 'Medication deleted successfully'}), 200
\ No newline at end of file
@@ -1,19 +1,20 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from app.utils.gmail_service import send_welcome_email, send_password_reset_email, send_order_confirmation
 from app.utils.validation import validate_email
-import traceback
+import logging
 import os
 
+# Set up logging
+logger = logging.getLogger(__name__)
+
 notifications_bp = Blueprint('notifications', __name__)
 
 @notifications_bp.route('/welcome-email', methods=['POST'])
 def send_welcome():
-    print("\n=== Welcome Email Request ===")
     data = request.get_json()
-    print(f"Request data: {data}")
     
     if not data or not data.get('email') or not data.get('name'):
-        print("Error: Missing email or name")
+        logger.info("Welcome email request without email or name")
         return jsonify({"message": "Email and name are required"}), 400
     
     email = data['email']
@@ -21,29 +22,24 @@ def send_welcome():
     
     # Validate email
     if not validate_email(email):
-        print(f"Error: Invalid email format: {email}")
+        logger.info("Welcome email request with invalid email: %s", email)
         return jsonify({"message": "Invalid email format"}), 400
     
     try:
-        print(f"Sending welcome email to {email}")
         send_welcome_email(email, name)
-        print("Welcome email sent successfully")
+        logger.info("Welcome email sent to %s", email)
         return jsonify({"message": "Welcome email sent successfully"}), 200
-    except Exception as e:
-        print(f"Error sending welcome email: {str(e)}")
-        print(traceback.format_exc())
-        current_app.logger.error(f"Error sending welcome email: {str(e)}")
+    except Exception:
+        logger.exception("Error sending welcome email to %s", email)
         return jsonify({"message": "Failed to send welcome email"}), 500
 
 @notifications_bp.route('/password-reset', methods=['POST'])
 def send_reset():
-    print("\n=== Password Reset Email Request ===")
     try:
         data = request.get_json()
-        print(f"Request data: {data}")
         
         if not data or not data.get('email'):
-            print("Error: Missing email")
+            logger.info("Password reset email request without email")
             return jsonify({"message": "Email is required"}), 400
         
         email = data['email']
@@ -51,47 +47,34 @@ def send_reset():
         
         # Validate email
         if not validate_email(email):
-            print(f"Error: Invalid email format: {email}")
+            logger.info("Password reset email request with invalid email: %s", email)
             return jsonify({"message": "Invalid email format"}), 400
         
         try:
-            print(f"Sending password reset email to {email}")
-            verification_code = data.get('verification_code')
-            if verification_code:
-                print(f"Using provided verification code: {verification_code}")
-            
             # For local development, simply log the email sending attempt
+            # (never the verification code)
             if os.environ.get('FLASK_ENV') == 'development':
-                print("\n=== DEVELOPMENT MODE: Password Reset Email ===")
-                print(f"To: {email}")
-                print(f"Verification Code: {verification_code or 'Generated by system'}")
-                print("=== End Development Mode Email ===\n")
+                logger.info("Development mode: password reset email to %s not sent", email)
                 return jsonify({"message": "Password reset email sent successfully (development mode)"}), 200
             
             # For production, try to send the actual email
             send_password_reset_email(email, name)
-            print("Password reset email sent successfully")
+            logger.info("Password reset email sent to %s", email)
             return jsonify({"message": "Password reset email sent successfully"}), 200
         except Exception as e:
-            print(f"Error sending password reset email: {str(e)}")
-            print(traceback.format_exc())
-            current_app.logger.error(f"Error sending password reset email: {str(e)}")
+            logger.exception("Error sending password reset email to %s", email)
             return jsonify({"message": "Failed to send password reset email", "error": str(e)}), 500
     except Exception as e:
-        print(f"Global error in password reset endpoint: {str(e)}")
-        print(traceback.format_exc())
-        current_app.logger.error(f"Global error in password reset endpoint: {str(e)}")
+        logger.exception("Error in password reset email endpoint")
         return jsonify({"message": "Internal server error", "error": str(e)}), 500
 
 @notifications_bp.route('/order-confirmation', methods=['POST'])
 def send_order_conf():
-    print("\n=== Order Confirmation Email Request ===")
     try:
         data = request.get_json()
-        print(f"Request data: {data}")
         
         if not data or not data.get('email') or not data.get('order_details'):
-            print("Error: Missing email or order details")
+            logger.info("Order confirmation request without email or order details")
             return jsonify({"message": "Email and order details are required"}), 400
         
         email = data['email']
@@ -99,43 +82,35 @@ def send_order_conf():
         
         # Validate email
         if not validate_email(email):
-            print(f"Error: Invalid email format: {email}")
+            logger.info("Order confirmation request with invalid email: %s", email)
             return jsonify({"message": "Invalid email format"}), 400
         
         # Validate order_details
         required_fields = ['customer_name', 'order_id', 'total', 'items']
         for field in required_fields:
             if field not in order_details:
-                print(f"Error: Missing required field in order details: {field}")
+                logger.info("Order confirmation request missing %s", field)
                 return jsonify({"message": f"Missing required field in order details: {field}"}), 400
         
         try:
-            print(f"Sending order confirmation email to {email}")
-            
             # For local development, simply log the email sending attempt
             if os.environ.get('FLASK_ENV') == 'development':
-                print("\n=== DEVELOPMENT MODE: Order Confirmation Email ===")
-                print(f"To: {email}")
-                print(f"Order ID: {order_details['order_id']}")
-                print(f"Total: ${order_details['total']}")
-                print("=== End Development Mode Email ===\n")
+                logger.info("Development mode: confirmation of order %s to %s not sent",
+                            order_details['order_id'], email)
                 return jsonify({"message": "Order confirmation email sent successfully (development mode)"}), 200
             
             # For production, send the actual email
             send_order_confirmation(email, order_details)
-            print("Order confirmation email sent successfully")
+            logger.info("Order confirmation email sent to %s", email)
             return jsonify({"message": "Order confirmation email sent successfully"}), 200
         except Exception as e:
-            print(f"Error sending order confirmation email: {str(e)}")
-            print(traceback.format_exc())
-            current_app.logger.error(f"Error sending order confirmation email: {str(e)}")
+            logger.exception("Error sending order confirmation email to %s", email)
             return jsonify({"message": "Failed to send order confirmation email", "error": str(e)}), 500
     except Exception as e:
-        print(f"Global error in order confirmation endpoint: {str(e)}")
-        print(traceback.format_exc())
-        current_app.logger.error(f"Global error in order confirmation endpoint: {str(e)}")
+        logger.exception("Error in order confirmation email endpoint")
         return jsonify({"message": "Internal server error", "error": str(e)}), 500
 
+
 @notifications_bp.route('/health-check', methods=['GET'])
 def health_check():
     """Simple health check endpoint to verify API connectivity"""
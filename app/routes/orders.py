@@ -2,36 +2,78 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import User
-from app.models.cart import Order, OrderItem
+from app.models.cart import Cart, CartItem, Order, OrderItem
+from app.models.medication import Medication
+from app.models.order_stats import DailyOrderStats
+from app.utils.auth import get_current_user
+from app.utils.conditional import conditional_response
+from app.utils.inventory import (
+    InsufficientStock, load_products, reserve_stock, reserve_cart_stock, release_stock, invalidate_stock_cache
+)
+from app.utils.pagination import cursor_requested, get_limit, keyset_page
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.orm import selectinload
 from datetime import datetime
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
 orders_bp = Blueprint('orders', __name__)
 
+def _orders_state(**kwargs):
+    """Validator for the current user's order list"""
+    return tuple(db.session.query(
+        func.max(Order.updated_at), func.count(Order.id)
+    ).filter(Order.user_id == get_jwt_identity()).one())
+
+def _order_state(order_id):
+    """Validator for one of the current user's orders"""
+    row = db.session.query(Order.updated_at).filter(
+        Order.id == order_id, Order.user_id == get_jwt_identity()
+    ).first()
+    return tuple(row) if row else None
+
 @orders_bp.route('/', methods=['GET'])
 @jwt_required()
+@conditional_response(_orders_state, private=True, collection=True)
 def get_orders():
     """Get all orders for the current user"""
     # Get the user ID from the JWT token
     user_id = get_jwt_identity()
     
-    # Find the user in the database
-    user = User.query.get(user_id)
+    # The user was already loaded while verifying the token
+    user = get_current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
     
-    # Get all orders for this user
-    user_orders = Order.query.filter_by(user_id=user_id).all()
+    # Orders for this user, with all their items loaded in one extra query
+    query = Order.query.options(selectinload(Order.items)).filter_by(user_id=user_id)
+    
+    # Cursor mode: ?after=<cursor>&limit=, ordered by (order_date, id)
+    if cursor_requested():
+        try:
+            user_orders, next_cursor = keyset_page(
+                query, Order.order_date, Order.id,
+                after=request.args.get('after'), limit=get_limit()
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
+        
+        return jsonify({
+            'orders': [order.to_dict() for order in user_orders],
+            'next_cursor': next_cursor
+        }), 200
     
     # Convert to JSON response
     orders = []
-    for order in user_orders:
+    for order in query.all():
         orders.append(order.to_dict())
-    print(orders)
     return jsonify({'orders': orders}), 200
 
 @orders_bp.route('/<int:order_id>', methods=['GET'])
 @jwt_required()
+@conditional_response(_order_state, private=True)
 def get_order(order_id):
     """Get a specific order"""
     # Get the user ID from the JWT token
@@ -54,80 +96,198 @@ def create_order():
     """Create a new order"""
     # Get the user ID from the JWT token
     user_id = get_jwt_identity()
-    print(f"⭐ Backend: Received order creation request from user ID: {user_id}")
     
-    # Find the user in the database
-    user = User.query.get(user_id)
+    # The user was already loaded while verifying the token
+    user = get_current_user()
     if not user:
-        print(f"❌ Backend: User not found for ID: {user_id}")
+        logger.warning("Order creation for unknown user %s", user_id)
         return jsonify({'message': 'User not found'}), 404
     
     # Get data from request
     data = request.get_json()
-    print(f"📦 Backend: Order data received: {data}")
     
     # Validate required fields
     if not data or 'items' not in data or not data['items']:
-        print("❌ Backend: Missing items in order data")
         return jsonify({'message': 'Order must contain at least one item'}), 400
     
-    if 'total_amount' not in data:
-        print("❌ Backend: Missing total_amount in order data")
-        return jsonify({'message': 'Total amount is required'}), 400
-    
     if 'payment_method' not in data:
-        print("❌ Backend: Missing payment_method in order data")
         return jsonify({'message': 'Payment method is required'}), 400
     
     if 'delivery_address' not in data:
-        print("❌ Backend: Missing delivery_address in order data")
         return jsonify({'message': 'Delivery address is required'}), 400
     
+    # Total quantity per product, used to reserve stock
+    quantities = {}
+    for item_data in data['items']:
+        try:
+            product_id = int(item_data['product_id'])
+            quantity = int(item_data['quantity'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'message': 'Each item needs a product_id and quantity'}), 400
+        if quantity < 1:
+            return jsonify({'message': 'Item quantity must be at least 1'}), 400
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    
+    # Current names and prices come from the database, not the client
+    products = load_products(quantities)
+    missing = sorted(set(quantities) - set(products))
+    if missing:
+        return jsonify({
+            'message': 'Some products could not be found',
+            'missing_product_ids': missing
+        }), 400
+    
     try:
         # Create new order
         order = Order(
             user_id=user_id,
-            total_amount=data['total_amount'],
+            total_amount=round(sum(products[pid].price * qty for pid, qty in quantities.items()), 2),
             payment_method=data['payment_method'],
             shipping_address=data['delivery_address'],
             status='pending',
-            order_date=datetime.utcnow()
+            order_date=datetime.utcnow(),
+            stock_reserved=True
         )
         
-        # Add order items
+        # Save to database, taking the stock and counting the order in the
+        # dashboard rollup in the same transaction
+        db.session.add(order)
+        db.session.flush()
+        
+        # Insert all lines in bulk instead of one ORM object each
+        now = datetime.utcnow()
+        rows = []
         for item_data in data['items']:
-            # Extract item info
-            product_id = item_data['product_id']
-            product_type = item_data.get('type', 'medication')  # Default type
-            name = item_data.get('name', f'Product {product_id}')  # Default name
-            
-            print(f"📦 Backend: Creating order item: {name}, type: {product_type}, id: {product_id}")
-            
-            order_item = OrderItem(
-                item_id=product_id,  # Changed from product_id to item_id
-                item_type=product_type,  # Changed from product_type to item_type
-                name=name,
-                price=item_data['price'],
-                quantity=item_data['quantity']
-            )
-            order.items.append(order_item)
+            product = products[int(item_data['product_id'])]
+            rows.append({
+                'order_id': order.id,
+                'item_id': product.id,
+                'item_type': item_data.get('type', 'medication'),  # Default type
+                'name': product.name,
+                'price': product.price,
+                'quantity': int(item_data['quantity']),
+                'created_at': now
+            })
+        # One multi-row INSERT ... RETURNING; rows come back in id order
+        inserted = db.session.execute(
+            insert(OrderItem).returning(
+                OrderItem.id, OrderItem.item_id, OrderItem.item_type,
+                OrderItem.name, OrderItem.price, OrderItem.quantity
+            ),
+            rows
+        ).all()
         
-        # Save to database
-        db.session.add(order)
-        db.session.commit()
+        reserve_stock(quantities, products)
+        DailyOrderStats.record_order(order)
         
-        print(f"✅ Backend: Order created successfully with ID: {order.id}")
-        print(f"✅ Backend: Order details: {order.to_dict()}")
+        # Serialize once, from the values just written, before commit expires them
+        order_data = order.to_dict(items=[
+            OrderItem.row_to_dict(row._mapping) for row in sorted(inserted, key=lambda row: row.id)
+        ])
+        invalidate_stock_cache(quantities, [product.category_id for product in products.values()])
+        db.session.commit()
         
-        return jsonify({
-            'message': 'Order created successfully',
-            'order': order.to_dict()
-        }), 201
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'message': str(e), 'shortages': e.shortages}), 409
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Backend: Error creating order: {str(e)}")
+        logger.exception("Error creating order")
         return jsonify({'message': f'Error creating order: {str(e)}'}), 500
+    
+    logger.info("Order %s created with %s items", order_data['id'], len(rows), extra={'user_id': user_id})
+    
+    return jsonify({
+        'message': 'Order created successfully',
+        'order': order_data
+    }), 201
+
+@orders_bp.route('/checkout', methods=['POST'])
+@jwt_required()
+def checkout():
+    """Turn the current user's active cart into an order"""
+    user_id = get_jwt_identity()
+    data = request.get_json() or {}
+    
+    if 'payment_method' not in data:
+        return jsonify({'message': 'Payment method is required'}), 400
+    
+    if 'delivery_address' not in data:
+        return jsonify({'message': 'Delivery address is required'}), 400
+    
+    cart_id = db.session.query(Cart.id).filter_by(
+        user_id=user_id, status='active'
+    ).order_by(Cart.id).limit(1).scalar()
+    if not cart_id:
+        return jsonify({'message': 'No active cart found'}), 404
+    
+    try:
+        # Claim the cart; a concurrent checkout of the same cart matches no row
+        now = datetime.utcnow()
+        claimed = db.session.execute(
+            update(Cart).where(Cart.id == cart_id, Cart.status == 'active')
+            .values(status='completed', updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return jsonify({'message': 'Cart is already being checked out'}), 409
+        
+        order = Order(
+            user_id=user_id,
+            total_amount=0,
+            payment_method=data['payment_method'],
+            shipping_address=data['delivery_address'],
+            status='pending',
+            order_date=now,
+            stock_reserved=True
+        )
+        db.session.add(order)
+        db.session.flush()
+        
+        # Copy the cart into order_items, priced from medications, in one statement
+        line_count = db.session.execute(
+            insert(OrderItem).from_select(
+                ['order_id', 'item_id', 'item_type', 'name', 'price', 'quantity', 'created_at'],
+                select(
+                    literal(order.id), Medication.id, literal('medication'),
+                    Medication.name, Medication.price, CartItem.quantity, literal(now)
+                ).join(Medication, Medication.id == CartItem.medication_id)
+                .where(CartItem.cart_id == cart_id).order_by(CartItem.id)
+            )
+        ).rowcount
+        if not line_count:
+            db.session.rollback()
+            return jsonify({'message': 'Cart is empty'}), 400
+        
+        reserve_cart_stock(cart_id, line_count)
+        
+        lines = db.session.query(OrderItem, Medication.category_id).join(
+            Medication, Medication.id == OrderItem.item_id
+        ).filter(OrderItem.order_id == order.id).order_by(OrderItem.id).all()
+        order.total_amount = round(sum(item.price * item.quantity for item, _ in lines), 2)
+        DailyOrderStats.record_order(order)
+        
+        order_data = order.to_dict(items=[item.to_dict() for item, _ in lines])
+        invalidate_stock_cache(
+            [item.item_id for item, _ in lines],
+            [category_id for _, category_id in lines]
+        )
+        db.session.commit()
+        
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'message': str(e), 'shortages': e.shortages}), 409
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error during checkout: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': 'Order created successfully',
+        'order': order_data
+    }), 201
 
 @orders_bp.route('/<int:order_id>/cancel', methods=['POST'])
 @jwt_required()
@@ -149,16 +309,32 @@ def cancel_order(order_id):
     if order.status != 'pending':
         return jsonify({'message': f'Cannot cancel order with status {order.status}'}), 400
     
-    # Update order status
+    # Update order status; the conditional UPDATE lets only one of several
+    # concurrent cancellations through
     try:
-        order.status = 'cancelled'
-        db.session.commit()
+        cancelled = db.session.execute(
+            update(Order).where(Order.id == order.id, Order.status == 'pending')
+            .values(status='cancelled', updated_at=datetime.utcnow())
+        ).rowcount
+        if not cancelled:
+            db.session.rollback()
+            return jsonify({'message': 'Order is no longer pending'}), 409
         
-        return jsonify({
-            'message': 'Order cancelled successfully',
-            'order': order.to_dict()
-        }), 200
+        quantities = {}
+        if order.stock_reserved:
+            for item in order.items:
+                quantities[item.item_id] = quantities.get(item.item_id, 0) + item.quantity
+            release_stock(quantities)
+        DailyOrderStats.record_cancellation(order)
+        if quantities:
+            invalidate_stock_cache(quantities)
+        db.session.commit()
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'message': f'Error cancelling order: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'message': f'Error cancelling order: {str(e)}'}), 500
+    
+    return jsonify({
+        'message': 'Order cancelled successfully',
+        'order': order.to_dict()
+    }), 200
@@ -1,7 +1,8 @@
 from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app.models.medication import Category, Medication, MedicationImage
-from app.models.user import User
+from app.utils.auth import get_current_user
+from app.utils.cache import cache
 from app import db
 
 seed_bp = Blueprint('seed', __name__)
@@ -11,8 +12,7 @@ seed_bp = Blueprint('seed', __name__)
 def seed_initial_data():
     """Seed the database with initial categories and medications (admin only)"""
     # Verify the user is an admin
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = get_current_user()
     
     if not user or not user.is_admin:
         return jsonify({'message': 'Admin access required'}), 403
@@ -182,6 +182,8 @@ def seed_initial_data():
             )
             db.session.add(image)
         
+        # Everything in the catalogue may have changed
+        cache.clear()
         db.session.commit()
         
         return jsonify({
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from app import db
 from app.models import User
 from app.schemas import UserSchema
 from app.utils import validate_data
+from app.utils.auth import get_current_user
 
 user_bp = Blueprint('user', __name__)
 
@@ -11,8 +12,7 @@ user_bp = Blueprint('user', __name__)
 @jwt_required()
 def get_user_profile():
     """Get current user profile"""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = get_current_user()
     
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -24,8 +24,7 @@ def get_user_profile():
 @jwt_required()
 def update_user_profile():
     """Update current user profile"""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
+    user = get_current_user()
     
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request, get_jwt
-from app.models.user import User
+from app.utils.auth import get_current_user
 from app import db
 
 users_bp = Blueprint('users', __name__)
@@ -14,11 +14,8 @@ def get_profile():
         user_id = get_jwt_identity()
         current_app.logger.info(f"User ID from token: {user_id}")
         
-        # Find the user in the database
-        user = User.query.filter_by(id=user_id).first()
-        if not user and isinstance(user_id, str) and user_id.isdigit():
-            # Try with int if string version doesn't work
-            user = User.query.filter_by(id=int(user_id)).first()
+        # The user was already loaded while verifying the token
+        user = get_current_user()
         
         if not user:
             current_app.logger.error(f"User not found with ID: {user_id}")
@@ -76,11 +73,8 @@ def debug_profile():
 @jwt_required()
 def update_profile():
     """Update the current user's profile information"""
-    # Get the user ID from the JWT token
-    user_id = get_jwt_identity()
-    
-    # Find the user in the database
-    user = User.query.filter_by(id=user_id).first()
+    # The user was already loaded while verifying the token
+    user = get_current_user()
     
     if not user:
         return jsonify({'message': 'User not found'}), 404
@@ -1,16 +1,23 @@
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-from functools import wraps
-from app.models import User
+from flask_jwt_extended import get_current_user as _get_jwt_user, verify_jwt_in_request
+
+def get_current_user():
+    """
+    Return the User for the current request's JWT
+    
+    The user is loaded once per request by the JWT user_lookup_loader and
+    cached on flask.g, so decorators and handlers can all call this freely.
+    Must be called after the JWT has been verified (e.g. inside @jwt_required).
+    """
+    return _get_jwt_user()
 
 def token_required(fn):
     """Decorator to verify JWT token and get current user"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        current_user = User.query.get(user_id)
+        current_user = get_current_user()
         
         if not current_user:
             return jsonify(message="Invalid token"), 401
@@ -24,12 +31,11 @@ def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_current_user()
         
         if not user or not user.is_admin:
             return jsonify(message="Admin privileges required"), 403
         
         return fn(*args, **kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,318 @@
+"""
+Server-side response cache for the public catalogue endpoints
+
+Entries are keyed by namespace, route and normalized query string. Each
+namespace (e.g. ``medications`` for the listing, ``medication:5`` for one
+detail view) carries a version number that is part of every key, so
+invalidating a namespace is a single version bump: stale entries simply
+become unreachable and age out of the backend.
+
+The version numbers must be shared by every worker process, or a write
+handled by one worker leaves the others serving stale responses. The
+``memory`` backend is therefore refused when WEB_CONCURRENCY > 1; use
+``database`` (entries cached per process, versions in the database) or
+``redis`` there.
+
+Invalidate before committing the write that made the responses stale. The
+``database`` backend writes the version bumps in that same transaction (one
+statement however many namespaces); the others apply them once it commits,
+so no worker can re-cache the old data under the new version.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request
+from sqlalchemy import event
+
+
+class MemoryBackend:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        # Version counters live outside the LRU so they are never evicted
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def incr_many(self, *keys):
+        for key in keys:
+            self.incr(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+
+class DatabaseBackend(MemoryBackend):
+    """
+    In-process LRU for entries, with namespace versions in the database
+
+    Entries stay local to each worker, but every lookup reads the current
+    versions (one primary-key query), so an invalidation made by any worker
+    is seen by all of them on their next request. Version bumps join the
+    caller's transaction and are only committed here when there is none.
+    """
+
+    transactional = True
+
+    def _is_counter(self, key):
+        return key == '__generation__' or key.endswith(':version')
+
+    def get(self, key):
+        if self._is_counter(key):
+            return self.get_many(key)[0]
+        return super().get(key)
+
+    def get_many(self, *keys):
+        from app import db
+        from app.models.cache_version import CacheVersion
+        counters = [key for key in keys if self._is_counter(key)]
+        versions = {}
+        if counters:
+            versions = dict(db.session.query(CacheVersion.key, CacheVersion.version)
+                            .filter(CacheVersion.key.in_(counters)))
+        return [versions.get(key) if self._is_counter(key) else super(DatabaseBackend, self).get(key)
+                for key in keys]
+
+    def incr(self, key):
+        self.incr_many(key)
+        return self.get_many(key)[0]
+
+    def incr_many(self, *keys):
+        from app import db
+        from app.models.cache_version import CacheVersion
+        from app.utils.upsert import upsert_increment_many
+        standalone = not db.session().in_transaction()
+        upsert_increment_many(CacheVersion, [{'key': key} for key in keys], {'version': 1})
+        if standalone:
+            db.session.commit()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+        self.incr_many('__generation__')
+
+
+class RedisBackend:
+    """
+    Backend for any client exposing the redis-py ``get``/``set``/``delete``/``incr`` API
+
+    Values are stored as JSON so a real Redis server and a local stand-in
+    (e.g. a dict-backed fake in tests) behave the same way.
+    """
+
+    def __init__(self, client, prefix='winal:cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        return json.loads(raw)
+
+    def get_many(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def incr(self, key):
+        return int(self.client.incr(self.prefix + key))
+
+    def incr_many(self, *keys):
+        for key in keys:
+            self.incr(key)
+
+    def clear(self):
+        # Bumping the global generation orphans every entry without a key scan
+        self.incr('__generation__')
+
+
+class NullBackend:
+    """Backend that never stores anything (caching disabled)"""
+
+    def get(self, key):
+        return None
+
+    def get_many(self, *keys):
+        return [None] * len(keys)
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def incr(self, key):
+        return 0
+
+    def incr_many(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class ResponseCache:
+    """Flask extension caching whole GET responses per namespace"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend=None):
+        app.config.setdefault('CACHE_TYPE', 'memory')
+        app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_REDIS_URL', None)
+
+        if backend is None:
+            backend = self._create_backend(app.config)
+        app.extensions['response_cache'] = backend
+
+    @staticmethod
+    def _create_backend(config):
+        cache_type = config['CACHE_TYPE']
+        if cache_type == 'memory':
+            if int(os.environ.get('WEB_CONCURRENCY') or 1) > 1:
+                raise ValueError("CACHE_TYPE 'memory' is per process and would serve stale responses "
+                                 "with WEB_CONCURRENCY > 1; use 'database' or 'redis'")
+            return MemoryBackend(max_entries=config['CACHE_MAX_ENTRIES'])
+        if cache_type == 'database':
+            return DatabaseBackend(max_entries=config['CACHE_MAX_ENTRIES'])
+        if cache_type == 'redis':
+            # Optional dependency, only needed when Redis is configured
+            import redis
+            return RedisBackend(redis.Redis.from_url(config['CACHE_REDIS_URL']))
+        if cache_type == 'null':
+            return NullBackend()
+        raise ValueError(f'Unknown CACHE_TYPE: {cache_type}')
+
+    @property
+    def backend(self):
+        return current_app.extensions['response_cache']
+
+    def _version(self, namespace):
+        generation, version = self.backend.get_many('__generation__', f'{namespace}:version')
+        generation, version = generation or 0, version or 0
+        return f'{generation}.{version}'
+
+    def _make_key(self, namespace):
+        # Normalize the query string so ?b=2&a=1 and ?a=1&b=2 share an entry
+        query = urlencode(sorted(request.args.items(multi=True)))
+        return f'{namespace}:v{self._version(namespace)}:{request.path}?{query}'
+
+    def cached(self, namespace, view_arg=None, timeout=None):
+        """
+        Cache successful GET responses of a view
+
+        Args:
+            namespace (str): Invalidation namespace for the view
+            view_arg (str, optional): View argument appended to the namespace,
+                e.g. ``medication_id`` gives one namespace per medication
+            timeout (int, optional): TTL in seconds, defaults to CACHE_DEFAULT_TIMEOUT
+        """
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if request.method != 'GET':
+                    return fn(*args, **kwargs)
+
+                full_namespace = namespace
+                if view_arg is not None:
+                    full_namespace = f'{namespace}:{kwargs[view_arg]}'
+
+                key = self._make_key(full_namespace)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    response = current_app.response_class(
+                        entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                response = current_app.make_response(fn(*args, **kwargs))
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self.backend.set(key, {
+                        'body': response.get_data(as_text=True),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype
+                    }, timeout or current_app.config['CACHE_DEFAULT_TIMEOUT'])
+                response.headers['X-Cache'] = 'MISS'
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def _apply(self, change):
+        """Run a version change in the current transaction, or after it commits"""
+        from app import db
+        if getattr(self.backend, 'transactional', False) or not db.session().in_transaction():
+            change()
+        else:
+            event.listen(db.session(), 'after_commit', lambda session: change(), once=True)
+
+    def invalidate(self, *namespaces):
+        """Invalidate every cached response in the given namespaces (call before commit)"""
+        backend = self.backend
+        keys = [f'{namespace}:version' for namespace in dict.fromkeys(namespaces)]
+        self._apply(lambda: backend.incr_many(*keys))
+
+    def clear(self):
+        """Invalidate every cached response (call before commit)"""
+        self._apply(self.backend.clear)
+
+
+cache = ResponseCache()
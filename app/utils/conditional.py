@@ -0,0 +1,78 @@
+"""
+Conditional GET support (ETag / If-None-Match and Last-Modified / If-Modified-Since)
+
+Views are wrapped with a validator: a cheap function, usually a single
+aggregate query such as ``max(updated_at)`` plus row counts, whose result
+changes whenever the response body would. When the client already holds
+the current version the view is never called and a bodiless 304 is sent.
+
+Collections are validated by ETag only: deleting a row does not advance
+``max(updated_at)``, so a Last-Modified date would let a client revalidating
+with If-Modified-Since keep a list that still shows the deleted row. Their
+validators include the row count, which the ETag covers.
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import current_app, request
+
+
+def _as_utc(value):
+    """Treat naive datetimes (stored via datetime.utcnow) as UTC, drop microseconds"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def conditional_response(validator, private=False, collection=False):
+    """
+    Answer 304 Not Modified when the client's cached copy is still current
+
+    Args:
+        validator (callable): Called with the view arguments; returns a tuple
+            whose first element is the last-modified datetime (or None) and
+            whose remaining elements fingerprint the response, or None to skip
+            validation (e.g. the resource does not exist)
+        private (bool): Mark responses as cacheable by the client only, for
+            per-user data such as orders
+        collection (bool): The response lists rows that can be deleted; send
+            and honour the ETag only
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            state = validator(**kwargs)
+            if state is None:
+                return fn(*args, **kwargs)
+
+            last_modified = None if collection else state[0]
+            fingerprint = repr((request.full_path, state)).encode('utf-8')
+            etag = hashlib.sha1(fingerprint).hexdigest()
+            if last_modified is not None:
+                last_modified = _as_utc(last_modified)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = (
+                    last_modified is not None
+                    and request.if_modified_since is not None
+                    and last_modified <= request.if_modified_since
+                )
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache' if private else 'no-cache'
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,145 @@
+"""
+Connection pool sizing and instrumentation for server databases
+
+For PostgreSQL (and any other non-SQLite URL) the engine gets a bounded
+QueuePool sized from the gunicorn concurrency of this process: one
+connection per request thread plus one for the background threads (email
+outbox, suggestion rebuilds, blocklist purge), with a little overflow.
+When DB_MAX_CONNECTIONS is set, the per-worker pool is capped so that all
+WEB_CONCURRENCY workers together stay under the provider's connection limit.
+
+Connections are pinged before use and recycled before providers drop idle
+ones, so an idle period no longer surfaces as a failed request. Each
+PostgreSQL session gets a statement timeout.
+
+The pool reports checkout time (including any wait for a free connection)
+and timeouts, and its occupancy is exposed as gauges on /metrics.
+
+Pooled connections must not cross fork(): a preloading server calls
+``dispose_after_fork`` in each worker so it opens its own.
+"""
+import os
+import time
+from flask import current_app, has_app_context
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Seconds; checkouts are usually sub-millisecond unless the pool is exhausted
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout takes"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            _record('db_pool_timeouts_total', None)
+            raise
+        finally:
+            _record('db_pool_checkout_seconds', time.perf_counter() - started)
+
+
+def _record(name, value):
+    if not has_app_context() or 'metrics' not in current_app.extensions:
+        return
+    registry = current_app.extensions['metrics'].registry
+    if value is None:
+        registry.counter(name, 'Connection checkouts that timed out waiting for the pool').inc()
+    else:
+        registry.histogram(name, 'Time to check a connection out of the pool', CHECKOUT_BUCKETS).observe(value)
+
+
+def _int_setting(config, name, environ_name=None, default=None):
+    value = config.get(name)
+    if value is None and environ_name:
+        value = os.environ.get(environ_name)
+    return int(value) if value not in (None, '') else default
+
+
+def pool_sizes(config):
+    """
+    Per-process (pool_size, max_overflow) for the configured concurrency
+
+    Reads DB_POOL_SIZE / DB_MAX_OVERFLOW when set, otherwise sizes from
+    GUNICORN_THREADS, then caps the total at DB_MAX_CONNECTIONS divided by
+    WEB_CONCURRENCY workers.
+    """
+    threads = _int_setting(config, 'GUNICORN_THREADS', 'GUNICORN_THREADS', 1)
+    workers = _int_setting(config, 'WEB_CONCURRENCY', 'WEB_CONCURRENCY', 1)
+
+    pool_size = _int_setting(config, 'DB_POOL_SIZE', default=threads + 1)
+    max_overflow = _int_setting(config, 'DB_MAX_OVERFLOW', default=max(2, threads // 2))
+
+    max_connections = _int_setting(config, 'DB_MAX_CONNECTIONS')
+    if max_connections:
+        per_worker = max(1, max_connections // max(1, workers))
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URL"""
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if not uri or uri.startswith('sqlite'):
+        # SQLite picks its own pool per URL type; none of this applies
+        return {}
+
+    pool_size, max_overflow = pool_sizes(config)
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if uri.startswith('postgresql'):
+        options['connect_args'] = {
+            'connect_timeout': config['DB_CONNECT_TIMEOUT'],
+            'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}",
+        }
+    return options
+
+
+def dispose_after_fork(app):
+    """Forget connections inherited from the parent process (call in a forked worker)"""
+    from app import db
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's sockets alone
+            engine.dispose(close=False)
+
+
+def _pool_gauge(read):
+    def callback():
+        from app import db
+        pool = db.engine.pool
+        # SQLite's pools don't track occupancy
+        return read(pool) if isinstance(pool, QueuePool) else 0
+    return callback
+
+
+def init_app(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS (call before db.init_app)"""
+    app.config.setdefault('DB_POOL_TIMEOUT', 10)
+    app.config.setdefault('DB_POOL_RECYCLE', 280)
+    app.config.setdefault('DB_POOL_PRE_PING', True)
+    app.config.setdefault('DB_CONNECT_TIMEOUT', 10)
+    app.config.setdefault('DB_STATEMENT_TIMEOUT_MS', 15000)
+
+    options = engine_options(app.config)
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS entries win
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    if 'metrics' in app.extensions:
+        registry = app.extensions['metrics'].registry
+        registry.gauge('db_pool_checked_out', 'Connections currently checked out',
+                       _pool_gauge(lambda pool: pool.checkedout()))
+        registry.gauge('db_pool_size', 'Configured pool size', _pool_gauge(lambda pool: pool.size()))
+        registry.gauge('db_pool_overflow', 'Connections open beyond pool_size',
+                       _pool_gauge(lambda pool: max(0, pool.overflow())))
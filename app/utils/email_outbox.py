@@ -0,0 +1,322 @@
+"""
+Persistent email outbox
+
+HTTP handlers enqueue rendered emails into the ``email_outbox`` table and
+return immediately. A background thread in each serving process (started
+when a gunicorn worker boots, or on the first request) or a separate
+``flask drain-outbox`` process delivers them through the transport with
+retries and exponential backoff.
+
+Only the process holding the poller lease (a row in ``email_outbox_leases``
+renewed every poll) polls for due messages, so messages left over from a
+restart are picked up without N workers all polling. The others only check
+whether the lease has lapsed, and drain right away when they enqueue
+something themselves.
+
+Messages are claimed with a conditional UPDATE that also sets a lease, so
+several workers never send the same message twice and a message claimed
+by a worker that died is picked up again once the lease expires.
+
+Bodies can hold password reset codes, so they are blanked once a message is
+sent, and sent or failed rows are deleted after EMAIL_OUTBOX_RETENTION_DAYS
+(checked by ``drain()`` every EMAIL_OUTBOX_PURGE_SECONDS, or by
+``flask purge-outbox``).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.email_outbox import OutboxLease, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def gmail_transport(to, subject, html_content, text_content=None):
+    """Deliver one message through the Gmail API; returns True on success"""
+    from app.utils.gmail_service import send_email
+    return send_email(to, subject, html_content, text_content)
+
+
+class _OutboxState:
+    """Per-app transport, worker thread and send pool"""
+
+    def __init__(self, app, transport):
+        self.app = app
+        self.transport = transport
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._executor = None
+        self.purged_at = None
+
+    @property
+    def executor(self):
+        self._ensure_process_local()
+        return self._executor
+
+    def _ensure_process_local(self):
+        # Threads and pools do not survive fork(); recreate them in each worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config['EMAIL_OUTBOX_THREADS'],
+                    thread_name_prefix='email-outbox-send'
+                )
+                self._thread = None
+                self._pid = os.getpid()
+
+    def ensure_worker(self):
+        if not self.app.config['EMAIL_OUTBOX_WORKER']:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        self._ensure_process_local()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        poll_seconds = self.app.config['EMAIL_OUTBOX_POLL_SECONDS']
+        # Standby processes check the lease at half its length, so a dead
+        # poller is replaced well before messages pile up
+        standby_seconds = max(poll_seconds, self.app.config['EMAIL_OUTBOX_POLLER_LEASE_SECONDS'] / 2)
+        woken = True
+        while not self.stopping.is_set():
+            processed = 0
+            polling = False
+            try:
+                with self.app.app_context():
+                    polling = outbox.hold_poller_lease()
+                    if polling or woken:
+                        processed = outbox.drain()
+            except Exception:
+                logger.exception("Email outbox worker error")
+            if not processed:
+                woken = self.wake.wait(poll_seconds if polling else standby_seconds)
+                self.wake.clear()
+
+    def stop(self, timeout=None):
+        """Stop the worker thread after its current batch"""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self.stopping.set()
+        self.wake.set()
+        thread.join(timeout)
+        self._thread = None
+        self.stopping.clear()
+
+
+class EmailOutbox:
+    """Flask extension queueing emails for background delivery"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, transport=None):
+        app.config.setdefault('EMAIL_OUTBOX_ENABLED', True)
+        app.config.setdefault('EMAIL_OUTBOX_WORKER', True)
+        app.config.setdefault('EMAIL_OUTBOX_THREADS', 4)
+        app.config.setdefault('EMAIL_OUTBOX_BATCH_SIZE', 20)
+        app.config.setdefault('EMAIL_OUTBOX_POLL_SECONDS', 5)
+        app.config.setdefault('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        app.config.setdefault('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+        app.config.setdefault('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600)
+        app.config.setdefault('EMAIL_OUTBOX_LEASE_SECONDS', 300)
+        app.config.setdefault('EMAIL_OUTBOX_POLLER_LEASE_SECONDS', 30)
+        app.config.setdefault('EMAIL_OUTBOX_RETENTION_DAYS', 7)
+        app.config.setdefault('EMAIL_OUTBOX_PURGE_SECONDS', 3600)
+        app.extensions['email_outbox'] = _OutboxState(app, transport or gmail_transport)
+        # Safety net for servers without a boot hook (gunicorn starts it in
+        # post_worker_init); a no-op once this process's thread is running
+        app.before_request(app.extensions['email_outbox'].ensure_worker)
+
+    def start(self, app):
+        """Start this process's delivery thread (call in each serving process)"""
+        app.extensions['email_outbox'].ensure_worker()
+
+    def stop(self, app, timeout=None):
+        """Let this process's delivery thread finish its batch and exit"""
+        app.extensions['email_outbox'].stop(timeout)
+
+    @property
+    def _state(self):
+        return current_app.extensions['email_outbox']
+
+    @property
+    def enabled(self):
+        return current_app.config['EMAIL_OUTBOX_ENABLED']
+
+    def set_transport(self, transport):
+        """Replace the delivery transport, e.g. with a fake in tests"""
+        self._state.transport = transport
+
+    def enqueue(self, to, subject, html_content, text_content=None):
+        """Persist an email for background delivery and wake the worker"""
+        message = OutboxMessage(
+            recipient=to,
+            subject=subject,
+            html_content=html_content,
+            text_content=text_content
+        )
+        db.session.add(message)
+        db.session.commit()
+
+        state = self._state
+        state.ensure_worker()
+        state.wake.set()
+        return message
+
+    def hold_poller_lease(self, name='poller'):
+        """
+        Take or renew the poller lease for this process
+
+        Returns:
+            bool: True if this process holds the lease until the next renewal
+        """
+        now = datetime.utcnow()
+        holder = f'{socket.gethostname()}:{os.getpid()}'
+        expires_at = now + timedelta(seconds=current_app.config['EMAIL_OUTBOX_POLLER_LEASE_SECONDS'])
+        result = db.session.execute(
+            update(OutboxLease).where(
+                OutboxLease.name == name,
+                (OutboxLease.holder == holder) | (OutboxLease.expires_at < now)
+            ).values(holder=holder, expires_at=expires_at)
+        )
+        if result.rowcount == 1:
+            db.session.commit()
+            return True
+        if db.session.get(OutboxLease, name) is not None:
+            db.session.rollback()
+            return False
+        try:
+            db.session.add(OutboxLease(name=name, holder=holder, expires_at=expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Another process created it first
+            db.session.rollback()
+            return False
+
+    def _claim_due(self, now):
+        """Claim up to a batch of due messages; returns the claimed rows"""
+        config = current_app.config
+        due_ids = [row_id for (row_id,) in db.session.query(OutboxMessage.id).filter(
+            OutboxMessage.status.in_(('pending', 'sending')),
+            OutboxMessage.next_attempt_at <= now
+        ).order_by(OutboxMessage.next_attempt_at).limit(config['EMAIL_OUTBOX_BATCH_SIZE'])]
+
+        lease_expires = now + timedelta(seconds=config['EMAIL_OUTBOX_LEASE_SECONDS'])
+        claimed = []
+        for message_id in due_ids:
+            result = db.session.execute(
+                update(OutboxMessage).where(
+                    OutboxMessage.id == message_id,
+                    OutboxMessage.status.in_(('pending', 'sending')),
+                    OutboxMessage.next_attempt_at <= now
+                ).values(status='sending', next_attempt_at=lease_expires)
+            )
+            if result.rowcount == 1:
+                claimed.append(message_id)
+        db.session.commit()
+
+        if not claimed:
+            return []
+        return OutboxMessage.query.filter(OutboxMessage.id.in_(claimed)).all()
+
+    def purge(self, now=None):
+        """
+        Delete sent and failed messages older than EMAIL_OUTBOX_RETENTION_DAYS
+
+        Returns:
+            int: Number of rows deleted
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=current_app.config['EMAIL_OUTBOX_RETENTION_DAYS'])
+        purged = OutboxMessage.query.filter(
+            ((OutboxMessage.status == 'sent') & (OutboxMessage.sent_at < cutoff))
+            | ((OutboxMessage.status == 'failed') & (OutboxMessage.created_at < cutoff))
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return purged
+
+    def _maybe_purge(self, state):
+        started = time.monotonic()
+        interval = current_app.config['EMAIL_OUTBOX_PURGE_SECONDS']
+        if state.purged_at is not None and started - state.purged_at < interval:
+            return
+        state.purged_at = started
+        try:
+            purged = self.purge()
+            if purged:
+                logger.info("Purged %s old messages from the email outbox", purged)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Error purging email outbox: %s", e)
+
+    def drain(self):
+        """
+        Deliver one batch of due messages
+
+        Returns:
+            int: Number of messages attempted
+        """
+        state = self._state
+        config = current_app.config
+        app = current_app._get_current_object()
+        self._maybe_purge(state)
+        messages = self._claim_due(datetime.utcnow())
+        if not messages:
+            return 0
+
+        def attempt(payload):
+            to, subject, html_content, text_content = payload
+            try:
+                with app.app_context():
+                    return bool(state.transport(to, subject, html_content, text_content)), None
+            except Exception as e:
+                return False, str(e)
+
+        payloads = [(m.recipient, m.subject, m.html_content, m.text_content) for m in messages]
+        results = list(state.executor.map(attempt, payloads))
+
+        now = datetime.utcnow()
+        for message, (sent, error) in zip(messages, results):
+            message.attempts += 1
+            if sent:
+                message.status = 'sent'
+                message.sent_at = now
+                message.last_error = None
+                # Bodies may contain reset codes; only the envelope is kept
+                message.html_content = ''
+                message.text_content = None
+            elif message.attempts >= config['EMAIL_OUTBOX_MAX_ATTEMPTS']:
+                message.status = 'failed'
+                message.last_error = error or 'Transport reported failure'
+                logger.error("Giving up on email %s to %s: %s", message.id, message.recipient, message.last_error)
+            else:
+                delay = min(
+                    config['EMAIL_OUTBOX_BACKOFF_SECONDS'] * 2 ** (message.attempts - 1),
+                    config['EMAIL_OUTBOX_MAX_BACKOFF_SECONDS']
+                )
+                message.status = 'pending'
+                message.next_attempt_at = now + timedelta(seconds=delay)
+                message.last_error = error or 'Transport reported failure'
+        db.session.commit()
+        return len(messages)
+
+
+outbox = EmailOutbox()
@@ -0,0 +1,67 @@
+"""
+Email template rendering
+
+Templates live in app/templates/email and are compiled once by a
+module-level Jinja2 environment, so rendering does not need an app context
+(bulk sends and CLI commands can use it too). The shared layout is static
+text compiled into the templates, the footer is rendered once per year, and
+item tables are produced by a template loop that is joined once instead of
+being concatenated row by row.
+"""
+import os
+from datetime import datetime
+from functools import lru_cache
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,
+    cache_size=-1
+)
+_env.filters['money'] = lambda value: f"${value:.2f}"
+
+
+@lru_cache(maxsize=2)
+def _footers(year):
+    """Rendered HTML and text footers for a year"""
+    return (
+        Markup(_env.get_template('_footer.html').render(year=year)),
+        _env.get_template('_footer.txt').render(year=year)
+    )
+
+
+def render_email(name, **context):
+    """
+    Render the HTML and plain text bodies of an email template
+
+    Args:
+        name: Template name without extension, e.g. 'welcome'
+        **context: Template variables
+
+    Returns:
+        tuple: (html_content, text_content)
+    """
+    footer_html, footer_text = _footers(datetime.now().year)
+    html_content = _env.get_template(f'{name}.html').render(context, footer=footer_html)
+    text_content = _env.get_template(f'{name}.txt').render(context, footer=footer_text)
+    return html_content, text_content
+
+
+def order_lines(items):
+    """Normalise order item dicts for the order confirmation templates"""
+    for item in items:
+        quantity = item.get('quantity', 1)
+        price = item.get('price', 0.00)
+        yield {
+            'name': item.get('name', 'Unknown item'),
+            'quantity': quantity,
+            'price': price,
+            'total': price * quantity
+        }
+
@@ -0,0 +1,86 @@
+"""
+Facet counts for the medication catalogue
+
+All facets (category, medication type, prescription vs OTC and price
+bucket) are counted over the filtered result set in a single statement: the
+filters run once in a CTE, and one GROUP BY per facet over it is combined
+with UNION ALL, instead of a separate query per facet.
+"""
+from sqlalchemy import String, case, cast, func, literal, select, union_all
+from app import db
+from app.models.medication import Category, Medication
+
+# Upper bounds of the price buckets; the last bucket is open-ended
+PRICE_BUCKETS = (10, 50, 100, 500)
+
+
+def price_bucket(price_column):
+    """SQL expression numbering the price bucket a price falls into"""
+    return case(
+        *[(price_column < bound, index) for index, bound in enumerate(PRICE_BUCKETS)],
+        else_=len(PRICE_BUCKETS)
+    )
+
+
+def facet_counts(query):
+    """
+    Count the rows of a filtered Medication query per facet
+
+    Args:
+        query: Medication query with the request's filters applied
+
+    Returns:
+        dict: ``category`` (list of id/name/count), ``medication_type`` and
+        ``prescription`` (value -> count) and ``price`` (list of min/max/count,
+        one entry per bucket including empty ones)
+    """
+    matches = query.order_by(None).with_entities(
+        Medication.id,
+        Medication.category_id,
+        Medication.medication_type,
+        # Derived facet values are computed here so each branch groups by a
+        # plain column (PostgreSQL rejects GROUP BY on a re-bound expression)
+        case((Medication.requires_prescription.is_(True), 'prescription'), else_='otc').label('prescription'),
+        price_bucket(Medication.price).label('price_bucket')
+    ).cte('facet_matches')
+
+    def branch(facet, value, label=None):
+        return select(
+            literal(facet).label('facet'),
+            cast(value, String).label('value'),
+            (label if label is not None else cast(literal(None), String)).label('label'),
+            func.count().label('count')
+        ).select_from(matches)
+
+    statement = union_all(
+        branch('category', matches.c.category_id, Category.name).outerjoin(
+            Category, Category.id == matches.c.category_id
+        ).group_by(matches.c.category_id, Category.name),
+        branch('medication_type', matches.c.medication_type).group_by(matches.c.medication_type),
+        branch('prescription', matches.c.prescription).group_by(matches.c.prescription),
+        branch('price', matches.c.price_bucket).group_by(matches.c.price_bucket)
+    )
+
+    facets = {
+        'category': [],
+        'medication_type': {},
+        'prescription': {'prescription': 0, 'otc': 0},
+        'price': [
+            {'min': low, 'max': high, 'count': 0}
+            for low, high in zip((0,) + PRICE_BUCKETS, PRICE_BUCKETS + (None,))
+        ]
+    }
+    for row in db.session.execute(statement):
+        if row.facet == 'category':
+            facets['category'].append({
+                'id': int(row.value) if row.value is not None else None,
+                'name': row.label,
+                'count': row.count
+            })
+        elif row.facet == 'price':
+            facets['price'][int(row.value)]['count'] = row.count
+        else:
+            facets[row.facet][row.value] = row.count
+
+    facets['category'].sort(key=lambda entry: -entry['count'])
+    return facets
@@ -2,27 +2,21 @@ import os
 import base64
 import json
 import logging
-import pickle
-import random
+import secrets
 import string
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
 from flask import current_app
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from app.utils.email_templates import render_email, order_lines
+from app.utils.verification_codes import verification_codes
 
 logger = logging.getLogger(__name__)
 
-# If modifying these SCOPES, delete the token.pickle file
+# If modifying these SCOPES, delete the token.json file
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 
-# Dictionary to store verification codes (in production, use database)
-verification_codes = {}
-
 # Email configuration
 FROM_EMAIL = os.getenv('GMAIL_SENDER', 'astrondaniel6@gmail.com')
 FROM_NAME = os.getenv('GMAIL_SENDER_NAME', 'Winal Drug Shop')
@@ -35,312 +29,342 @@ TOKEN_PATH = os.getenv('GMAIL_TOKEN_PATH', 'token.json')
 GMAIL_CREDENTIALS_JSON = os.getenv('GMAIL_CREDENTIALS_JSON')
 GMAIL_TOKEN_JSON = os.getenv('GMAIL_TOKEN_JSON')
 
+# Process-wide Gmail client: credentials are loaded and the service is built
+# once, then shared by every thread (see get_gmail_service)
+_gmail_lock = threading.Lock()
+_gmail_credentials = None
+_gmail_service = None
+_thread_local = threading.local()
+
+# Gmail accepts up to 100 calls per batch request but recommends no more
+# than 50 to stay under per-user rate limits
+GMAIL_BATCH_SIZE = 50
+GMAIL_MAX_BATCH_SIZE = 100
+
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# The Google client libraries take a noticeable share of boot time to
+# import, so they are imported on first use rather than at module load
+
+def build(*args, **kwargs):
+    """googleapiclient.discovery.build, imported on first use"""
+    from googleapiclient.discovery import build as discovery_build
+    return discovery_build(*args, **kwargs)
+
+def _load_credentials():
+    """Load stored credentials, or run the OAuth flow if none are stored"""
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    creds = None
+    
+    # First try to load credentials from environment variables
+    if GMAIL_TOKEN_JSON:
+        try:
+            logger.info("Attempting to load token from GMAIL_TOKEN_JSON environment variable")
+            token_data = json.loads(GMAIL_TOKEN_JSON)
+            creds = Credentials.from_authorized_user_info(token_data, SCOPES)
+        except Exception as e:
+            logger.error("Error loading token from environment variable: %s", e)
+    
+    # If not available or invalid, load from file
+    if not creds and os.path.exists(TOKEN_PATH):
+        with open(TOKEN_PATH, 'r') as token:
+            creds = Credentials.from_authorized_user_info(json.load(token), SCOPES)
+    
+    if creds:
+        return creds
+    
+    # Try to load credentials from environment variable
+    if GMAIL_CREDENTIALS_JSON:
+        try:
+            logger.info("Loading credentials from GMAIL_CREDENTIALS_JSON environment variable")
+            credentials_data = json.loads(GMAIL_CREDENTIALS_JSON)
+            flow = InstalledAppFlow.from_client_config(credentials_data, SCOPES)
+            creds = flow.run_local_server(port=0)
+        except Exception as e:
+            logger.error("Error loading credentials from environment variable: %s", e)
+            
+    # If environment variable approach failed or not configured, use file
+    if not creds and os.path.exists(CREDENTIALS_PATH):
+        logger.info("Loading credentials from file: %s", CREDENTIALS_PATH)
+        flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+        creds = flow.run_local_server(port=0)
+    elif not creds:
+        logger.error("No credentials available. Either set GMAIL_CREDENTIALS_JSON environment variable or ensure %s exists",
+                     CREDENTIALS_PATH)
+        return None
+    
+    _save_credentials(creds)
+    return creds
+
+def _save_credentials(creds):
+    """Persist credentials after they were obtained or refreshed"""
+    # Save to environment variable if configured to use that
+    if GMAIL_TOKEN_JSON is not None:
+        os.environ['GMAIL_TOKEN_JSON'] = creds.to_json()
+        logger.info("Updated GMAIL_TOKEN_JSON environment variable with new token")
+    
+    # Also save to file as backup, in the JSON format _load_credentials reads
+    with open(TOKEN_PATH, 'w') as token:
+        token.write(creds.to_json())
+
+def _needs_refresh(creds):
+    """True if the access token is missing, expired or about to expire"""
+    if not creds.token or not creds.expiry:
+        return True
+    return creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+
 def get_gmail_service():
     """
-    Get an authenticated Gmail API service instance.
+    Get the authenticated Gmail API service instance.
+    
+    The service is built once per process from the discovery document bundled
+    with google-api-python-client (no discovery HTTP request), and credentials
+    are only refreshed when the access token is close to expiring.
     
     Returns:
         service: An authenticated Gmail API service object or None if authentication fails
     """
-    creds = None
+    global _gmail_credentials, _gmail_service
     
     try:
-        # First try to load credentials from environment variables
-        if GMAIL_TOKEN_JSON:
-            try:
-                logger.info("Attempting to load token from GMAIL_TOKEN_JSON environment variable")
-                token_data = json.loads(GMAIL_TOKEN_JSON)
-                creds = Credentials.from_authorized_user_info(token_data, SCOPES)
-            except Exception as e:
-                logger.error(f"Error loading token from environment variable: {e}")
-        
-        # If not available or invalid, load from file
-        if not creds and os.path.exists(TOKEN_PATH):
-            with open(TOKEN_PATH, 'r') as token:
-                creds = Credentials.from_authorized_user_info(eval(token.read()), SCOPES)
-        
-        # If credentials don't exist or are invalid
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                # Try to load credentials from environment variable
-                if GMAIL_CREDENTIALS_JSON:
-                    try:
-                        logger.info("Loading credentials from GMAIL_CREDENTIALS_JSON environment variable")
-                        credentials_data = json.loads(GMAIL_CREDENTIALS_JSON)
-                        flow = InstalledAppFlow.from_client_config(credentials_data, SCOPES)
-                        creds = flow.run_local_server(port=0)
-                    except Exception as e:
-                        logger.error(f"Error loading credentials from environment variable: {e}")
-                        
-                # If environment variable approach failed or not configured, use file
-                if not creds and os.path.exists(CREDENTIALS_PATH):
-                    logger.info(f"Loading credentials from file: {CREDENTIALS_PATH}")
-                    flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
-                    creds = flow.run_local_server(port=0)
-                elif not creds:
-                    logger.error(f"No credentials available. Either set GMAIL_CREDENTIALS_JSON environment variable or ensure {CREDENTIALS_PATH} exists")
+        from google.auth.transport.requests import Request
+        with _gmail_lock:
+            if _gmail_credentials is None:
+                _gmail_credentials = _load_credentials()
+                if _gmail_credentials is None:
                     return None
             
-            # Save the credentials for next run
-            # Save to environment variable if configured to use that
-            if GMAIL_TOKEN_JSON is not None:
-                os.environ['GMAIL_TOKEN_JSON'] = creds.to_json()
-                logger.info("Updated GMAIL_TOKEN_JSON environment variable with new token")
+            if _gmail_credentials.refresh_token and _needs_refresh(_gmail_credentials):
+                _gmail_credentials.refresh(Request())
+                _save_credentials(_gmail_credentials)
             
-            # Also save to file as backup
-            with open(TOKEN_PATH, 'wb') as token:
-                pickle.dump(creds, token)
-        
-        # Build Gmail service
-        service = build('gmail', 'v1', credentials=creds)
-        return service
+            if _gmail_service is None:
+                _gmail_service = build('gmail', 'v1', credentials=_gmail_credentials,
+                                       cache_discovery=False, static_discovery=True)
+            return _gmail_service
         
     except Exception as e:
-        logger.error(f"Error authenticating with Gmail API: {e}")
+        logger.error("Error authenticating with Gmail API: %s", e)
         return None
 
+def _thread_http():
+    """
+    Authorized HTTP transport for the calling thread
+    
+    httplib2 connections are not thread-safe, so the shared service object
+    executes each request with a transport owned by the current thread.
+    """
+    http = getattr(_thread_local, 'http', None)
+    if http is None or http.credentials is not _gmail_credentials:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        http = AuthorizedHttp(_gmail_credentials, http=httplib2.Http())
+        _thread_local.http = http
+    return http
+
+def reset_gmail_service():
+    """Drop the cached client, e.g. after rotating credentials"""
+    global _gmail_credentials, _gmail_service
+    with _gmail_lock:
+        _gmail_credentials = None
+        _gmail_service = None
+
 def generate_verification_code(length=6):
     """Generate a random verification code"""
-    return ''.join(random.choices(string.digits, k=length))
+    return ''.join(secrets.choice(string.digits) for _ in range(length))
 
-def store_verification_code(email, code, expiry_minutes=15):
+def store_verification_code(email, code, expiry_minutes=None):
     """Store verification code with expiration"""
     try:
-        # Calculate expiration time
-        expiry_time = datetime.utcnow() + timedelta(minutes=expiry_minutes)
-        
-        # Store code with expiry
-        verification_codes[email] = {
-            'code': code,
-            'expires_at': expiry_time
-        }
-        
-        # Print for debugging
-        print(f"Stored verification code for {email}: {code}, expires at {expiry_time}")
+        verification_codes.store(email, code, expiry_minutes)
         return True
-    except Exception as e:
-        print(f"Error storing verification code: {str(e)}")
-        if hasattr(current_app, 'logger'):
-            current_app.logger.error(f"Error storing verification code: {str(e)}")
+    except Exception:
+        logger.exception("Error storing verification code")
         return False
 
 def verify_code(email, code):
     """Verify a code for an email"""
-    if email not in verification_codes:
-        return False
-        
-    stored_data = verification_codes[email]
-    if stored_data['expires_at'] < datetime.utcnow():
-        # Code has expired
-        del verification_codes[email]
-        return False
-        
-    if stored_data['code'] != code:
-        return False
-        
-    return True
+    return verification_codes.verify(email, code)
 
 def clear_verification_code(email):
     """Clear a verification code after use"""
-    if email in verification_codes:
-        del verification_codes[email]
+    verification_codes.clear(email)
         
+def _build_raw_message(to, subject, html_content, text_content=None):
+    """Build the base64url-encoded MIME message the Gmail API expects"""
+    message = MIMEMultipart('alternative')
+    message['to'] = to
+    message['subject'] = subject
+    
+    # Set From header with name and email
+    message['from'] = f"{FROM_NAME} <{FROM_EMAIL}>"
+    
+    # Attach parts
+    if text_content:
+        message.attach(MIMEText(text_content, 'plain'))
+    message.attach(MIMEText(html_content, 'html'))
+    
+    return base64.urlsafe_b64encode(message.as_bytes()).decode()
+
 def send_email(to, subject, html_content, text_content=None):
     """Send an email using Gmail API"""
     try:
         # Get Gmail service
         service = get_gmail_service()
         if not service:
-            print("Failed to get Gmail service")
+            logger.error("Failed to get Gmail service")
             return False
             
-        # Create message
-        message = MIMEMultipart('alternative')
-        message['to'] = to
-        message['subject'] = subject
-        
-        # Set From header with name and email
-        message['from'] = f"{FROM_NAME} <{FROM_EMAIL}>"
-        
-        # Attach parts
-        if text_content:
-            part1 = MIMEText(text_content, 'plain')
-            message.attach(part1)
-            
-        part2 = MIMEText(html_content, 'html')
-        message.attach(part2)
-        
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+        raw_message = _build_raw_message(to, subject, html_content, text_content)
         
         # Send message
         try:
             message = service.users().messages().send(
-                userId='me', body={'raw': raw_message}).execute()
-            print(f"Email sent to {to}, message ID: {message.get('id')}")
+                userId='me', body={'raw': raw_message}).execute(http=_thread_http())
+            logger.info("Email sent to %s, message ID: %s", to, message.get('id'))
             return True
-        except Exception as e:
-            print(f"Error sending email: {str(e)}")
-            if hasattr(current_app, 'logger'):
-                current_app.logger.error(f"Error sending email: {str(e)}")
-            
-            # For development, log the email content
-            print("\n=== EMAIL (GMAIL ERROR) ===")
-            print(f"To: {to}")
-            print(f"Subject: {subject}")
-            print("====================================\n")
+        except Exception:
+            logger.exception("Error sending email to %s (subject %r)", to, subject)
             return False
             
-    except Exception as e:
-        print(f"Error in send_email: {str(e)}")
-        if hasattr(current_app, 'logger'):
-            current_app.logger.error(f"Error in send_email: {str(e)}")
+    except Exception:
+        logger.exception("Error in send_email")
         return False
 
-def send_password_reset_email(email, name=None):
-    """Send password reset email with verification code"""
+def send_bulk_email(recipients, subject, render, batch_size=GMAIL_BATCH_SIZE):
+    """
+    Send one email to many recipients using Gmail batch requests
+    
+    Args:
+        recipients: Iterable of (email, group) pairs. ``group`` is any hashable
+            value identifying the template context, e.g. None for a broadcast
+            or a (name, order_status) tuple for personalised notifications
+        subject: Email subject
+        render: Callable taking a group and returning (html_content, text_content);
+            it is called once per distinct group
+        batch_size: Messages per batch HTTP request (at most GMAIL_MAX_BATCH_SIZE)
+    
+    Returns:
+        dict: Maps each email to {'sent': bool, 'message_id': str|None, 'error': str|None}
+    """
+    batch_size = max(1, min(batch_size, GMAIL_MAX_BATCH_SIZE))
+    
+    # Deduplicate recipients while keeping their order
+    pending = {}
+    for email, group in recipients:
+        pending.setdefault(email, group)
+    
+    results = {email: {'sent': False, 'message_id': None, 'error': None} for email in pending}
+    if not pending:
+        return results
+    
+    service = get_gmail_service()
+    if not service:
+        for result in results.values():
+            result['error'] = 'Gmail service unavailable'
+        return results
+    
+    rendered = {}
+    for group in pending.values():
+        if group not in rendered:
+            rendered[group] = render(group)
+    
+    def callback(request_id, response, exception):
+        result = results[request_id]
+        if exception is not None:
+            result['error'] = str(exception)
+        else:
+            result['sent'] = True
+            result['message_id'] = response.get('id')
+    
+    emails = list(pending)
+    for start in range(0, len(emails), batch_size):
+        chunk = emails[start:start + batch_size]
+        batch = service.new_batch_http_request(callback=callback)
+        for email in chunk:
+            html_content, text_content = rendered[pending[email]]
+            raw_message = _build_raw_message(email, subject, html_content, text_content)
+            batch.add(
+                service.users().messages().send(userId='me', body={'raw': raw_message}),
+                request_id=email
+            )
+        try:
+            batch.execute(http=_thread_http())
+        except Exception as e:
+            logger.error("Error sending email batch: %s", e)
+            for email in chunk:
+                if not results[email]['sent']:
+                    results[email]['error'] = str(e)
+    
+    sent = sum(1 for result in results.values() if result['sent'])
+    logger.info("Bulk email '%s': %s/%s sent", subject, sent, len(results))
+    return results
+
+def deliver_email(to, subject, html_content, text_content=None):
+    """
+    Hand an email to the outbox for background delivery, or send it inline
+    when EMAIL_OUTBOX_ENABLED is off
+    
+    Returns:
+        bool: True if the email was queued or sent
+    """
+    from app.utils.email_outbox import outbox
+    if outbox.enabled:
+        outbox.enqueue(to, subject, html_content, text_content)
+        return True
+    return send_email(to, subject, html_content, text_content)
+
+def send_password_reset_email(email, name=None, code=None):
+    """Send password reset email with verification code (generated if not given)"""
     try:
         # Generate verification code
-        code = generate_verification_code()
-        print(f"Generated verification code for {email}: {code}")
+        if code is None:
+            code = generate_verification_code()
         
-        # Store in memory dictionary
+        # Store in the shared verification code store
         if not store_verification_code(email, code):
-            error_msg = "Failed to store verification code"
-            print(error_msg)
-            raise Exception(error_msg)
-        
-        # Format name
-        user_name = name if name else "Valued Customer"
-        
-        # Create email content
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-          <div style="text-align: center; margin-bottom: 20px;">
-            <h2 style="color: #2196F3;">Winal Drug Shop</h2>
-          </div>
-          <div>
-            <h3>Password Reset</h3>
-            <p>Dear {user_name},</p>
-            <p>You requested a password reset for your Winal Drug Shop account.</p>
-            <p>Your verification code is:</p>
-            <div style="background-color: #f5f5f5; padding: 15px; text-align: center; font-size: 24px; letter-spacing: 5px; border-radius: 5px; margin: 20px 0;">
-              <strong>{code}</strong>
-            </div>
-            <p>This code will expire in 15 minutes.</p>
-            <p>If you did not request a password reset, please ignore this email or contact our support team if you have concerns.</p>
-            <hr style="margin: 20px 0; border: none; border-top: 1px solid #e0e0e0;">
-            <p style="font-size: 12px; color: #757575; text-align: center;">
-              &copy; {datetime.now().year} Winal Drug Shop. All rights reserved.
-            </p>
-          </div>
-        </div>
-        """
-        
-        plain_content = f"""
-        Password Reset - Winal Drug Shop
+            raise Exception("Failed to store verification code")
         
-        Dear {user_name},
-        
-        You requested a password reset for your Winal Drug Shop account.
-        
-        Your verification code is: {code}
-        
-        This code will expire in 15 minutes.
-        
-        If you did not request a password reset, please ignore this email or contact our support team if you have concerns.
-        
-        © {datetime.now().year} Winal Drug Shop. All rights reserved.
-        """
+        html_content, plain_content = render_email(
+            'password_reset',
+            user_name=name if name else "Valued Customer",
+            code=code,
+            expiry_minutes=current_app.config['VERIFICATION_CODE_TTL_MINUTES']
+        )
         
-        # If we're in development or testing mode, just print the email
+        # In development or testing mode, only log that it was skipped (never the code)
         if os.environ.get('FLASK_ENV') == 'development' or os.environ.get('TESTING'):
-            print("\n=== PASSWORD RESET EMAIL (DEV MODE) ===")
-            print(f"To: {email}")
-            print(f"Subject: Password Reset - Winal Drug Shop")
-            print(f"Verification Code: {code}")
-            print("====================================\n")
+            logger.info("Password reset email (dev mode) to %s not sent", email)
             return True
         
         # Send email
-        return send_email(
+        return deliver_email(
             to=email,
             subject="Password Reset - Winal Drug Shop",
             html_content=html_content,
             text_content=plain_content
         )
         
-    except Exception as e:
-        print(f"Global error in send_password_reset_email: {str(e)}")
-        if hasattr(current_app, 'logger'):
-            current_app.logger.error(f"Global error in send_password_reset_email: {str(e)}")
+    except Exception:
+        logger.exception("Error in send_password_reset_email")
         return False
 
 def send_welcome_email(email, name):
     """Send welcome email to newly registered user"""
-    # Format name
-    user_name = name if name else "Valued Customer"
-    
-    # Create email content
-    html_content = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-      <div style="text-align: center; margin-bottom: 20px;">
-        <h2 style="color: #2196F3;">Winal Drug Shop</h2>
-      </div>
-      <div>
-        <h3>Welcome to Winal Drug Shop!</h3>
-        <p>Dear {user_name},</p>
-        <p>Thank you for registering with Winal Drug Shop! Your account has been successfully created.</p>
-        <p>With your new account, you can:</p>
-        <ul>
-          <li>Browse our wide range of animal and human medications</li>
-          <li>Book appointments for farm activities and consultations</li>
-          <li>Track your orders and prescription history</li>
-          <li>Access exclusive health tips and resources</li>
-        </ul>
-        <p>If you have any questions or need assistance, please don't hesitate to contact us.</p>
-        <p>Best regards,<br>The Winal Drug Shop Team</p>
-        <hr style="margin: 20px 0; border: none; border-top: 1px solid #e0e0e0;">
-        <p style="font-size: 12px; color: #757575; text-align: center;">
-          &copy; {datetime.now().year} Winal Drug Shop. All rights reserved.
-        </p>
-      </div>
-    </div>
-    """
-    
-    plain_content = f"""
-    Welcome to Winal Drug Shop!
-    
-    Dear {user_name},
-    
-    Thank you for registering with Winal Drug Shop! Your account has been successfully created.
-    
-    With your new account, you can:
-    • Browse our wide range of animal and human medications
-    • Book appointments for farm activities and consultations
-    • Track your orders and prescription history
-    • Access exclusive health tips and resources
-    
-    If you have any questions or need assistance, please don't hesitate to contact us.
-    
-    Best regards,
-    The Winal Drug Shop Team
-    
-    © {datetime.now().year} Winal Drug Shop. All rights reserved.
-    """
+    html_content, plain_content = render_email(
+        'welcome',
+        user_name=name if name else "Valued Customer"
+    )
     
     # If we're in development or testing mode, just print the email
     if os.environ.get('FLASK_ENV') == 'development' or os.environ.get('TESTING'):
-        print("\n=== WELCOME EMAIL (DEV MODE) ===")
-        print(f"To: {email}")
-        print(f"Subject: Welcome to Winal Drug Shop!")
-        print("====================================\n")
+        logger.info("Welcome email (dev mode) to %s", email)
         return True
     
     # Send email
-    return send_email(
+    return deliver_email(
         to=email,
         subject="Welcome to Winal Drug Shop!",
         html_content=html_content,
@@ -371,122 +395,28 @@ def send_order_confirmation(email, order_details):
         order_date = order_details.get('date', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         items = order_details.get('items', [])
         
-        # Build items HTML table
-        items_html = ""
-        items_text = ""
-        
-        for item in items:
-            name = item.get('name', 'Unknown item')
-            quantity = item.get('quantity', 1)
-            price = item.get('price', 0.00)
-            item_total = price * quantity
-            
-            items_html += f"""
-            <tr>
-                <td style="padding: 8px; border-bottom: 1px solid #e0e0e0;">{name}</td>
-                <td style="padding: 8px; border-bottom: 1px solid #e0e0e0; text-align: center;">{quantity}</td>
-                <td style="padding: 8px; border-bottom: 1px solid #e0e0e0; text-align: right;">${price:.2f}</td>
-                <td style="padding: 8px; border-bottom: 1px solid #e0e0e0; text-align: right;">${item_total:.2f}</td>
-            </tr>
-            """
-            
-            items_text += f"- {name} (Qty: {quantity}) @ ${price:.2f} each = ${item_total:.2f}\n"
-        
-        # Create HTML email content
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; border: 1px solid #e0e0e0; border-radius: 5px;">
-            <div style="text-align: center; margin-bottom: 20px;">
-                <h2 style="color: #2196F3;">Winal Drug Shop</h2>
-                <h3>Order Confirmation</h3>
-            </div>
-            
-            <div>
-                <p>Dear {customer_name},</p>
-                <p>Thank you for your order. Below are your order details:</p>
-                
-                <div style="background-color: #f9f9f9; padding: 15px; border-radius: 5px; margin: 15px 0;">
-                    <p><strong>Order ID:</strong> {order_id}</p>
-                    <p><strong>Date:</strong> {order_date}</p>
-                </div>
-                
-                <h4>Order Summary</h4>
-                <table style="width: 100%; border-collapse: collapse;">
-                    <thead>
-                        <tr style="background-color: #f5f5f5;">
-                            <th style="padding: 8px; text-align: left; border-bottom: 2px solid #e0e0e0;">Item</th>
-                            <th style="padding: 8px; text-align: center; border-bottom: 2px solid #e0e0e0;">Quantity</th>
-                            <th style="padding: 8px; text-align: right; border-bottom: 2px solid #e0e0e0;">Price</th>
-                            <th style="padding: 8px; text-align: right; border-bottom: 2px solid #e0e0e0;">Total</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {items_html}
-                    </tbody>
-                    <tfoot>
-                        <tr>
-                            <td colspan="3" style="padding: 8px; text-align: right; border-top: 2px solid #e0e0e0;"><strong>Total:</strong></td>
-                            <td style="padding: 8px; text-align: right; border-top: 2px solid #e0e0e0;"><strong>${total:.2f}</strong></td>
-                        </tr>
-                    </tfoot>
-                </table>
-                
-                <p style="margin-top: 20px;">If you have any questions about your order, please contact us.</p>
-                <p>Thank you for shopping with Winal Drug Shop!</p>
-                <p>Best regards,<br>The Winal Drug Shop Team</p>
-                
-                <hr style="margin: 20px 0; border: none; border-top: 1px solid #e0e0e0;">
-                <p style="font-size: 12px; color: #757575; text-align: center;">
-                    &copy; {datetime.now().year} Winal Drug Shop. All rights reserved.
-                </p>
-            </div>
-        </div>
-        """
-        
-        # Create plain text content as fallback
-        plain_content = f"""
-        Winal Drug Shop - Order Confirmation
-        
-        Dear {customer_name},
-        
-        Thank you for your order. Below are your order details:
-        
-        Order ID: {order_id}
-        Date: {order_date}
-        
-        Order Summary:
-        {items_text}
-        
-        Total: ${total:.2f}
-        
-        If you have any questions about your order, please contact us.
-        
-        Thank you for shopping with Winal Drug Shop!
-        
-        Best regards,
-        The Winal Drug Shop Team
-        
-        © {datetime.now().year} Winal Drug Shop. All rights reserved.
-        """
+        html_content, plain_content = render_email(
+            'order_confirmation',
+            customer_name=customer_name,
+            order_id=order_id,
+            order_date=order_date,
+            total=total,
+            items=list(order_lines(items))
+        )
         
         # If in development mode, just print the email
         if os.environ.get('FLASK_ENV') == 'development' or os.environ.get('TESTING'):
-            print("\n=== ORDER CONFIRMATION EMAIL (DEV MODE) ===")
-            print(f"To: {email}")
-            print(f"Subject: Order Confirmation - #{order_id}")
-            print(f"Order Total: ${total:.2f}")
-            print("=======================================\n")
+            logger.info("Order confirmation email (dev mode) to %s for order #%s, total %.2f", email, order_id, total)
             return True
         
         # Send the actual email
-        return send_email(
+        return deliver_email(
             to=email,
             subject=f"Winal Drug Shop - Order Confirmation #{order_id}",
             html_content=html_content,
             text_content=plain_content
         )
         
-    except Exception as e:
-        logger.error(f"Error sending order confirmation email: {e}")
-        if hasattr(current_app, 'logger'):
-            current_app.logger.error(f"Error sending order confirmation email: {e}")
+    except Exception:
+        logger.exception("Error sending order confirmation email")
         return False 
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Stock reservation for orders
+
+Stock is decremented with a single conditional UPDATE for all of an
+order's medications (``stock_quantity >= quantity``, with the quantity
+picked per row by a CASE) inside the order's transaction. If fewer rows
+match than were requested, some medication was short and the whole order
+is rolled back, so two concurrent checkouts can never both take the last
+unit. Very large orders are split into batches of RESERVE_BATCH_SIZE.
+"""
+from datetime import datetime
+from sqlalchemy import case, select, update
+from app import db
+from app.models.medication import Medication
+from app.utils.cache import cache
+
+RESERVE_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more medications cannot cover the requested quantity"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        names = ', '.join(shortage['name'] for shortage in shortages)
+        super().__init__(f'Insufficient stock for: {names}')
+
+
+def load_products(medication_ids):
+    """
+    Fetch name, price, stock and category for medications in one query
+
+    Returns:
+        dict: medication id -> row with ``id``, ``name``, ``price``,
+        ``stock_quantity`` and ``category_id``
+    """
+    rows = db.session.query(
+        Medication.id, Medication.name, Medication.price,
+        Medication.stock_quantity, Medication.category_id
+    ).filter(Medication.id.in_(set(medication_ids))).all()
+    return {row.id: row for row in rows}
+
+
+def reserve_stock(quantities, products=None):
+    """
+    Decrement stock for an order; the caller commits or rolls back
+
+    Args:
+        quantities (dict): medication id -> quantity to take
+        products (dict, optional): Result of load_products, used for error details
+
+    Raises:
+        InsufficientStock: If any medication has less stock than requested
+    """
+    now = datetime.utcnow()
+    products = products or {}
+    shortages = []
+    medication_ids = sorted(quantities)
+    for start in range(0, len(medication_ids), RESERVE_BATCH_SIZE):
+        chunk = medication_ids[start:start + RESERVE_BATCH_SIZE]
+        quantity = case({medication_id: quantities[medication_id] for medication_id in chunk},
+                        value=Medication.id)
+        result = db.session.execute(
+            update(Medication).where(
+                Medication.id.in_(chunk),
+                Medication.stock_quantity >= quantity
+            ).values(stock_quantity=Medication.stock_quantity - quantity, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == len(chunk):
+            continue
+
+        # Some rows did not match; report the ones the snapshot shows as short
+        # (or the whole chunk if stock changed since it was read)
+        short_ids = [
+            medication_id for medication_id in chunk
+            if medication_id in products and products[medication_id].stock_quantity < quantities[medication_id]
+        ] or chunk
+        for medication_id in short_ids:
+            product = products.get(medication_id)
+            shortages.append({
+                'product_id': medication_id,
+                'name': product.name if product else f'Product {medication_id}',
+                'requested': quantities[medication_id],
+                'available': product.stock_quantity if product else 0
+            })
+    if shortages:
+        raise InsufficientStock(shortages)
+
+
+def reserve_cart_stock(cart_id, line_count):
+    """
+    Decrement stock for every item of a cart in one set-based UPDATE
+
+    Each medication's quantity is read from cart_items by a correlated
+    subquery, so nothing is loaded into Python. Like reserve_stock, the
+    caller commits or rolls back.
+
+    Args:
+        cart_id (int): Cart whose items are reserved
+        line_count (int): Number of cart items (one per medication)
+
+    Raises:
+        InsufficientStock: If any medication has less stock than the cart holds
+    """
+    from app.models.cart import CartItem
+    now = datetime.utcnow()
+    quantity = select(CartItem.quantity).where(
+        CartItem.cart_id == cart_id, CartItem.medication_id == Medication.id
+    ).scalar_subquery()
+    cart_medication_ids = select(CartItem.medication_id).where(CartItem.cart_id == cart_id)
+    stmt = update(Medication).where(
+        Medication.id.in_(cart_medication_ids),
+        Medication.stock_quantity >= quantity
+    ).values(stock_quantity=Medication.stock_quantity - quantity, updated_at=now).execution_options(
+        synchronize_session=False)
+
+    if db.session.get_bind().dialect.update_returning:
+        # The decremented ids come back with the UPDATE; the rest were short
+        reserved_ids = set(db.session.execute(stmt.returning(Medication.id)).scalars())
+        if len(reserved_ids) == line_count:
+            return
+        short_filter = Medication.id.notin_(reserved_ids)
+    else:
+        savepoint = db.session.begin_nested()
+        if db.session.execute(stmt).rowcount == line_count:
+            savepoint.commit()
+            return
+        # Undo the partial decrement, then compare stock with the cart
+        savepoint.rollback()
+        short_filter = Medication.stock_quantity < CartItem.quantity
+
+    short = db.session.query(
+        Medication.id, Medication.name, Medication.stock_quantity, CartItem.quantity
+    ).join(CartItem, CartItem.medication_id == Medication.id).filter(
+        CartItem.cart_id == cart_id, short_filter
+    ).all()
+    raise InsufficientStock([{
+        'product_id': row.id,
+        'name': row.name,
+        'requested': row.quantity,
+        'available': row.stock_quantity
+    } for row in short])
+
+
+def release_stock(quantities):
+    """Return stock taken by reserve_stock, e.g. when an order is cancelled"""
+    now = datetime.utcnow()
+    medication_ids = sorted(quantities)
+    for start in range(0, len(medication_ids), RESERVE_BATCH_SIZE):
+        chunk = medication_ids[start:start + RESERVE_BATCH_SIZE]
+        quantity = case({medication_id: quantities[medication_id] for medication_id in chunk},
+                        value=Medication.id)
+        db.session.execute(
+            update(Medication).where(Medication.id.in_(chunk))
+            .values(stock_quantity=Medication.stock_quantity + quantity, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def invalidate_stock_cache(medication_ids, category_ids=()):
+    """
+    Drop cached catalogue responses for a stock change (before commit)
+
+    Every line's namespace is bumped together, in one statement on the
+    database backend, so the cost doesn't grow with the order's line count.
+    """
+    cache.invalidate(
+        'medications',
+        'categories',
+        *[f'medication:{medication_id}' for medication_id in set(medication_ids)],
+        *[f'category:{category_id}' for category_id in set(category_ids) if category_id]
+    )
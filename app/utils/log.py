@@ -0,0 +1,160 @@
+"""
+Structured, non-blocking application logging
+
+Every process sends its log records through a QueueHandler to a single
+QueueListener thread, which formats them (JSON lines by default) and writes
+them to stdout, so a slow or blocked stdout never stalls a request thread.
+Records are queued unformatted and formatting happens on the listener
+thread; pass values as logging arguments (``logger.debug("x %s", x)``) or
+``extra`` fields rather than pre-formatted f-strings, so disabled levels
+cost nothing.
+
+One access record is written per request on the ``app.requests`` logger,
+sampled at LOG_REQUEST_SAMPLE_RATE (warnings and errors are always kept).
+Records emitted while handling a request carry its request id, which is
+taken from the X-Request-ID header when present and echoed back.
+
+The listener thread does not survive fork(), so a forked child (a gunicorn
+worker of a preloaded app) starts its own on a fresh queue.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+
+access_logger = logging.getLogger('app.requests')
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including ``extra`` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Tag records with the current request's id (runs on the calling thread)"""
+
+    def filter(self, record):
+        if has_request_context() and 'request_id' in g:
+            record.request_id = g.request_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records below WARNING"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler for an in-process queue
+
+    The stock handler formats each record on the calling thread so it can be
+    pickled; records here never leave the process, so formatting is left to
+    the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level='INFO', fmt='json'):
+    """Route the root logger through a queue to one stdout writer thread (once per process)"""
+    global _listener, _handler
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == 'json':
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    _handler = LocalQueueHandler(log_queue)
+    _handler.addFilter(RequestContextFilter())
+    root.addHandler(_handler)
+
+    _start_listener(log_queue, stream)
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def _start_listener(log_queue, *handlers):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _restart_after_fork():
+    # The child inherits the queue but not the thread draining it
+    log_queue = queue.SimpleQueue()
+    _handler.queue = log_queue
+    _start_listener(log_queue, *_listener.handlers)
+
+
+def init_app(app):
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_FORMAT', 'json')
+    app.config.setdefault('LOG_REQUEST_SAMPLE_RATE', 1.0)
+    if not app.testing:
+        # Under pytest, records go to its capture handlers instead
+        configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+
+    for existing in access_logger.filters[:]:
+        access_logger.removeFilter(existing)
+    access_logger.addFilter(SamplingFilter(app.config['LOG_REQUEST_SAMPLE_RATE']))
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def write_request_log(response):
+        response.headers.setdefault('X-Request-ID', g.get('request_id', ''))
+        if access_logger.isEnabledFor(logging.INFO):
+            started = g.get('request_started')
+            access_logger.info('%s %s %s', request.method, request.path, response.status_code, extra={
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 2) if started else None,
+                'remote_addr': request.remote_addr,
+            })
+        return response
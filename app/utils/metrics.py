@@ -0,0 +1,297 @@
+"""
+Per-endpoint latency and SQL instrumentation, exposed at /metrics
+
+Every request is timed into a latency histogram labelled by endpoint and
+method, and counted by status. A SQLAlchemy cursor hook counts the
+statements each request runs and the time spent in them; statements slower
+than SLOW_QUERY_MS are logged on the ``app.sql`` logger with the endpoint
+that ran them.
+
+GET /metrics renders everything in the Prometheus text format (protected
+by METRICS_TOKEN when set; with METRICS_REQUIRE_TOKEN, as in production, the
+endpoint is disabled until a token is configured). Metrics are per process: scrape each worker, or
+aggregate in Prometheus. With METRICS_SERVER_TIMING enabled, responses
+carry a ``Server-Timing`` header splitting the request into database time
+and the rest (view logic and serialization).
+
+Other modules register their own series through ``metrics.counter()``,
+``metrics.histogram()`` and ``metrics.gauge()``.
+"""
+import logging
+import threading
+import time
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+sql_logger = logging.getLogger('app.sql')
+
+# Seconds; Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, labels, value
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, callback):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+
+    def samples(self):
+        yield self.name, (), self.callback()
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', repr(float(bound))),), cumulative
+            yield f'{self.name}_bucket', labels + (('le', '+Inf'),), series[-1]
+            yield f'{self.name}_sum', labels, series[-2]
+            yield f'{self.name}_count', labels, series[-1]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def counter(self, name, help_text):
+        return self._register(name, lambda: Counter(name, help_text))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, help_text, buckets))
+
+    def gauge(self, name, help_text, callback):
+        return self._register(name, lambda: Gauge(name, help_text, callback))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_label_text(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsState:
+    """Registry and the request/SQL series for one app"""
+
+    def __init__(self, app):
+        self.registry = MetricsRegistry()
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        self.server_timing = app.config['METRICS_SERVER_TIMING']
+        self.token = app.config['METRICS_TOKEN']
+        self.require_token = app.config['METRICS_REQUIRE_TOKEN']
+
+        self.request_duration = self.registry.histogram(
+            'http_request_duration_seconds', 'Request latency by endpoint')
+        self.requests = self.registry.counter(
+            'http_requests_total', 'Requests by endpoint and status')
+        self.request_queries = self.registry.histogram(
+            'http_request_db_queries', 'SQL statements per request by endpoint', QUERY_COUNT_BUCKETS)
+        self.db_duration = self.registry.counter(
+            'db_query_duration_seconds_total', 'Time spent in SQL statements by endpoint')
+        self.db_queries = self.registry.counter(
+            'db_queries_total', 'SQL statements by endpoint')
+        self.slow_queries = self.registry.counter(
+            'db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_MS by endpoint')
+
+
+class Metrics:
+    """Request and SQL instrumentation extension"""
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_MS', 200)
+        app.config.setdefault('METRICS_SERVER_TIMING', False)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_REQUIRE_TOKEN', False)
+        app.extensions['metrics'] = _MetricsState(app)
+        if app.config['METRICS_REQUIRE_TOKEN'] and not app.config['METRICS_TOKEN']:
+            logger.warning("METRICS_TOKEN is not set; /metrics is disabled")
+
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        app.add_url_rule('/metrics', 'metrics', _metrics_view, methods=['GET'])
+
+    @property
+    def _state(self):
+        return current_app.extensions['metrics']
+
+    @property
+    def registry(self):
+        return self._state.registry
+
+    def counter(self, name, help_text):
+        return self.registry.counter(name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self.registry.histogram(name, help_text, buckets)
+
+    def gauge(self, name, help_text, callback):
+        return self.registry.gauge(name, help_text, callback)
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'background'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+
+
+def _finish_request(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+    state = current_app.extensions['metrics']
+    elapsed = time.perf_counter() - started
+    endpoint = _endpoint()
+    method = request.method
+
+    state.request_duration.observe(elapsed, endpoint=endpoint, method=method)
+    state.requests.inc(endpoint=endpoint, method=method, status=response.status_code)
+    state.request_queries.observe(g.db_queries, endpoint=endpoint, method=method)
+
+    if state.server_timing:
+        db_ms = g.db_seconds * 1000
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_ms:.2f};desc="{g.db_queries} queries", '
+            f'app;dur={elapsed * 1000 - db_ms:.2f}, total;dur={elapsed * 1000:.2f}'
+        )
+    return response
+
+
+def _metrics_view():
+    state = current_app.extensions['metrics']
+    if state.require_token and not state.token:
+        return Response('Not Found\n', status=404, mimetype='text/plain')
+    if state.token and request.headers.get('Authorization') != f'Bearer {state.token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(state.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    if not has_app_context() or 'metrics' not in current_app.extensions:
+        return
+
+    state = current_app.extensions['metrics']
+    endpoint = _endpoint()
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+    state.db_queries.inc(endpoint=endpoint)
+    state.db_duration.inc(elapsed, endpoint=endpoint)
+
+    if elapsed >= state.slow_query_seconds:
+        state.slow_queries.inc(endpoint=endpoint)
+        sql_logger.warning('Slow query (%.1f ms) in %s: %s', elapsed * 1000, endpoint, statement[:1000],
+                           extra={'duration_ms': round(elapsed * 1000, 2), 'endpoint': endpoint})
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # time so the stack doesn't grow on the pooled connection
+    conn = context.connection
+    if conn is None or context.execution_context is None:
+        return
+    started = conn.info.get('query_started')
+    if started:
+        started.pop()
+
+
+metrics = Metrics()
@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination helpers
+
+Pages are ordered by (created timestamp, id) and the opaque cursor encodes
+the last row of the previous page, so fetching page N is a range scan from
+that row instead of an OFFSET over every earlier row. Rows without a
+timestamp come last, in id order.
+"""
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def cursor_requested():
+    """Return True when the client opted into cursor mode (?after= and/or ?limit=)"""
+    return 'after' in request.args or 'limit' in request.args
+
+
+def get_limit(default=DEFAULT_LIMIT):
+    """Read ?limit= clamped to 1..MAX_LIMIT"""
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def wants_total():
+    """Return False when the client passed ?count=false to skip the COUNT(*) query"""
+    return request.args.get('count', 'true').lower() not in ('false', '0', 'no')
+
+
+def encode_cursor(created_at, row_id):
+    """Encode the sort key of a row as an opaque URL-safe cursor"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at) if created_at is not None else None, int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def keyset_page(query, created_column, id_column, after=None, limit=DEFAULT_LIMIT):
+    """
+    Fetch one page of ``query`` ordered by (created_column, id_column)
+
+    Args:
+        query: SQLAlchemy query to paginate
+        created_column: Timestamp column of the sort key
+        id_column: Primary key column used as the tie-breaker
+        after (str, optional): Cursor of the last row of the previous page
+        limit (int): Page size
+
+    Returns:
+        tuple: (items, next_cursor) where next_cursor is None on the last page
+
+    Raises:
+        ValueError: If ``after`` is not a valid cursor
+    """
+    if after:
+        created_at, row_id = decode_cursor(after)
+        if created_at is None:
+            # Already into the rows without a timestamp
+            query = query.filter(created_column.is_(None), id_column > row_id)
+        else:
+            query = query.filter(or_(
+                created_column > created_at,
+                and_(created_column == created_at, id_column > row_id),
+                created_column.is_(None)
+            ))
+
+    # Fetch one extra row to learn whether another page exists without a COUNT.
+    # NULLS LAST is PostgreSQL's default for ascending order, so its indexes
+    # still serve the sort
+    ordered = query.order_by(None).order_by(created_column.asc().nulls_last(), id_column)
+    items = ordered.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+    return items, next_cursor
@@ -0,0 +1,193 @@
+"""
+Per-process JWT revocation cache
+
+``check_if_token_revoked`` runs on every authenticated request. Instead of
+querying ``token_blocklist`` each time, every process keeps a Bloom filter
+of revoked JTIs that answers "definitely not revoked" from memory; only
+filter hits (real revocations and rare false positives) reach the database.
+
+The filter is refreshed incrementally at most every
+JWT_BLOCKLIST_REFRESH_SECONDS, so a logout handled by another worker is
+honoured within that window. Ids are not committed in order (a row with a
+lower id can commit after a higher one has been read), so each refresh
+reads the rows above the last id seen plus every row created in the last
+JWT_BLOCKLIST_REFRESH_OVERLAP_SECONDS. Expired JTIs are purged in a
+background thread every JWT_BLOCKLIST_PURGE_SECONDS and the filter is
+rebuilt from the table, which keeps both bounded and repairs anything an
+incremental refresh could still have missed.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import or_
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Kirsch-Mitzenmacher: k positions from two halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationCache:
+    """Bloom-filter view of the token_blocklist table for one process"""
+
+    def __init__(self, app, capacity=100000, refresh_interval=5, purge_interval=3600, refresh_overlap=60):
+        self.app = app
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.refresh_overlap = refresh_overlap
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(capacity)
+        self._last_id = 0
+        self._refreshed_at = None
+        self._purged_at = time.monotonic()
+        self._purging = False
+
+    def is_revoked(self, jti):
+        """Return True if the JTI has been revoked"""
+        self._maybe_refresh()
+        if jti not in self._filter:
+            return False
+
+        from app.models.user import TokenBlocklist
+        return db.session.query(TokenBlocklist.id).filter_by(jti=jti).first() is not None
+
+    def revoke(self, jti, expires_at=None):
+        """Persist a revoked JTI and add it to this process's filter immediately"""
+        from app.models.user import TokenBlocklist
+        db.session.add(TokenBlocklist(jti=jti, expires_at=expires_at))
+        db.session.commit()
+        with self._lock:
+            self._filter.add(jti)
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+
+        from app.models.user import TokenBlocklist
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+
+            # Re-read recent rows too: a lower id may have committed after
+            # a higher one was read
+            overlap_start = datetime.utcnow() - timedelta(seconds=self.refresh_overlap)
+            rows = db.session.query(TokenBlocklist.id, TokenBlocklist.jti).filter(or_(
+                TokenBlocklist.id > self._last_id,
+                TokenBlocklist.created_at >= overlap_start
+            )).order_by(TokenBlocklist.id).all()
+            for row_id, jti in rows:
+                if jti not in self._filter:
+                    self._filter.add(jti)
+                self._last_id = max(self._last_id, row_id)
+            self._refreshed_at = now
+
+            if self._filter.count > self.capacity:
+                # Grow before the false-positive rate degrades
+                self.capacity *= 2
+                self._rebuild()
+
+            if now - self._purged_at >= self.purge_interval and not self._purging:
+                self._purged_at = now
+                self._purging = True
+                threading.Thread(target=self._purge_in_background, daemon=True).start()
+
+    def _rebuild(self):
+        """Rebuild the filter from the table (caller holds the lock)"""
+        from app.models.user import TokenBlocklist
+        rebuilt = BloomFilter(self.capacity)
+        last_id = 0
+        for row_id, jti in db.session.query(TokenBlocklist.id, TokenBlocklist.jti).order_by(TokenBlocklist.id):
+            rebuilt.add(jti)
+            last_id = row_id
+        self._filter = rebuilt
+        self._last_id = last_id
+
+    def _purge_in_background(self):
+        try:
+            with self.app.app_context():
+                purged = purge_expired_tokens()
+                # Rebuild even when nothing was purged, as a backstop for
+                # rows the incremental refresh missed
+                with self._lock:
+                    self._rebuild()
+                if purged:
+                    logger.info("Purged %s expired tokens from the blocklist", purged)
+        except Exception as e:
+            logger.error("Error purging token blocklist: %s", e)
+        finally:
+            self._purging = False
+
+
+def purge_expired_tokens():
+    """
+    Delete blocklist rows whose token has expired
+
+    Rows without an expiry (revoked before expires_at was recorded) are kept,
+    since the token they block may still be valid.
+
+    Returns:
+        int: Number of rows deleted
+    """
+    from app.models.user import TokenBlocklist
+    purged = TokenBlocklist.query.filter(
+        TokenBlocklist.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return purged
+
+
+def token_expiry(jwt_payload):
+    """Naive UTC expiry of a decoded JWT, or None for non-expiring tokens"""
+    exp = jwt_payload.get('exp')
+    if exp is None:
+        return None
+    return datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+
+
+def init_app(app):
+    app.config.setdefault('JWT_BLOCKLIST_CAPACITY', 100000)
+    app.config.setdefault('JWT_BLOCKLIST_REFRESH_SECONDS', 5)
+    app.config.setdefault('JWT_BLOCKLIST_PURGE_SECONDS', 3600)
+    app.config.setdefault('JWT_BLOCKLIST_REFRESH_OVERLAP_SECONDS', 60)
+    app.extensions['token_revocation'] = RevocationCache(
+        app,
+        capacity=app.config['JWT_BLOCKLIST_CAPACITY'],
+        refresh_interval=app.config['JWT_BLOCKLIST_REFRESH_SECONDS'],
+        purge_interval=app.config['JWT_BLOCKLIST_PURGE_SECONDS'],
+        refresh_overlap=app.config['JWT_BLOCKLIST_REFRESH_OVERLAP_SECONDS']
+    )
+
+
+def get_revocation_cache():
+    return current_app.extensions['token_revocation']
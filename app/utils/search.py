@@ -0,0 +1,287 @@
+"""
+Medication full-text search
+
+Medications are indexed on name, category name, description and dosage
+instructions, with the name weighted highest:
+
+* SQLite (local development and tests) uses an FTS5 table,
+  ``medication_search``, ranked with bm25.
+* PostgreSQL uses a weighted ``medications.search_vector`` tsvector with a
+  GIN index, ranked with ts_rank, plus a pg_trgm index on the name for
+  typo-tolerant fallback matching.
+
+In both cases database triggers keep the index in sync with medications
+and category renames, so bulk inserts and scripts are covered too. Every
+query term is matched as a prefix ("amox" finds "Amoxicillin"). When a query
+matches nothing, misspelt terms are replaced by their closest indexed terms
+(SQLite) or matched by trigram similarity (PostgreSQL).
+
+Other databases fall back to ILIKE on the same fields.
+"""
+import difflib
+import re
+from sqlalchemy import Float, Integer, event, or_, text
+from app import db
+from app.models.medication import Category, Medication
+
+MAX_TERMS = 8
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query_text):
+    """Split a user query into lowercase word tokens"""
+    return [term.lower() for term in _TOKEN_RE.findall(query_text or '')][:MAX_TERMS]
+
+
+class SQLiteSearch:
+    """FTS5 index kept in sync by triggers"""
+
+    # Relative bm25 weights of the name, category, description and dosage columns
+    WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+    _ROW_VALUES = ("NEW.id, NEW.name, (SELECT name FROM categories WHERE id = NEW.category_id), "
+                   "NEW.description, NEW.dosage_instructions")
+
+    INSTALL = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS medication_search USING fts5("
+        "name, category, description, dosage, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS medication_search_vocab USING fts5vocab(medication_search, 'row')",
+        "CREATE TRIGGER IF NOT EXISTS medications_search_insert AFTER INSERT ON medications BEGIN "
+        "INSERT INTO medication_search (rowid, name, category, description, dosage) "
+        f"VALUES ({_ROW_VALUES}); END",
+        "CREATE TRIGGER IF NOT EXISTS medications_search_delete AFTER DELETE ON medications BEGIN "
+        "DELETE FROM medication_search WHERE rowid = OLD.id; END",
+        "CREATE TRIGGER IF NOT EXISTS medications_search_update "
+        "AFTER UPDATE OF name, description, dosage_instructions, category_id ON medications BEGIN "
+        "DELETE FROM medication_search WHERE rowid = OLD.id; "
+        "INSERT INTO medication_search (rowid, name, category, description, dosage) "
+        f"VALUES ({_ROW_VALUES}); END",
+        "CREATE TRIGGER IF NOT EXISTS categories_search_update AFTER UPDATE OF name ON categories "
+        "WHEN NEW.name IS NOT OLD.name BEGIN "
+        "UPDATE medication_search SET category = NEW.name "
+        "WHERE rowid IN (SELECT id FROM medications WHERE category_id = NEW.id); END",
+    ]
+
+    UNINSTALL = [
+        "DROP TRIGGER IF EXISTS categories_search_update",
+        "DROP TRIGGER IF EXISTS medications_search_update",
+        "DROP TRIGGER IF EXISTS medications_search_delete",
+        "DROP TRIGGER IF EXISTS medications_search_insert",
+        "DROP TABLE IF EXISTS medication_search_vocab",
+        "DROP TABLE IF EXISTS medication_search",
+    ]
+
+    def install(self, connection):
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'medication_search'"
+        ).first()
+        for statement in self.INSTALL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            self.rebuild(connection)
+
+    def uninstall(self, connection):
+        for statement in self.UNINSTALL:
+            connection.exec_driver_sql(statement)
+
+    def rebuild(self, connection):
+        connection.exec_driver_sql("DELETE FROM medication_search")
+        connection.exec_driver_sql(
+            "INSERT INTO medication_search (rowid, name, category, description, dosage) "
+            "SELECT m.id, m.name, c.name, m.description, m.dosage_instructions "
+            "FROM medications m LEFT JOIN categories c ON c.id = m.category_id"
+        )
+
+    @staticmethod
+    def _match(groups):
+        # Each group is a list of alternatives for one query term
+        return ' AND '.join(
+            '(' + ' OR '.join(f'"{term}"*' for term in group) + ')' for group in groups
+        )
+
+    def _has_hits(self, match):
+        return db.session.execute(
+            text("SELECT 1 FROM medication_search WHERE medication_search MATCH :match LIMIT 1"),
+            {'match': match}
+        ).first() is not None
+
+    def _corrections(self, term):
+        """Indexed terms closest to a misspelt term (same first letter, similar length)"""
+        candidates = db.session.execute(
+            text("SELECT term FROM medication_search_vocab "
+                 "WHERE term >= :low AND term < :high AND length(term) BETWEEN :shortest AND :longest"),
+            {'low': term[0], 'high': chr(ord(term[0]) + 1),
+             'shortest': len(term) - 2, 'longest': len(term) + 2}
+        ).scalars().all()
+        return difflib.get_close_matches(term, candidates, n=3, cutoff=0.75)
+
+    def hits(self, terms):
+        """Subquery of (id, rank) for matching medications, best first by rank"""
+        groups = [[term] for term in terms]
+        match = self._match(groups)
+        if not self._has_hits(match):
+            corrected = [self._corrections(term) or [term] for term in terms]
+            if corrected != groups:
+                match = self._match(corrected)
+
+        weights = ', '.join(str(weight) for weight in self.WEIGHTS)
+        return text(
+            f"SELECT rowid AS id, bm25(medication_search, {weights}) AS rank "
+            "FROM medication_search WHERE medication_search MATCH :match"
+        ).bindparams(match=match).columns(id=Integer, rank=Float).subquery('search_hits')
+
+
+class PostgresSearch:
+    """Weighted tsvector column with a GIN index, plus trigram fallback"""
+
+    INSTALL = [
+        "ALTER TABLE medications ADD COLUMN IF NOT EXISTS search_vector tsvector",
+        """
+        CREATE OR REPLACE FUNCTION medications_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(
+                    (SELECT name FROM categories WHERE id = NEW.category_id), '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C') ||
+                setweight(to_tsvector('simple', coalesce(NEW.dosage_instructions, '')), 'D');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS medications_search_vector_update ON medications",
+        "CREATE TRIGGER medications_search_vector_update "
+        "BEFORE INSERT OR UPDATE OF name, description, dosage_instructions, category_id ON medications "
+        "FOR EACH ROW EXECUTE FUNCTION medications_search_vector()",
+        """
+        CREATE OR REPLACE FUNCTION categories_search_vector() RETURNS trigger AS $$
+        BEGIN
+            -- Touch the category's medications so their vectors pick up the
+            -- new name; other column updates leave them alone
+            IF NEW.name IS DISTINCT FROM OLD.name THEN
+                UPDATE medications SET name = name WHERE category_id = NEW.id;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS categories_search_vector_update ON categories",
+        "CREATE TRIGGER categories_search_vector_update AFTER UPDATE OF name ON categories "
+        "FOR EACH ROW EXECUTE FUNCTION categories_search_vector()",
+        "CREATE INDEX IF NOT EXISTS ix_medications_search_vector ON medications USING GIN (search_vector)",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_medications_name_trgm ON medications USING GIN (name gin_trgm_ops)",
+        # Backfill rows created before the trigger existed
+        "UPDATE medications SET name = name WHERE search_vector IS NULL",
+    ]
+
+    UNINSTALL = [
+        "DROP TRIGGER IF EXISTS categories_search_vector_update ON categories",
+        "DROP FUNCTION IF EXISTS categories_search_vector()",
+        "DROP TRIGGER IF EXISTS medications_search_vector_update ON medications",
+        "DROP FUNCTION IF EXISTS medications_search_vector()",
+        "DROP INDEX IF EXISTS ix_medications_name_trgm",
+        "DROP INDEX IF EXISTS ix_medications_search_vector",
+        "ALTER TABLE medications DROP COLUMN IF EXISTS search_vector",
+    ]
+
+    def install(self, connection):
+        for statement in self.INSTALL:
+            connection.exec_driver_sql(statement)
+
+    def uninstall(self, connection):
+        for statement in self.UNINSTALL:
+            connection.exec_driver_sql(statement)
+
+    def rebuild(self, connection):
+        connection.exec_driver_sql("UPDATE medications SET name = name")
+
+    def hits(self, terms):
+        """Subquery of (id, rank) for matching medications, best first by rank"""
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        has_hits = db.session.execute(
+            text("SELECT 1 FROM medications WHERE search_vector @@ to_tsquery('simple', :tsquery) LIMIT 1"),
+            {'tsquery': tsquery}
+        ).first() is not None
+
+        if has_hits:
+            statement = text(
+                "SELECT id, -ts_rank(search_vector, to_tsquery('simple', :tsquery)) AS rank "
+                "FROM medications WHERE search_vector @@ to_tsquery('simple', :tsquery)"
+            ).bindparams(tsquery=tsquery)
+        else:
+            statement = text(
+                "SELECT id, -similarity(name, :phrase) AS rank FROM medications WHERE name % :phrase"
+            ).bindparams(phrase=' '.join(terms))
+        return statement.columns(id=Integer, rank=Float).subquery('search_hits')
+
+
+class LikeSearch:
+    """Unindexed fallback for other databases"""
+
+    def install(self, connection):
+        pass
+
+    def uninstall(self, connection):
+        pass
+
+    def rebuild(self, connection):
+        pass
+
+    def hits(self, terms):
+        conditions = []
+        for term in terms:
+            pattern = f'%{term}%'
+            conditions.append(or_(
+                Medication.name.ilike(pattern),
+                Medication.description.ilike(pattern),
+                Medication.dosage_instructions.ilike(pattern),
+                Category.name.ilike(pattern)
+            ))
+        return db.session.query(
+            Medication.id.label('id'), db.literal(0.0).label('rank')
+        ).outerjoin(Category, Category.id == Medication.category_id).filter(*conditions).subquery('search_hits')
+
+
+_BACKENDS = {'sqlite': SQLiteSearch(), 'postgresql': PostgresSearch()}
+_FALLBACK = LikeSearch()
+
+
+def backend_for(dialect_name):
+    """Search implementation for a SQLAlchemy dialect name"""
+    return _BACKENDS.get(dialect_name, _FALLBACK)
+
+
+def _current_backend():
+    return backend_for(db.session.get_bind().dialect.name)
+
+
+def apply_search(query, query_text):
+    """
+    Restrict a Medication query to search matches, best matches first
+
+    Returns the query unchanged if the text contains no searchable terms.
+    """
+    terms = search_terms(query_text)
+    if not terms:
+        return query
+    hits = _current_backend().hits(terms)
+    return query.join(hits, hits.c.id == Medication.id).order_by(None).order_by(hits.c.rank, Medication.id)
+
+
+def rebuild_search_index():
+    """Re-index every medication (after restoring a dump, for example)"""
+    connection = db.session.connection()
+    backend_for(connection.dialect.name).rebuild(connection)
+    db.session.commit()
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _install_search(target, connection, **kw):
+    backend_for(connection.dialect.name).install(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _uninstall_search(target, connection, **kw):
+    backend_for(connection.dialect.name).uninstall(connection)
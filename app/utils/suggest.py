@@ -0,0 +1,200 @@
+"""
+Per-process typeahead index for the search box
+
+Medication and category names are held in a sorted array of prefix keys,
+one per word start ("Amoxicillin Capsules" is found by "amox" and by
+"caps"), so a suggestion lookup is a binary search plus a short scan and
+never touches the database.
+
+The index is built at startup and updated in place by the admin routes that
+create, rename or delete medications and categories. Each gunicorn worker
+holds its own copy, so those in-place updates only reach the worker that
+handled the write: the others (and writes made outside the API, such as
+seeding or scripts) catch up on their next full rebuild, run in a
+background thread at most every SUGGEST_REBUILD_SECONDS. Suggestions may
+therefore lag the catalogue by up to that interval.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from flask import current_app
+from app import db
+
+logger = logging.getLogger(__name__)
+
+_WORD_START_RE = re.compile(r'\b\w', re.UNICODE)
+
+
+def normalize(text):
+    """Case- and whitespace-insensitive form used for keys and queries"""
+    return ' '.join((text or '').casefold().split())
+
+
+class PrefixIndex:
+    """Sorted array of (key, position, kind, id) entries, one per word start"""
+
+    def __init__(self):
+        self._entries = []
+        self._names = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def _keys(name):
+        normalized = normalize(name)
+        return [(normalized[match.start():], match.start()) for match in _WORD_START_RE.finditer(normalized)]
+
+    def add(self, kind, item_id, name):
+        """Index an item, replacing any previous name it had"""
+        self.remove(kind, item_id)
+        self._names[(kind, item_id)] = name
+        for key, position in self._keys(name):
+            bisect.insort(self._entries, (key, position, kind, item_id))
+
+    def remove(self, kind, item_id):
+        name = self._names.pop((kind, item_id), None)
+        if name is None:
+            return
+        for key, position in self._keys(name):
+            entry = (key, position, kind, item_id)
+            index = bisect.bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+
+    @classmethod
+    def build(cls, items):
+        """Index an iterable of (kind, id, name) in one sort"""
+        index = cls()
+        for kind, item_id, name in items:
+            index._names[(kind, item_id)] = name
+            index._entries.extend((key, position, kind, item_id) for key, position in cls._keys(name))
+        index._entries.sort()
+        return index
+
+    def lookup(self, prefix, limit=10, max_scan=500):
+        """
+        Items whose name has a word starting with ``prefix``
+
+        Names that start with the prefix come first, then shorter names.
+        At most ``max_scan`` index entries are examined, which bounds the cost
+        of one- or two-letter prefixes on a large catalogue.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        best = {}
+        start = bisect.bisect_left(self._entries, (prefix,))
+        for key, position, kind, item_id in self._entries[start:start + max_scan]:
+            if not key.startswith(prefix):
+                break
+            name = self._names[(kind, item_id)]
+            rank = (position > 0, len(name), name.casefold(), kind, item_id)
+            if (kind, item_id) not in best or rank < best[(kind, item_id)]:
+                best[(kind, item_id)] = rank
+
+        ranked = sorted(best.items(), key=lambda item: item[1])[:limit]
+        return [
+            {'type': kind, 'id': item_id, 'name': self._names[(kind, item_id)]}
+            for (kind, item_id), _ in ranked
+        ]
+
+
+class SuggestionIndex:
+    """Typeahead index for one process, with periodic background rebuilds"""
+
+    def __init__(self, app, rebuild_interval=60, retry_interval=30):
+        self.app = app
+        self.rebuild_interval = rebuild_interval
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._index = PrefixIndex()
+        self._built_at = None
+        self._retry_at = None
+        self._rebuilding = False
+
+    def _load(self):
+        from app.models.medication import Category, Medication
+        items = [('medication', row.id, row.name) for row in db.session.query(Medication.id, Medication.name)]
+        items += [('category', row.id, row.name) for row in db.session.query(Category.id, Category.name)]
+        return PrefixIndex.build(items)
+
+    def rebuild(self):
+        """Rebuild from the database (needs an app context)"""
+        index = self._load()
+        with self._lock:
+            self._index = index
+            self._built_at = time.monotonic()
+        return len(index)
+
+    def suggest(self, prefix, limit=10):
+        """Top ``limit`` suggestions for a prefix"""
+        self._maybe_rebuild()
+        with self._lock:
+            return self._index.lookup(prefix, limit=limit)
+
+    def add(self, kind, item_id, name):
+        with self._lock:
+            self._index.add(kind, item_id, name)
+
+    def remove(self, kind, item_id):
+        with self._lock:
+            self._index.remove(kind, item_id)
+
+    def _maybe_rebuild(self):
+        if self._built_at is None:
+            # Startup build failed (e.g. tables not created yet): build inline,
+            # backing off between attempts so a broken database isn't hit on
+            # every keystroke. Lookups return nothing until a build succeeds.
+            if self._retry_at is not None and time.monotonic() < self._retry_at:
+                return
+            try:
+                self.rebuild()
+            except Exception as e:
+                db.session.rollback()
+                self._retry_at = time.monotonic() + self.retry_interval
+                logger.error("Error building suggestion index: %s", e)
+            return
+
+        if time.monotonic() - self._built_at < self.rebuild_interval or self._rebuilding:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def _rebuild_in_background(self):
+        try:
+            with self.app.app_context():
+                self.rebuild()
+        except Exception as e:
+            logger.error("Error rebuilding suggestion index: %s", e)
+        finally:
+            self._rebuilding = False
+
+    def warm(self):
+        """Build at startup; failures are retried on the first lookup"""
+        try:
+            with self.app.app_context():
+                count = self.rebuild()
+            logger.info("Suggestion index built with %s names", count)
+        except Exception as e:
+            logger.warning("Suggestion index not built at startup: %s", e)
+
+
+def init_app(app):
+    app.config.setdefault('SUGGEST_REBUILD_SECONDS', 60)
+    app.config.setdefault('SUGGEST_RETRY_SECONDS', 30)
+    app.extensions['suggestions'] = SuggestionIndex(
+        app,
+        rebuild_interval=app.config['SUGGEST_REBUILD_SECONDS'],
+        retry_interval=app.config['SUGGEST_RETRY_SECONDS'],
+    )
+
+
+def get_suggestion_index():
+    return current_app.extensions['suggestions']
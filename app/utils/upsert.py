@@ -0,0 +1,106 @@
+"""
+Single-statement "insert or increment" and "insert if absent" helpers
+
+PostgreSQL and SQLite both support INSERT ... ON CONFLICT, which lets rows
+be created or counters bumped atomically without a select-then-insert race.
+Other dialects fall back to UPDATE followed by INSERT, or to an INSERT in a
+savepoint.
+"""
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+
+def _dialect_insert(dialect_name):
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert
+    return None
+
+
+def upsert_increment(model, keys, increments, values=None):
+    """
+    Insert a row or add to its counters if it already exists
+
+    Args:
+        model: SQLAlchemy model; ``keys`` must match a unique constraint on it
+        keys (dict): Column values identifying the row
+        increments (dict): Column -> amount added to the existing value, used as
+            the initial value when the row is created
+        values (dict, optional): Column -> value set on both insert and update
+            (e.g. updated_at)
+    """
+    table = model.__table__
+    values = values or {}
+    dialect_insert = _dialect_insert(db.session.get_bind().dialect.name)
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(**keys, **increments, **values)
+        set_ = {column: table.c[column] + stmt.excluded[column] for column in increments}
+        set_.update(values)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=set_))
+        return
+
+    set_ = {column: table.c[column] + amount for column, amount in increments.items()}
+    set_.update(values)
+    stmt = update(table).where(*[table.c[column] == value for column, value in keys.items()]).values(set_)
+    if db.session.execute(stmt).rowcount == 0:
+        db.session.execute(insert(table).values(**keys, **increments, **values))
+
+
+def upsert_increment_many(model, keys, increments):
+    """
+    Insert or increment several rows in one statement
+
+    Args:
+        model: SQLAlchemy model; each key dict must match a unique constraint on it
+        keys (list): Column values identifying each row; duplicates are merged
+        increments (dict): Column -> amount added to every row
+    """
+    if not keys:
+        return
+    table = model.__table__
+    # One row per key (PostgreSQL rejects a statement touching a row twice),
+    # in a fixed order so concurrent writers lock rows alike
+    rows = sorted({tuple(sorted(key.items())): key for key in keys}.items())
+    rows = [{**key, **increments} for _, key in rows]
+    dialect_insert = _dialect_insert(db.session.get_bind().dialect.name)
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(rows)
+        set_ = {column: table.c[column] + stmt.excluded[column] for column in increments}
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(keys[0]), set_=set_))
+        return
+
+    for row in rows:
+        upsert_increment(model, {column: row[column] for column in keys[0]}, increments)
+
+
+def insert_if_absent(model, values, index_elements, index_where=None):
+    """
+    Insert a row unless it would conflict with a unique index
+
+    Args:
+        model: SQLAlchemy model
+        values (dict): Column values of the new row
+        index_elements (list): Columns of the unique index guarding the row
+        index_where: Predicate of a partial unique index, if it is one
+    """
+    table = model.__table__
+    dialect_insert = _dialect_insert(db.session.get_bind().dialect.name)
+
+    if dialect_insert is not None:
+        stmt = dialect_insert(table).values(**values).on_conflict_do_nothing(
+            index_elements=index_elements, index_where=index_where)
+        db.session.execute(stmt)
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(**values))
+    except IntegrityError:
+        # Someone else inserted it first
+        pass
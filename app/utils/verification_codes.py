@@ -0,0 +1,176 @@
+"""
+Password reset verification code store
+
+Codes are kept in a store shared by every worker: the ``verification_codes``
+table (the default) or Redis. Only an HMAC of the code is stored. Each code
+has an attempt counter that is bumped atomically before comparing, so
+guesses racing in different workers still count against the same limit.
+
+Expired rows are removed by a bulk DELETE on the indexed expiry column,
+which runs periodically when codes are stored and from
+``flask purge-verification-codes``. Redis expires keys by itself.
+"""
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, update
+from app import db
+from app.models.verification_code import VerificationCode
+from app.utils.upsert import upsert_increment
+
+
+class SQLCodeStore:
+    """Store codes in the verification_codes table"""
+
+    def __init__(self, sweep_seconds=600):
+        self.sweep_seconds = sweep_seconds
+        self._last_sweep = time.monotonic()
+
+    def save(self, email, code_hash, ttl):
+        now = datetime.utcnow()
+        upsert_increment(VerificationCode, {'email': email}, {}, {
+            'code_hash': code_hash,
+            'attempts': 0,
+            'expires_at': now + timedelta(seconds=ttl),
+            'created_at': now
+        })
+        db.session.commit()
+
+        if time.monotonic() - self._last_sweep > self.sweep_seconds:
+            self._last_sweep = time.monotonic()
+            self.purge_expired()
+
+    def check(self, email, code_hash, max_attempts):
+        now = datetime.utcnow()
+        # Count the attempt first; no row means missing, expired or locked out
+        claimed = db.session.execute(
+            update(VerificationCode).where(
+                VerificationCode.email == email,
+                VerificationCode.expires_at > now,
+                VerificationCode.attempts < max_attempts
+            ).values(attempts=VerificationCode.attempts + 1)
+        ).rowcount
+        if not claimed:
+            db.session.commit()
+            return False
+
+        stored_hash = db.session.query(VerificationCode.code_hash).filter_by(email=email).scalar()
+        db.session.commit()
+        return stored_hash is not None and hmac.compare_digest(stored_hash, code_hash)
+
+    def delete(self, email):
+        db.session.execute(delete(VerificationCode).where(VerificationCode.email == email))
+        db.session.commit()
+
+    def purge_expired(self):
+        result = db.session.execute(
+            delete(VerificationCode).where(VerificationCode.expires_at <= datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount
+
+
+class RedisCodeStore:
+    """
+    Store codes in Redis with key expiry
+
+    Works with any client exposing the redis-py ``get``/``set``/``delete``/``incr`` API.
+    """
+
+    def __init__(self, client, prefix='winal:verify:'):
+        self.client = client
+        self.prefix = prefix
+
+    def _keys(self, email):
+        key = self.prefix + email
+        return key, key + ':attempts'
+
+    def save(self, email, code_hash, ttl):
+        code_key, attempts_key = self._keys(email)
+        self.client.set(code_key, code_hash, ex=ttl)
+        self.client.set(attempts_key, '0', ex=ttl)
+
+    def check(self, email, code_hash, max_attempts):
+        code_key, attempts_key = self._keys(email)
+        stored_hash = self.client.get(code_key)
+        if stored_hash is None:
+            return False
+        if self.client.incr(attempts_key) > max_attempts:
+            return False
+        if isinstance(stored_hash, bytes):
+            stored_hash = stored_hash.decode('utf-8')
+        return hmac.compare_digest(stored_hash, code_hash)
+
+    def delete(self, email):
+        self.client.delete(*self._keys(email))
+
+    def purge_expired(self):
+        # Redis drops expired keys itself
+        return 0
+
+
+class VerificationCodes:
+    """Flask extension storing password reset codes"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, store=None):
+        app.config.setdefault('VERIFICATION_CODE_STORE', 'sql')
+        app.config.setdefault('VERIFICATION_CODE_REDIS_URL', app.config.get('CACHE_REDIS_URL'))
+        app.config.setdefault('VERIFICATION_CODE_TTL_MINUTES', 15)
+        app.config.setdefault('VERIFICATION_CODE_MAX_ATTEMPTS', 5)
+        app.config.setdefault('VERIFICATION_CODE_SWEEP_SECONDS', 600)
+
+        if store is None:
+            store = self._create_store(app.config)
+        app.extensions['verification_codes'] = store
+
+    @staticmethod
+    def _create_store(config):
+        store_type = config['VERIFICATION_CODE_STORE']
+        if store_type == 'sql':
+            return SQLCodeStore(sweep_seconds=config['VERIFICATION_CODE_SWEEP_SECONDS'])
+        if store_type == 'redis':
+            # Optional dependency, only needed when Redis is configured
+            import redis
+            return RedisCodeStore(redis.Redis.from_url(config['VERIFICATION_CODE_REDIS_URL']))
+        raise ValueError(f'Unknown VERIFICATION_CODE_STORE: {store_type}')
+
+    @property
+    def backend(self):
+        return current_app.extensions['verification_codes']
+
+    @staticmethod
+    def _hash(email, code):
+        key = current_app.config['SECRET_KEY'].encode('utf-8')
+        return hmac.new(key, f'{email}:{code}'.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def store(self, email, code, expiry_minutes=None):
+        """Store a code for an email, replacing any previous one"""
+        if expiry_minutes is None:
+            expiry_minutes = current_app.config['VERIFICATION_CODE_TTL_MINUTES']
+        self.backend.save(email.lower(), self._hash(email.lower(), code), int(expiry_minutes * 60))
+
+    def verify(self, email, code):
+        """Return True if the code matches, is unexpired and attempts remain"""
+        email = email.lower()
+        return self.backend.check(
+            email,
+            self._hash(email, str(code)),
+            current_app.config['VERIFICATION_CODE_MAX_ATTEMPTS']
+        )
+
+    def clear(self, email):
+        """Remove the code for an email after it was used"""
+        self.backend.delete(email.lower())
+
+    def purge_expired(self):
+        """Delete expired codes; returns the number removed"""
+        return self.backend.purge_expired()
+
+
+verification_codes = VerificationCodes()
@@ -0,0 +1,189 @@
+"""
+Benchmark the hot query predicates with and without their indexes.
+
+Seeds a separate database (a local SQLite file by default) with a
+realistic amount of data, then runs each hot query with the indexes from
+the models dropped and again with them created, printing the query plan
+and the median latency of each.
+
+Usage:
+    python benchmark_indexes.py [--url sqlite:///benchmark_indexes.db] [--users 2000] [--runs 50]
+
+Never point --url at a real database: all tables are dropped and re-seeded.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, date, time as dt_time
+
+parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+parser.add_argument('--url', default='sqlite:///benchmark_indexes.db', help='Database to seed (dropped first)')
+parser.add_argument('--users', type=int, default=2000, help='Number of users to seed')
+parser.add_argument('--medications', type=int, default=5000, help='Number of medications to seed')
+parser.add_argument('--runs', type=int, default=50, help='Timed runs per query')
+args = parser.parse_args()
+
+# The testing config reads its database URL from the environment at import
+os.environ['TEST_DATABASE_URL'] = args.url
+
+from sqlalchemy import insert, text
+from app import create_app, db
+from app.models.user import User
+from app.models.medication import Category, Medication, MedicationImage
+from app.models.cart import Cart, CartItem, Order, OrderItem
+from app.models.farm_activity import FarmActivity
+from app.models.appointment import Appointment
+
+app = create_app('testing')
+
+# Indexes under test, as declared on the models
+INDEXED_TABLES = [Cart, CartItem, Order, OrderItem, Medication, MedicationImage, Appointment]
+
+QUERIES = [
+    ('active cart', 'SELECT id FROM carts WHERE user_id = :user_id AND status = \'active\''),
+    ('cart item', 'SELECT id, quantity FROM cart_items WHERE cart_id = :cart_id AND medication_id = :medication_id'),
+    ('order history page', 'SELECT id, order_date FROM orders WHERE user_id = :user_id '
+                           'ORDER BY order_date, id LIMIT 20'),
+    ('order items', 'SELECT id, name, price, quantity FROM order_items WHERE order_id = :order_id'),
+    ('revenue for a day', 'SELECT SUM(total_amount) FROM orders WHERE order_date >= :day_start '
+                          'AND order_date < :day_end AND status != \'cancelled\''),
+    ('medications by category', 'SELECT id, name FROM medications WHERE category_id = :category_id'),
+    ('medications by type', 'SELECT id, name FROM medications WHERE medication_type = \'animal\' '
+                            'ORDER BY created_at, id LIMIT 20'),
+    ('low stock', 'SELECT id, name, stock_quantity FROM medications WHERE stock_quantity <= 10 '
+                  'ORDER BY stock_quantity'),
+    ('price range', 'SELECT id, name FROM medications WHERE price >= 20 AND price <= 25'),
+    ('prescription only', 'SELECT id, name FROM medications WHERE requires_prescription = :requires_prescription'),
+    ('primary image', 'SELECT image_url FROM medication_images WHERE medication_id = :medication_id '
+                      'AND is_primary = :is_primary'),
+    ('user appointments', 'SELECT id FROM appointments WHERE user_id = :user_id ORDER BY created_at, id LIMIT 20'),
+]
+
+
+def seed():
+    """Drop everything and insert the benchmark dataset with bulk inserts"""
+    random.seed(42)
+    db.drop_all()
+    db.create_all()
+    now = datetime.utcnow()
+
+    db.session.execute(insert(User), [{
+        'email': f'user{i}@example.com', 'password_hash': 'x', 'first_name': 'User',
+        'last_name': str(i), 'is_admin': False, 'created_at': now, 'updated_at': now
+    } for i in range(args.users)])
+    db.session.execute(insert(Category), [{
+        'name': f'Category {i}', 'medication_type': 'human' if i % 2 else 'animal'
+    } for i in range(40)])
+    db.session.execute(insert(Medication), [{
+        'name': f'Medication {i}', 'price': round(random.uniform(1, 200), 2),
+        'stock_quantity': random.randint(0, 500), 'requires_prescription': random.random() < 0.1,
+        'medication_type': random.choice(['human', 'animal']),
+        'category_id': random.randint(1, 40), 'created_at': now - timedelta(minutes=i), 'updated_at': now
+    } for i in range(args.medications)])
+    db.session.execute(insert(MedicationImage), [{
+        'medication_id': medication_id, 'image_url': f'https://example.com/{medication_id}/{n}.jpg',
+        'is_primary': n == 0, 'created_at': now
+    } for medication_id in range(1, args.medications + 1) for n in range(3)])
+    db.session.execute(insert(FarmActivity), [{
+        'name': f'Activity {i}', 'description': 'Benchmark', 'price': 50.0, 'duration': 60,
+        'created_at': now, 'updated_at': now
+    } for i in range(10)])
+
+    orders = []
+    for i in range(args.users * 10):
+        orders.append({
+            'user_id': random.randint(1, args.users), 'total_amount': round(random.uniform(5, 500), 2),
+            'payment_method': 'cash', 'shipping_address': 'Kampala',
+            'status': random.choice(['pending', 'paid', 'delivered', 'cancelled']),
+            'order_date': now - timedelta(minutes=random.randint(0, 60 * 24 * 365)),
+            'updated_at': now, 'stock_reserved': True
+        })
+    db.session.execute(insert(Order), orders)
+    db.session.execute(insert(OrderItem), [{
+        'order_id': order_id, 'item_id': random.randint(1, args.medications), 'item_type': 'medication',
+        'name': 'Medication', 'price': 10.0, 'quantity': 1, 'created_at': now
+    } for order_id in range(1, len(orders) + 1) for _ in range(3)])
+
+    db.session.execute(insert(Cart), [{
+        'user_id': user_id, 'status': status, 'created_at': now, 'updated_at': now
+    } for user_id in range(1, args.users + 1) for status in ('completed', 'completed', 'active')])
+    db.session.execute(insert(CartItem), [{
+        'cart_id': cart_id, 'medication_id': medication_id, 'quantity': 1, 'created_at': now, 'updated_at': now
+    } for cart_id in range(1, args.users * 3 + 1)
+        for medication_id in random.sample(range(1, args.medications + 1), 5)])
+
+    db.session.execute(insert(Appointment), [{
+        'user_id': random.randint(1, args.users), 'farm_activity_id': random.randint(1, 10),
+        'appointment_date': date.today(), 'appointment_time': dt_time(10, 0), 'status': 'pending',
+        'total_amount': 50.0, 'payment_status': 'unpaid', 'created_at': now - timedelta(minutes=i),
+        'updated_at': now
+    } for i in range(args.users * 5)])
+    db.session.commit()
+
+
+def set_indexes(enabled):
+    """Create or drop every index declared on the benchmarked models"""
+    bind = db.engine
+    for model in INDEXED_TABLES:
+        for index in model.__table__.indexes:
+            if enabled:
+                index.create(bind, checkfirst=True)
+            else:
+                index.drop(bind, checkfirst=True)
+    with bind.begin() as conn:
+        conn.execute(text('ANALYZE'))
+
+
+def explain(sql, params):
+    """Return the database's query plan for a statement"""
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params).all()
+        return '; '.join(row[-1] for row in rows)
+    rows = db.session.execute(text(f'EXPLAIN {sql}'), params).all()
+    return '\n    '.join(row[0] for row in rows)
+
+
+def measure(sql, params):
+    """Median latency in milliseconds over --runs executions"""
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        db.session.execute(text(sql), params).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    with app.app_context():
+        print(f'Seeding {args.url} ...')
+        started = time.perf_counter()
+        seed()
+        print(f'Seeded in {time.perf_counter() - started:.1f}s\n')
+
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        params = {
+            'user_id': args.users // 2, 'cart_id': args.users, 'medication_id': args.medications // 2,
+            'order_id': args.users * 5, 'category_id': 7, 'is_primary': True, 'requires_prescription': True,
+            'day_start': today, 'day_end': today + timedelta(days=1)
+        }
+
+        results = {}
+        for enabled in (False, True):
+            # End the session's transaction so it sees the schema change
+            db.session.commit()
+            set_indexes(enabled)
+            for name, sql in QUERIES:
+                results[(name, enabled)] = (explain(sql, params), measure(sql, params))
+
+        for name, _ in QUERIES:
+            plan_before, before = results[(name, False)]
+            plan_after, after = results[(name, True)]
+            print(f'{name}: {before:.3f} ms -> {after:.3f} ms ({before / max(after, 1e-6):.1f}x)')
+            print(f'  without indexes: {plan_before}')
+            print(f'  with indexes:    {plan_after}')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,75 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Logs are written as JSON lines ('json' or 'text') by a background
+    # thread; LOG_REQUEST_SAMPLE_RATE keeps that fraction of access records
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_REQUEST_SAMPLE_RATE = float(os.environ.get('LOG_REQUEST_SAMPLE_RATE', 1.0))
+    
+    # /metrics (Prometheus text format): bearer token required when set,
+    # and the endpoint is disabled without one if METRICS_REQUIRE_TOKEN;
+    # statements slower than SLOW_QUERY_MS are logged, and
+    # METRICS_SERVER_TIMING adds a Server-Timing header (db vs app time)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_REQUIRE_TOKEN = os.environ.get('METRICS_REQUIRE_TOKEN', 'false').lower() == 'true'
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+    METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', 'false').lower() == 'true'
+    
+    # Run db.create_all() in create_app; production relies on `flask db upgrade`
+    BOOT_CREATE_SCHEMA = os.environ.get('BOOT_CREATE_SCHEMA', 'true').lower() == 'true'
+    
+    # Connection pool for server databases (see app/utils/db_pool.py). Pool
+    # size and overflow default to the gunicorn threads per worker; set
+    # DB_MAX_CONNECTIONS to the provider's limit to cap all workers together
+    DB_POOL_SIZE = os.environ.get('DB_POOL_SIZE')
+    DB_MAX_OVERFLOW = os.environ.get('DB_MAX_OVERFLOW')
+    DB_MAX_CONNECTIONS = os.environ.get('DB_MAX_CONNECTIONS')
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 280))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+    
+    # Response cache for the public catalogue ('memory', 'database', 'redis' or 'null');
+    # 'memory' is per process and refused with more than one gunicorn worker
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'memory')
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 60))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    
+    # Read dashboard order totals from the daily_order_stats rollup
+    # (run `flask rebuild-order-stats` once before enabling)
+    DASHBOARD_USE_ROLLUP = os.environ.get('DASHBOARD_USE_ROLLUP', 'false').lower() == 'true'
+    
+    # How often each process pulls new revocations into its in-memory JWT
+    # blocklist filter, how often expired entries are purged, and how far back
+    # each refresh re-reads (ids can commit out of order)
+    JWT_BLOCKLIST_REFRESH_SECONDS = int(os.environ.get('JWT_BLOCKLIST_REFRESH_SECONDS', 5))
+    JWT_BLOCKLIST_PURGE_SECONDS = int(os.environ.get('JWT_BLOCKLIST_PURGE_SECONDS', 3600))
+    JWT_BLOCKLIST_REFRESH_OVERLAP_SECONDS = int(os.environ.get('JWT_BLOCKLIST_REFRESH_OVERLAP_SECONDS', 60))
+    
+    # Each worker holds its own typeahead index and rebuilds it this often to
+    # pick up catalogue changes made by other workers; a failed build is
+    # retried after SUGGEST_RETRY_SECONDS
+    SUGGEST_REBUILD_SECONDS = int(os.environ.get('SUGGEST_REBUILD_SECONDS', 60))
+    SUGGEST_RETRY_SECONDS = int(os.environ.get('SUGGEST_RETRY_SECONDS', 30))
+    
+    # Emails are queued in the email_outbox table and delivered by a
+    # background thread; set EMAIL_OUTBOX_WORKER=false when a separate
+    # `flask drain-outbox --forever` process does the sending. Of several
+    # workers, only the holder of the poller lease polls for due messages
+    EMAIL_OUTBOX_ENABLED = os.environ.get('EMAIL_OUTBOX_ENABLED', 'true').lower() == 'true'
+    EMAIL_OUTBOX_WORKER = os.environ.get('EMAIL_OUTBOX_WORKER', 'true').lower() == 'true'
+    EMAIL_OUTBOX_POLLER_LEASE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_POLLER_LEASE_SECONDS', 30))
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    # Sent and failed messages are deleted after this many days
+    EMAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', 7))
+    
+    # Password reset codes are shared by all workers ('sql' or 'redis')
+    VERIFICATION_CODE_STORE = os.environ.get('VERIFICATION_CODE_STORE', 'sql')
+    VERIFICATION_CODE_REDIS_URL = os.environ.get('VERIFICATION_CODE_REDIS_URL') or CACHE_REDIS_URL
+    VERIFICATION_CODE_TTL_MINUTES = int(os.environ.get('VERIFICATION_CODE_TTL_MINUTES', 15))
+    VERIFICATION_CODE_MAX_ATTEMPTS = int(os.environ.get('VERIFICATION_CODE_MAX_ATTEMPTS', 5))
+    
     @staticmethod
     def init_app(app):
         pass
@@ -16,27 +85,31 @@ class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL')
 
+class TestingConfig(Config):
+    TESTING = True
+    BOOT_CREATE_SCHEMA = False  # Fixtures create the schema they need
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    EMAIL_OUTBOX_WORKER = False
+
 class ProductionConfig(Config):
     DEBUG = False
+    BOOT_CREATE_SCHEMA = os.environ.get('BOOT_CREATE_SCHEMA', 'false').lower() == 'true'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    # Invalidations must reach every worker
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'database')
+    # /metrics is served on the public port, so it needs a token here
+    METRICS_REQUIRE_TOKEN = os.environ.get('METRICS_REQUIRE_TOKEN', 'true').lower() == 'true'
     
     @classmethod
     def init_app(cls, app):
         Config.init_app(app)
         
-        # Handle Heroku/Render-style PostgreSQL URLs if needed
-        if cls.SQLALCHEMY_DATABASE_URI and cls.SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
-            cls.SQLALCHEMY_DATABASE_URI = cls.SQLALCHEMY_DATABASE_URI.replace('postgres://', 'postgresql://', 1)
+        # Handle Heroku/Render-style PostgreSQL URLs if needed (app.config was
+        # already loaded from the class, so fix the value there)
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+        if uri and uri.startswith('postgres://'):
+            app.config['SQLALCHEMY_DATABASE_URI'] = uri.replace('postgres://', 'postgresql://', 1)
             
-        # Production-specific configuration
-        import logging
-        from logging import StreamHandler
-        
-        # Log to stderr
-        file_handler = StreamHandler()
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        
         # Set production security headers
         @app.after_request
         def add_security_headers(response):
@@ -47,6 +120,7 @@ class ProductionConfig(Config):
 
 config = {
     'development': DevelopmentConfig,
+    'testing': TestingConfig,
     'production': ProductionConfig,
     'default': DevelopmentConfig
 }
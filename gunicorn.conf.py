@@ -0,0 +1,126 @@
+"""
+Gunicorn settings for the API
+
+Worker and thread counts are derived from the CPUs and memory available to
+the container unless set explicitly:
+
+- WEB_CONCURRENCY: worker processes (default: 2 x CPUs + 1, limited to what
+  fits in memory at GUNICORN_WORKER_MEMORY_MB each)
+- GUNICORN_WORKER_CLASS: ``gthread`` (default) or ``gevent``
+- GUNICORN_THREADS: request threads per gthread worker (default 4). Under
+  gevent it only sizes the database pool (default 10); concurrency comes
+  from GUNICORN_WORKER_CONNECTIONS.
+
+Both counts are exported to the environment before the app loads so the
+database pool is sized to match (see app/utils/db_pool.py).
+
+The app is preloaded in the master and forked, so boot work (imports, the
+suggestion index) is done once. Each worker then drops the inherited
+database connections and Gmail client, and starts its email outbox thread
+once the app is loaded. Under gevent the app is loaded in
+each worker after monkey-patching instead, and psycopg2 is made
+cooperative with ``psycogreen`` (both are in requirements.txt).
+"""
+import os
+
+CPU_WORKERS_PER_CORE = 2
+RESERVED_MEMORY_MB = 64
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _memory_mb():
+    """Memory limit of the container (cgroup v2, then v1), else physical memory"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # "max" (v2) and huge values (v1) mean no limit
+        if value.isdigit() and int(value) < 1 << 50:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers(cpus, memory_mb, worker_memory_mb=160):
+    """Workers for the CPU count, capped by how many fit in memory"""
+    workers = CPU_WORKERS_PER_CORE * cpus + 1
+    if memory_mb:
+        workers = min(workers, (memory_mb - RESERVED_MEMORY_MB) // worker_memory_mb)
+    return max(1, workers)
+
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY') or default_workers(
+    _cpu_count(), _memory_mb(), int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', 160))
+))
+threads = int(os.environ.get('GUNICORN_THREADS') or (10 if worker_class == 'gevent' else 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# Read by app/utils/db_pool.py when the app is created
+os.environ['WEB_CONCURRENCY'] = str(workers)
+os.environ['GUNICORN_THREADS'] = str(threads)
+
+# Objects created before gevent patches the worker (locks, queues) would
+# block the hub, so gevent workers load the app themselves
+preload_app = os.environ.get('GUNICORN_PRELOAD', str(worker_class != 'gevent')).lower() == 'true'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks can't accumulate
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# The heartbeat file lives on tmpfs so a slow disk can't get workers killed
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# The app writes its own access records (app.requests logger)
+accesslog = None
+errorlog = '-'
+
+
+def when_ready(server):
+    server.log.info("Serving with %s %s worker(s), %s thread(s)/connection(s) each",
+                    workers, worker_class, worker_connections if worker_class == 'gevent' else threads)
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen is not installed; database calls will block gevent workers")
+
+    if server.cfg.preload_app:
+        from app.utils.db_pool import dispose_after_fork
+        from app.utils.gmail_service import reset_gmail_service
+        dispose_after_fork(server.app.wsgi())
+        reset_gmail_service()
+
+
+def post_worker_init(worker):
+    # Deliver mail left pending by a restart without waiting for traffic
+    from app.utils.email_outbox import outbox
+    outbox.start(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # Finish the batch being sent rather than leaving it to the claim lease
+    app = getattr(worker, 'wsgi', None)
+    if app is not None:
+        from app.utils.email_outbox import outbox
+        outbox.stop(app, timeout=graceful_timeout / 2)
@@ -0,0 +1,126 @@
+"""Bring databases created by db.create_all up to the current models
+
+Adds the columns, tables and constraints introduced since the schema was
+last created. Every step checks the live schema first, because create_all
+at boot may already have created the new tables.
+
+Revision ID: 3f1a9c2d7b10
+Revises: 0c2e5a7f9d14
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b10'
+down_revision = '0c2e5a7f9d14'
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_table(table):
+    return _inspector().has_table(table)
+
+
+def _has_column(table, column):
+    return column in {c['name'] for c in _inspector().get_columns(table)}
+
+
+def _has_index(table, index):
+    return index in {i['name'] for i in _inspector().get_indexes(table)}
+
+
+def upgrade():
+    if not _has_column('token_blocklist', 'expires_at'):
+        with op.batch_alter_table('token_blocklist') as batch_op:
+            batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+    if not _has_index('token_blocklist', 'ix_token_blocklist_expires_at'):
+        op.create_index('ix_token_blocklist_expires_at', 'token_blocklist', ['expires_at'])
+
+    if not _has_column('orders', 'stock_reserved'):
+        with op.batch_alter_table('orders') as batch_op:
+            batch_op.add_column(sa.Column('stock_reserved', sa.Boolean(), nullable=False,
+                                          server_default=sa.false()))
+
+    # Merge duplicate cart rows into the oldest one before making them unique
+    if not _has_index('cart_items', 'uq_cart_items_cart_medication'):
+        op.execute("""
+            UPDATE cart_items SET quantity = (
+                SELECT SUM(c2.quantity) FROM cart_items c2
+                WHERE c2.cart_id = cart_items.cart_id AND c2.medication_id = cart_items.medication_id
+            )
+            WHERE id IN (
+                SELECT MIN(id) FROM cart_items GROUP BY cart_id, medication_id HAVING COUNT(*) > 1
+            )
+        """)
+        op.execute("""
+            DELETE FROM cart_items WHERE id NOT IN (
+                SELECT keep_id FROM (
+                    SELECT MIN(id) AS keep_id FROM cart_items GROUP BY cart_id, medication_id
+                ) AS keep
+            )
+        """)
+        op.create_index('uq_cart_items_cart_medication', 'cart_items',
+                        ['cart_id', 'medication_id'], unique=True)
+
+    if not _has_table('daily_order_stats'):
+        op.create_table(
+            'daily_order_stats',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('order_count', sa.Integer(), nullable=False),
+            sa.Column('cancelled_count', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('day')
+        )
+
+    if not _has_table('email_outbox'):
+        op.create_table(
+            'email_outbox',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('recipient', sa.String(length=255), nullable=False),
+            sa.Column('subject', sa.String(length=255), nullable=False),
+            sa.Column('html_content', sa.Text(), nullable=False),
+            sa.Column('text_content', sa.Text(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('sent_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_email_outbox_status_next_attempt', 'email_outbox',
+                        ['status', 'next_attempt_at'])
+
+    if not _has_table('verification_codes'):
+        op.create_table(
+            'verification_codes',
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('code_hash', sa.String(length=64), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('email')
+        )
+        op.create_index('ix_verification_codes_expires_at', 'verification_codes', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_verification_codes_expires_at', table_name='verification_codes')
+    op.drop_table('verification_codes')
+    op.drop_index('ix_email_outbox_status_next_attempt', table_name='email_outbox')
+    op.drop_table('email_outbox')
+    op.drop_table('daily_order_stats')
+    op.drop_index('uq_cart_items_cart_medication', table_name='cart_items')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('stock_reserved')
+    op.drop_index('ix_token_blocklist_expires_at', table_name='token_blocklist')
+    with op.batch_alter_table('token_blocklist') as batch_op:
+        batch_op.drop_column('expires_at')
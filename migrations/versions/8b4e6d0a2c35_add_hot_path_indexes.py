@@ -0,0 +1,45 @@
+"""Add indexes for the hot query predicates
+
+Revision ID: 8b4e6d0a2c35
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-17 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d0a2c35'
+down_revision = '3f1a9c2d7b10'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns); cart_items(cart_id, medication_id) is
+# covered by the unique index from the previous revision
+INDEXES = [
+    ('ix_carts_user_id_status', 'carts', ['user_id', 'status']),
+    ('ix_orders_user_id_order_date', 'orders', ['user_id', 'order_date', 'id']),
+    ('ix_orders_order_date_status', 'orders', ['order_date', 'status']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_medications_category_id', 'medications', ['category_id']),
+    ('ix_medications_medication_type', 'medications', ['medication_type']),
+    ('ix_medications_stock_quantity', 'medications', ['stock_quantity']),
+    ('ix_medications_created_at_id', 'medications', ['created_at', 'id']),
+    ('ix_medication_images_medication_id_is_primary', 'medication_images', ['medication_id', 'is_primary']),
+    ('ix_appointments_user_id_created_at', 'appointments', ['user_id', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # create_all at boot may already have created them
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
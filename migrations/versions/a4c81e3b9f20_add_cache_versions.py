@@ -0,0 +1,31 @@
+"""Add the shared response cache version table
+
+Revision ID: a4c81e3b9f20
+Revises: e1f93b6c0a47
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c81e3b9f20'
+down_revision = 'e1f93b6c0a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_all at boot may already have created it
+    if not sa.inspect(op.get_bind()).has_table('cache_versions'):
+        op.create_table(
+            'cache_versions',
+            sa.Column('key', sa.String(length=255), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('key')
+        )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,27 @@
+"""Index token_blocklist.created_at for the revocation refresh window
+
+Revision ID: b7d2f05c1e93
+Revises: a4c81e3b9f20
+Create Date: 2026-10-17 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2f05c1e93'
+down_revision = 'a4c81e3b9f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # create_all at boot may already have created it
+    if 'ix_token_blocklist_created_at' not in {i['name'] for i in inspector.get_indexes('token_blocklist')}:
+        op.create_index('ix_token_blocklist_created_at', 'token_blocklist', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_token_blocklist_created_at', table_name='token_blocklist')
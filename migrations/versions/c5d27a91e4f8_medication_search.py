@@ -0,0 +1,134 @@
+"""Add the medication full-text search index
+
+The DDL is a snapshot of app/utils/search.py at this revision, so later
+changes there do not alter what this migration does.
+
+Revision ID: c5d27a91e4f8
+Revises: 8b4e6d0a2c35
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d27a91e4f8'
+down_revision = '8b4e6d0a2c35'
+branch_labels = None
+depends_on = None
+
+
+_SQLITE_ROW_VALUES = ("NEW.id, NEW.name, (SELECT name FROM categories WHERE id = NEW.category_id), "
+                      "NEW.description, NEW.dosage_instructions")
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS medication_search USING fts5("
+    "name, category, description, dosage, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS medication_search_vocab USING fts5vocab(medication_search, 'row')",
+    "CREATE TRIGGER IF NOT EXISTS medications_search_insert AFTER INSERT ON medications BEGIN "
+    "INSERT INTO medication_search (rowid, name, category, description, dosage) "
+    f"VALUES ({_SQLITE_ROW_VALUES}); END",
+    "CREATE TRIGGER IF NOT EXISTS medications_search_delete AFTER DELETE ON medications BEGIN "
+    "DELETE FROM medication_search WHERE rowid = OLD.id; END",
+    "CREATE TRIGGER IF NOT EXISTS medications_search_update "
+    "AFTER UPDATE OF name, description, dosage_instructions, category_id ON medications BEGIN "
+    "DELETE FROM medication_search WHERE rowid = OLD.id; "
+    "INSERT INTO medication_search (rowid, name, category, description, dosage) "
+    f"VALUES ({_SQLITE_ROW_VALUES}); END",
+    "CREATE TRIGGER IF NOT EXISTS categories_search_update AFTER UPDATE OF name ON categories "
+    "WHEN NEW.name IS NOT OLD.name BEGIN "
+    "UPDATE medication_search SET category = NEW.name "
+    "WHERE rowid IN (SELECT id FROM medications WHERE category_id = NEW.id); END",
+]
+
+SQLITE_BACKFILL = [
+    "DELETE FROM medication_search",
+    "INSERT INTO medication_search (rowid, name, category, description, dosage) "
+    "SELECT m.id, m.name, c.name, m.description, m.dosage_instructions "
+    "FROM medications m LEFT JOIN categories c ON c.id = m.category_id",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS categories_search_update",
+    "DROP TRIGGER IF EXISTS medications_search_update",
+    "DROP TRIGGER IF EXISTS medications_search_delete",
+    "DROP TRIGGER IF EXISTS medications_search_insert",
+    "DROP TABLE IF EXISTS medication_search_vocab",
+    "DROP TABLE IF EXISTS medication_search",
+]
+
+POSTGRES_INSTALL = [
+    "ALTER TABLE medications ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION medications_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT name FROM categories WHERE id = NEW.category_id), '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C') ||
+            setweight(to_tsvector('simple', coalesce(NEW.dosage_instructions, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS medications_search_vector_update ON medications",
+    "CREATE TRIGGER medications_search_vector_update "
+    "BEFORE INSERT OR UPDATE OF name, description, dosage_instructions, category_id ON medications "
+    "FOR EACH ROW EXECUTE FUNCTION medications_search_vector()",
+    """
+    CREATE OR REPLACE FUNCTION categories_search_vector() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.name IS DISTINCT FROM OLD.name THEN
+            UPDATE medications SET name = name WHERE category_id = NEW.id;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS categories_search_vector_update ON categories",
+    "CREATE TRIGGER categories_search_vector_update AFTER UPDATE OF name ON categories "
+    "FOR EACH ROW EXECUTE FUNCTION categories_search_vector()",
+    "CREATE INDEX IF NOT EXISTS ix_medications_search_vector ON medications USING GIN (search_vector)",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_medications_name_trgm ON medications USING GIN (name gin_trgm_ops)",
+    # Backfill rows created before the trigger existed
+    "UPDATE medications SET name = name WHERE search_vector IS NULL",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS categories_search_vector_update ON categories",
+    "DROP FUNCTION IF EXISTS categories_search_vector()",
+    "DROP TRIGGER IF EXISTS medications_search_vector_update ON medications",
+    "DROP FUNCTION IF EXISTS medications_search_vector()",
+    "DROP INDEX IF EXISTS ix_medications_name_trgm",
+    "DROP INDEX IF EXISTS ix_medications_search_vector",
+    "ALTER TABLE medications DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def upgrade():
+    # Idempotent: create_all at boot may already have installed it
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        exists = sa.inspect(bind).has_table('medication_search')
+        for statement in SQLITE_INSTALL + ([] if exists else SQLITE_BACKFILL):
+            op.execute(statement)
+    elif bind.dialect.name == 'postgresql':
+        for statement in POSTGRES_INSTALL:
+            op.execute(statement)
+    # Other databases search with LIKE and need nothing
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        statements = SQLITE_UNINSTALL
+    elif bind.dialect.name == 'postgresql':
+        statements = POSTGRES_UNINSTALL
+    else:
+        statements = []
+    for statement in statements:
+        op.execute(statement)
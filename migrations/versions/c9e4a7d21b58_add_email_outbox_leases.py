@@ -0,0 +1,32 @@
+"""Add the email outbox poller lease table
+
+Revision ID: c9e4a7d21b58
+Revises: b7d2f05c1e93
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e4a7d21b58'
+down_revision = 'b7d2f05c1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_all at boot may already have created it
+    if not sa.inspect(op.get_bind()).has_table('email_outbox_leases'):
+        op.create_table(
+            'email_outbox_leases',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('holder', sa.String(length=255), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('email_outbox_leases')
@@ -0,0 +1,89 @@
+"""Allow at most one active cart per user
+
+Merges the items of duplicate active carts (left by concurrent first adds)
+into each user's oldest active cart, marks the duplicates abandoned, then
+adds a partial unique index on carts(user_id) WHERE status = 'active'.
+
+Revision ID: d3f6b8e2a710
+Revises: c9e4a7d21b58
+Create Date: 2026-10-17 15:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f6b8e2a710'
+down_revision = 'c9e4a7d21b58'
+branch_labels = None
+depends_on = None
+
+
+# Active carts other than their user's oldest one
+DUPLICATE_CARTS = """
+    SELECT c.id FROM carts c
+    WHERE c.status = 'active' AND c.id > (
+        SELECT MIN(c2.id) FROM carts c2 WHERE c2.status = 'active' AND c2.user_id = c.user_id
+    )
+"""
+
+# Active carts of users who have more than one
+MERGED_CARTS = """
+    SELECT id FROM carts WHERE status = 'active' AND user_id IN (
+        SELECT user_id FROM carts WHERE status = 'active' GROUP BY user_id HAVING COUNT(*) > 1
+    )
+"""
+
+# Lines for the same medication as cart_items, across its user's active carts
+SAME_LINES = """
+    FROM cart_items i JOIN carts c ON c.id = i.cart_id
+    WHERE c.status = 'active'
+      AND i.medication_id = cart_items.medication_id
+      AND c.user_id = (SELECT user_id FROM carts WHERE id = cart_items.cart_id)
+"""
+
+# The oldest active cart of the user owning cart_items.cart_id
+KEEPER_CART = """
+    SELECT MIN(c2.id) FROM carts c2
+    JOIN carts c1 ON c1.user_id = c2.user_id
+    WHERE c1.id = cart_items.cart_id AND c2.status = 'active'
+"""
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # create_all at boot may already have created it
+    if 'uq_carts_user_id_active' in {i['name'] for i in inspector.get_indexes('carts')}:
+        return
+
+    # Collapse each medication's lines across a user's active carts into the
+    # oldest line, which gets the summed quantity, so the moves below can't
+    # put the same medication in one cart twice
+    op.execute(f"""
+        UPDATE cart_items SET quantity = (SELECT SUM(i.quantity) {SAME_LINES})
+        WHERE cart_id IN ({MERGED_CARTS})
+          AND id = (SELECT MIN(i.id) {SAME_LINES})
+    """)
+    op.execute(f"""
+        DELETE FROM cart_items
+        WHERE cart_id IN ({MERGED_CARTS})
+          AND id > (SELECT MIN(i.id) {SAME_LINES})
+    """)
+    # Every remaining line is the only one for its medication
+    op.execute(f"""
+        UPDATE cart_items SET cart_id = ({KEEPER_CART})
+        WHERE cart_id IN ({DUPLICATE_CARTS})
+    """)
+    op.execute(f"""
+        UPDATE carts SET status = 'abandoned'
+        WHERE id IN (SELECT id FROM ({DUPLICATE_CARTS}) AS duplicates)
+    """)
+
+    op.create_index('uq_carts_user_id_active', 'carts', ['user_id'], unique=True,
+                    postgresql_where=sa.text("status = 'active'"),
+                    sqlite_where=sa.text("status = 'active'"))
+
+
+def downgrade():
+    op.drop_index('uq_carts_user_id_active', table_name='carts')
@@ -0,0 +1,37 @@
+"""Add indexes for the catalogue price and prescription filters
+
+Revision ID: e1f93b6c0a47
+Revises: c5d27a91e4f8
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f93b6c0a47'
+down_revision = 'c5d27a91e4f8'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns); in-stock filtering uses the existing
+# ix_medications_stock_quantity
+INDEXES = [
+    ('ix_medications_price', 'medications', ['price']),
+    ('ix_medications_requires_prescription', 'medications', ['requires_prescription']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # create_all at boot may already have created them
+        if name not in {index['name'] for index in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -1,15 +1,13 @@
 import os
+import time
+import click
 from dotenv import load_dotenv
 from app import create_app, db, migrate
 from app.models import User
 from flask_migrate import Migrate
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging is configured by create_app (see app/utils/log.py)
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
@@ -53,6 +51,46 @@ def create_admin():
     db.session.commit()
     print('Admin user created.')
 
+# Create CLI command for (re)building the dashboard order rollup
+@app.cli.command('rebuild-order-stats')
+def rebuild_order_stats():
+    """Recompute daily order statistics from the orders table."""
+    from app.models.order_stats import DailyOrderStats
+    days = DailyOrderStats.rebuild()
+    print(f'Rebuilt order statistics for {days} days.')
+
+# Create CLI command for delivering queued emails from a separate process
+@app.cli.command('drain-outbox')
+@click.option('--forever', is_flag=True, help='Keep polling for new emails.')
+def drain_outbox(forever):
+    """Deliver pending emails from the outbox."""
+    from app.utils.email_outbox import outbox
+    sent = 0
+    while True:
+        processed = outbox.drain()
+        sent += processed
+        if not processed:
+            if not forever:
+                break
+            time.sleep(app.config['EMAIL_OUTBOX_POLL_SECONDS'])
+    print(f'Processed {sent} emails.')
+
+# Create CLI command for deleting old sent and failed emails
+@app.cli.command('purge-outbox')
+def purge_outbox():
+    """Delete sent and failed emails past their retention."""
+    from app.utils.email_outbox import outbox
+    purged = outbox.purge()
+    print(f'Removed {purged} old emails from the outbox.')
+
+# Create CLI command for sweeping expired password reset codes
+@app.cli.command('purge-verification-codes')
+def purge_verification_codes():
+    """Delete expired password reset codes."""
+    from app.utils.verification_codes import verification_codes
+    removed = verification_codes.purge_expired()
+    print(f'Removed {removed} expired verification codes.')
+
 # Create a route to check if the API is running
 @app.route('/')
 def index():
@@ -181,4 +181,107 @@ def test_logout(client, auth_headers):
     
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert 'successfully logged out' in data['message'].lower()
\ No newline at end of file
+    assert 'successfully logged out' in data['message'].lower()
+def test_logout_revokes_token(client, auth_headers):
+    """A token cannot be used again after logout."""
+    response = client.post('/api/auth/logout', headers=auth_headers)
+    assert response.status_code == 200
+
+    response = client.get('/api/auth/token-debug', headers=auth_headers)
+    assert response.status_code == 401
+    data = json.loads(response.data)
+    assert data['error'] == 'token_revoked'
+
+def test_revocation_filter_skips_database_for_unrevoked_tokens(app):
+    """Unknown JTIs are rejected by the in-memory filter without a query."""
+    from app.utils.revocation import BloomFilter, get_revocation_cache
+
+    bloom = BloomFilter(capacity=1000)
+    for i in range(1000):
+        bloom.add(f'revoked-{i}')
+    assert all(f'revoked-{i}' in bloom for i in range(1000))
+    false_positives = sum(f'valid-{i}' in bloom for i in range(10000))
+    assert false_positives < 100
+
+    with app.app_context():
+        cache = get_revocation_cache()
+        cache.revoke('revoked-jti')
+        assert cache.is_revoked('revoked-jti')
+        assert not cache.is_revoked('valid-jti')
+
+def test_revocation_refresh_catches_out_of_order_ids(app):
+    """A revocation committed with a lower id than one already read is still picked up."""
+    from app.models import TokenBlocklist
+    from app.utils.revocation import get_revocation_cache
+
+    with app.app_context():
+        cache = get_revocation_cache()
+        db.session.add(TokenBlocklist(id=10, jti='committed-first'))
+        db.session.commit()
+        assert cache.is_revoked('committed-first')
+        assert cache._last_id == 10
+
+        # Another worker's transaction took id 5 earlier but commits only now
+        db.session.add(TokenBlocklist(id=5, jti='committed-late'))
+        db.session.commit()
+        cache._refreshed_at = None
+        assert cache.is_revoked('committed-late')
+
+def test_password_reset_with_code(app, client):
+    """Reset codes are stored hashed, verified once and limited in attempts."""
+    from app.models import VerificationCode
+
+    response = client.post(
+        '/api/mail/send-reset',
+        data=json.dumps({'email': 'test@example.com'}),
+        content_type='application/json'
+    )
+    assert response.status_code == 200
+    code = json.loads(response.data)['code']
+
+    with app.app_context():
+        stored = db.session.get(VerificationCode, 'test@example.com')
+        assert stored.code_hash != code
+
+    wrong = '000000' if code != '000000' else '111111'
+    response = client.post(
+        '/api/mail/verify-code',
+        data=json.dumps({'email': 'test@example.com', 'code': wrong}),
+        content_type='application/json'
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        '/api/auth/reset-password',
+        data=json.dumps({
+            'email': 'test@example.com',
+            'verification_code': code,
+            'new_password': 'Newpass1234'
+        }),
+        content_type='application/json'
+    )
+    assert response.status_code == 200
+
+    with app.app_context():
+        assert db.session.get(VerificationCode, 'test@example.com') is None
+        assert User.query.filter_by(email='test@example.com').one().verify_password('Newpass1234')
+
+def test_verification_code_attempts_and_expiry(app):
+    """Codes lock after too many guesses and expired codes are swept in bulk."""
+    from app.utils.verification_codes import verification_codes
+    from app.models import VerificationCode
+
+    with app.app_context():
+        app.config['VERIFICATION_CODE_MAX_ATTEMPTS'] = 2
+        verification_codes.store('test@example.com', '123456')
+        assert not verification_codes.verify('test@example.com', '654321')
+        assert not verification_codes.verify('test@example.com', '654321')
+        assert not verification_codes.verify('test@example.com', '123456')
+
+        verification_codes.store('test@example.com', '123456')
+        assert verification_codes.verify('TEST@example.com', '123456')
+
+        verification_codes.store('admin@example.com', '123456', expiry_minutes=-1)
+        assert not verification_codes.verify('admin@example.com', '123456')
+        assert verification_codes.purge_expired() == 1
+        assert VerificationCode.query.count() == 1
@@ -0,0 +1,232 @@
+import pytest
+import json
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User
+from app.models.cart import Cart, CartItem
+from app.models.medication import Category, Medication
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app with a user and some medications."""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+
+        db.session.add(User(
+            email='test@example.com',
+            password='Test1234',
+            first_name='Test',
+            last_name='User'
+        ))
+
+        category = Category(name='Painkillers', medication_type='human')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([
+            Medication(name=f'Medication {i}', price=2.0 + i, stock_quantity=50,
+                       medication_type='human', category_id=category.id)
+            for i in range(30)
+        ])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """A test client for the app."""
+    return app.test_client()
+
+@pytest.fixture
+def auth_headers(client):
+    """Get auth headers for the test user."""
+    response = client.post(
+        '/api/auth/login',
+        data=json.dumps({'email': 'test@example.com', 'password': 'Test1234'}),
+        content_type='application/json'
+    )
+    data = json.loads(response.data)
+
+    return {
+        'Authorization': f'Bearer {data["access_token"]}',
+        'Content-Type': 'application/json'
+    }
+
+def _add(client, headers, medication_id, quantity):
+    return client.post(
+        '/api/cart/add',
+        data=json.dumps({'medication_id': medication_id, 'quantity': quantity}),
+        headers=headers
+    )
+
+def test_add_to_cart_upserts_quantity(app, client, auth_headers):
+    """Adding the same medication twice updates a single cart row."""
+    assert _add(client, auth_headers, 1, 2).status_code == 200
+    assert _add(client, auth_headers, 1, 3).status_code == 200
+    assert _add(client, auth_headers, 999, 1).status_code == 404
+    assert _add(client, auth_headers, 1, 0).status_code == 400
+
+    with app.app_context():
+        item = CartItem.query.one()
+        assert item.quantity == 5
+
+    response = client.get('/api/cart/', headers=auth_headers)
+    data = json.loads(response.data)
+    assert data['items'] == [{
+        'id': item.id, 'medication_id': 1, 'name': 'Medication 0',
+        'price': 2.0, 'quantity': 5, 'subtotal': 10.0
+    }]
+    assert data['total'] == 10.0
+
+def test_one_active_cart_per_user(app, client, auth_headers):
+    """A racing first add reuses the active cart instead of creating a second one."""
+    from sqlalchemy.exc import IntegrityError
+    from app.utils.upsert import insert_if_absent
+
+    assert _add(client, auth_headers, 1, 1).status_code == 200
+
+    with app.app_context():
+        user_id = Cart.query.one().user_id
+        # What a concurrent request that missed the cart would attempt
+        insert_if_absent(Cart, {'user_id': user_id, 'status': 'active'},
+                         ['user_id'], index_where=Cart.status == 'active')
+        db.session.commit()
+        assert Cart.query.filter_by(user_id=user_id, status='active').count() == 1
+
+        db.session.add(Cart(user_id=user_id, status='active'))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+        # Completed carts don't count
+        db.session.add(Cart(user_id=user_id, status='completed'))
+        db.session.commit()
+
+def test_cart_view_is_a_single_query(app, client, auth_headers):
+    """The cart view issues one query however many items the cart holds."""
+    for medication_id in range(1, 31):
+        _add(client, auth_headers, medication_id, 1)
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if 'token_blocklist' not in statement and not statement.lstrip().startswith('SELECT users.'):
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get('/api/cart/', headers=auth_headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    assert len(json.loads(response.data)['items']) == 30
+    assert len(statements) == 1
+
+def test_update_and_remove_cart_items(app, client, auth_headers):
+    """Items can only be changed through the owner's active cart."""
+    _add(client, auth_headers, 2, 1)
+    with app.app_context():
+        item_id = CartItem.query.one().id
+
+    response = client.put(f'/api/cart/update/{item_id}', data=json.dumps({'quantity': 4}), headers=auth_headers)
+    assert response.status_code == 200
+    response = client.put('/api/cart/update/999', data=json.dumps({'quantity': 4}), headers=auth_headers)
+    assert response.status_code == 404
+
+    data = json.loads(client.get('/api/cart/', headers=auth_headers).data)
+    assert data['items'][0]['quantity'] == 4
+
+    assert client.delete(f'/api/cart/remove/{item_id}', headers=auth_headers).status_code == 200
+    assert client.delete(f'/api/cart/remove/{item_id}', headers=auth_headers).status_code == 404
+    assert json.loads(client.get('/api/cart/', headers=auth_headers).data)['items'] == []
+
+def test_checkout_converts_cart_to_order(app, client, auth_headers):
+    """Checkout prices the cart from medications, reserves stock and completes the cart."""
+    _add(client, auth_headers, 1, 2)
+    _add(client, auth_headers, 2, 3)
+
+    response = client.post(
+        '/api/orders/checkout',
+        data=json.dumps({'payment_method': 'cash', 'delivery_address': 'Kampala'}),
+        headers=auth_headers
+    )
+    assert response.status_code == 201
+    order = json.loads(response.data)['order']
+    assert order['total_amount'] == 13.0
+    assert [(item['item_id'], item['quantity'], item['price']) for item in order['items']] == [(1, 2, 2.0), (2, 3, 3.0)]
+
+    with app.app_context():
+        assert [m.stock_quantity for m in Medication.query.filter(Medication.id.in_([1, 2])).order_by(Medication.id)] == [48, 47]
+
+    # The cart is completed, so a second checkout finds nothing to convert
+    response = client.post(
+        '/api/orders/checkout',
+        data=json.dumps({'payment_method': 'cash', 'delivery_address': 'Kampala'}),
+        headers=auth_headers
+    )
+    assert response.status_code == 404
+    assert json.loads(client.get('/api/cart/', headers=auth_headers).data)['items'] == []
+
+    # Cancelling returns the stock
+    assert client.post(f'/api/orders/{order["id"]}/cancel', headers=auth_headers).status_code == 200
+    with app.app_context():
+        assert db.session.get(Medication, 1).stock_quantity == 50
+
+def test_checkout_rejects_insufficient_stock(app, client, auth_headers):
+    """A cart exceeding stock is not converted and keeps its items."""
+    _add(client, auth_headers, 1, 2)
+    _add(client, auth_headers, 3, 80)
+
+    response = client.post(
+        '/api/orders/checkout',
+        data=json.dumps({'payment_method': 'cash', 'delivery_address': 'Kampala'}),
+        headers=auth_headers
+    )
+    assert response.status_code == 409
+    shortages = json.loads(response.data)['shortages']
+    assert shortages == [{'product_id': 3, 'name': 'Medication 2', 'requested': 80, 'available': 50}]
+
+    with app.app_context():
+        assert db.session.get(Medication, 1).stock_quantity == 50
+    assert len(json.loads(client.get('/api/cart/', headers=auth_headers).data)['items']) == 2
+
+@pytest.mark.parametrize('returning', [True, False])
+def test_checkout_shortage_ignores_update_timestamps(app, client, auth_headers, monkeypatch, returning):
+    """Short medications are reported even if another writer stamped the same updated_at."""
+    from datetime import datetime
+    from app.utils import inventory
+
+    frozen = datetime(2026, 1, 1, 12, 0, 0)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return frozen
+
+    monkeypatch.setattr(inventory, 'datetime', FrozenDatetime)
+    _add(client, auth_headers, 1, 2)
+    _add(client, auth_headers, 3, 80)
+
+    with app.app_context():
+        db.session.get(Medication, 3).updated_at = frozen
+        db.session.commit()
+        monkeypatch.setattr(db.engine.dialect, 'update_returning', returning)
+
+    response = client.post(
+        '/api/orders/checkout',
+        data=json.dumps({'payment_method': 'cash', 'delivery_address': 'Kampala'}),
+        headers=auth_headers
+    )
+    assert response.status_code == 409
+    assert [shortage['product_id'] for shortage in json.loads(response.data)['shortages']] == [3]
+
+    with app.app_context():
+        assert db.session.get(Medication, 1).stock_quantity == 50
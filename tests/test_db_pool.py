@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import create_app
+from app.utils.db_pool import InstrumentedQueuePool, engine_options, pool_sizes
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app for testing."""
+    return create_app('testing')
+
+def test_pool_sized_from_gunicorn_concurrency():
+    """Pools follow the thread count and respect the provider's limit."""
+    assert pool_sizes({'GUNICORN_THREADS': 8, 'WEB_CONCURRENCY': 2}) == (9, 4)
+    assert pool_sizes({'GUNICORN_THREADS': 8, 'WEB_CONCURRENCY': 2, 'DB_MAX_CONNECTIONS': 20}) == (9, 1)
+    assert pool_sizes({'GUNICORN_THREADS': 8, 'WEB_CONCURRENCY': 4, 'DB_MAX_CONNECTIONS': 20}) == (5, 0)
+    assert pool_sizes({'GUNICORN_THREADS': 1, 'DB_POOL_SIZE': '3', 'DB_MAX_OVERFLOW': '0'}) == (3, 0)
+
+def test_engine_options_for_postgres(app):
+    """Server databases get a pre-pinged, recycled pool with a statement timeout."""
+    config = dict(app.config, SQLALCHEMY_DATABASE_URI='postgresql://db/winal', GUNICORN_THREADS=4)
+    options = engine_options(config)
+
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert (options['pool_size'], options['max_overflow']) == (5, 2)
+    assert options['pool_pre_ping'] is True
+    assert options['pool_recycle'] == 280
+    assert options['connect_args']['options'] == '-c statement_timeout=15000'
+
+    assert engine_options(dict(app.config, SQLALCHEMY_DATABASE_URI='sqlite://')) == {}
+
+def test_checkout_wait_is_measured(app, tmp_path):
+    """Checkouts and pool timeouts are reported on /metrics."""
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    with app.app_context():
+        held = engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        held.close()
+    engine.dispose()
+
+    body = app.test_client().get('/metrics').data.decode()
+    assert 'db_pool_checkout_seconds_count 2' in body
+    assert 'db_pool_timeouts_total 1' in body
@@ -0,0 +1,274 @@
+import pytest
+import json
+import time
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.email_outbox import OutboxLease, OutboxMessage
+from app.utils.email_outbox import outbox
+
+class FakeTransport:
+    """Records delivered emails; fails for recipients listed in `failing`."""
+
+    def __init__(self):
+        self.sent = []
+        self.failing = set()
+
+    def __call__(self, to, subject, html_content, text_content=None):
+        if to in self.failing:
+            raise RuntimeError('Gmail unavailable')
+        self.sent.append((to, subject))
+        return True
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app whose outbox uses a fake transport."""
+    app = create_app('testing')
+    app.config['EMAIL_OUTBOX_BACKOFF_SECONDS'] = 10
+    app.config['EMAIL_OUTBOX_MAX_ATTEMPTS'] = 2
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def transport(app):
+    fake = FakeTransport()
+    with app.app_context():
+        outbox.set_transport(fake)
+    return fake
+
+@pytest.fixture
+def client(app):
+    """A test client for the app."""
+    return app.test_client()
+
+def test_register_queues_welcome_email(app, client, transport):
+    """Registration returns without contacting Gmail; the worker sends later."""
+    response = client.post(
+        '/api/auth/register',
+        data=json.dumps({
+            'email': 'newuser@example.com',
+            'password': 'Newuser1234',
+            'first_name': 'New',
+            'last_name': 'User'
+        }),
+        content_type='application/json'
+    )
+    assert response.status_code == 201
+    assert transport.sent == []
+
+    with app.app_context():
+        message = OutboxMessage.query.one()
+        assert message.recipient == 'newuser@example.com'
+        assert message.status == 'pending'
+
+        assert outbox.drain() == 1
+        assert transport.sent == [('newuser@example.com', 'Welcome to Winal Drug Shop!')]
+        assert OutboxMessage.query.one().status == 'sent'
+        assert outbox.drain() == 0
+
+def test_failed_sends_back_off_then_give_up(app, transport):
+    """Failures are retried with exponential backoff until max attempts."""
+    transport.failing.add('down@example.com')
+
+    with app.app_context():
+        outbox.enqueue('down@example.com', 'Hello', '<p>Hello</p>')
+        outbox.enqueue('up@example.com', 'Hello', '<p>Hello</p>')
+
+        assert outbox.drain() == 2
+        failed = OutboxMessage.query.filter_by(recipient='down@example.com').one()
+        assert failed.status == 'pending'
+        assert failed.attempts == 1
+        assert failed.last_error == 'Gmail unavailable'
+        assert failed.next_attempt_at > datetime.utcnow() + timedelta(seconds=5)
+
+        # Not due yet
+        assert outbox.drain() == 0
+
+        failed.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        assert outbox.drain() == 1
+        assert OutboxMessage.query.filter_by(recipient='down@example.com').one().status == 'failed'
+
+    assert transport.sent == [('up@example.com', 'Hello')]
+
+def test_expired_lease_is_reclaimed(app, transport):
+    """A message claimed by a worker that died is delivered once its lease expires."""
+    with app.app_context():
+        message = outbox.enqueue('user@example.com', 'Hello', '<p>Hello</p>')
+        message.status = 'sending'
+        message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+        assert outbox.drain() == 1
+
+    assert transport.sent == [('user@example.com', 'Hello')]
+
+def test_sent_bodies_are_cleared_and_old_rows_purged(app, transport):
+    """Sent messages drop their bodies; sent and failed rows expire after the retention."""
+    with app.app_context():
+        message = outbox.enqueue('user@example.com', 'Reset', '<p>Code 481516</p>', 'Code 481516')
+        assert outbox.drain() == 1
+        assert (message.html_content, message.text_content) == ('', None)
+
+        old = datetime.utcnow() - timedelta(days=8)
+        db.session.add_all([
+            OutboxMessage(recipient='a@example.com', subject='Old', html_content='', status='sent',
+                          sent_at=old, created_at=old),
+            OutboxMessage(recipient='b@example.com', subject='Dead', html_content='<p>x</p>', status='failed',
+                          created_at=old),
+            OutboxMessage(recipient='c@example.com', subject='Waiting', html_content='<p>x</p>',
+                          status='pending', created_at=old, next_attempt_at=datetime.utcnow() + timedelta(hours=1)),
+        ])
+        db.session.commit()
+
+        assert outbox.purge() == 2
+        assert sorted(m.subject for m in OutboxMessage.query) == ['Reset', 'Waiting']
+
+def test_one_process_holds_the_poller_lease(app):
+    """Only the lease holder polls; another process takes over once it lapses."""
+    with app.app_context():
+        assert outbox.hold_poller_lease()
+        assert outbox.hold_poller_lease()
+
+        lease = db.session.get(OutboxLease, 'poller')
+        lease.holder = 'other-host:1'
+        db.session.commit()
+        assert not outbox.hold_poller_lease()
+
+        lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert outbox.hold_poller_lease()
+
+def test_worker_started_at_boot_delivers_leftover_mail(app, transport):
+    """Mail pending from before a restart is sent without anything new being enqueued."""
+    app.config['EMAIL_OUTBOX_WORKER'] = True
+    with app.app_context():
+        db.session.add(OutboxMessage(recipient='user@example.com', subject='Hello', html_content='<p>Hello</p>'))
+        db.session.commit()
+
+    outbox.start(app)
+    try:
+        deadline = datetime.utcnow() + timedelta(seconds=5)
+        while not transport.sent and datetime.utcnow() < deadline:
+            time.sleep(0.05)
+    finally:
+        outbox.stop(app, timeout=5)
+
+    assert transport.sent == [('user@example.com', 'Hello')]
+
+def test_gmail_service_is_built_once(monkeypatch):
+    """The Gmail client is built once and only refreshed near token expiry."""
+    from app.utils import gmail_service
+
+    class FakeCredentials:
+        token = 'token'
+        refresh_token = 'refresh'
+        expiry = datetime.utcnow() + timedelta(hours=1)
+        refreshed = 0
+
+        def refresh(self, request):
+            self.refreshed += 1
+            self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    creds = FakeCredentials()
+    builds = []
+    monkeypatch.setattr(gmail_service, '_load_credentials', lambda: creds)
+    monkeypatch.setattr(gmail_service, '_save_credentials', lambda c: None)
+    monkeypatch.setattr(gmail_service, 'build', lambda *args, **kwargs: builds.append(kwargs) or object())
+    gmail_service.reset_gmail_service()
+    try:
+        service = gmail_service.get_gmail_service()
+        assert gmail_service.get_gmail_service() is service
+        assert len(builds) == 1
+        assert builds[0]['static_discovery'] is True
+        assert creds.refreshed == 0
+
+        creds.expiry = datetime.utcnow() + timedelta(minutes=1)
+        assert gmail_service.get_gmail_service() is service
+        assert creds.refreshed == 1
+    finally:
+        gmail_service.reset_gmail_service()
+
+def test_bulk_email_batches_and_renders_once_per_group(monkeypatch):
+    """Bulk sends are grouped into batch requests with per-recipient results."""
+    from app.utils import gmail_service
+
+    class FakeBatch:
+        def __init__(self, callback):
+            self.callback = callback
+            self.requests = []
+
+        def add(self, request, request_id):
+            self.requests.append(request_id)
+
+        def execute(self, http=None):
+            for request_id in self.requests:
+                if request_id.startswith('bounce'):
+                    self.callback(request_id, None, RuntimeError('Invalid recipient'))
+                else:
+                    self.callback(request_id, {'id': f'id-{request_id}'}, None)
+
+    class FakeService:
+        def __init__(self):
+            self.batches = []
+
+        def new_batch_http_request(self, callback):
+            batch = FakeBatch(callback)
+            self.batches.append(batch)
+            return batch
+
+        def users(self):
+            return self
+
+        def messages(self):
+            return self
+
+        def send(self, userId, body):
+            return body
+
+    service = FakeService()
+    monkeypatch.setattr(gmail_service, 'get_gmail_service', lambda: service)
+    monkeypatch.setattr(gmail_service, '_thread_http', lambda: None)
+
+    rendered = []
+
+    def render(group):
+        rendered.append(group)
+        return f'<p>{group}</p>', group
+
+    recipients = [(f'user{i}@example.com', 'shipped' if i % 2 else 'delivered') for i in range(5)]
+    recipients += [('bounce@example.com', 'shipped'), ('user0@example.com', 'delivered')]
+    results = gmail_service.send_bulk_email(recipients, 'Order update', render, batch_size=2)
+
+    assert sorted(rendered) == ['delivered', 'shipped']
+    assert [len(batch.requests) for batch in service.batches] == [2, 2, 2]
+    assert len(results) == 6
+    assert results['user3@example.com'] == {'sent': True, 'message_id': 'id-user3@example.com', 'error': None}
+    assert results['bounce@example.com']['sent'] is False
+    assert results['bounce@example.com']['error'] == 'Invalid recipient'
+
+def test_order_confirmation_template():
+    """Order confirmations render every item row and escape customer input."""
+    from app.utils.email_templates import render_email, order_lines
+
+    items = [{'name': f'Item {i}', 'price': 2.5, 'quantity': 2} for i in range(500)]
+    html_content, text_content = render_email(
+        'order_confirmation',
+        customer_name='<script>',
+        order_id=7,
+        order_date='2024-01-01 10:00:00',
+        total=2500.0,
+        items=list(order_lines(items))
+    )
+
+    assert html_content.count('<tr>') == 501
+    assert '&lt;script&gt;' in html_content
+    assert '- Item 499 (Qty: 2) @ $2.50 each = $5.00' in text_content
+    assert 'Total: $2500.00' in text_content
+    assert f'{datetime.now().year} Winal Drug Shop' in text_content
@@ -0,0 +1,36 @@
+import os
+import runpy
+import pytest
+
+CONF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+@pytest.fixture(autouse=True)
+def environ(monkeypatch):
+    """Keep the variables the config exports out of the real process environment."""
+    monkeypatch.setattr(os, 'environ', dict(os.environ))
+
+def test_workers_fit_cpu_and_memory():
+    """Workers follow the CPU count unless memory runs out first."""
+    default_workers = runpy.run_path(CONF)['default_workers']
+
+    assert default_workers(1, 8192) == 3
+    assert default_workers(4, 512) == 2
+    assert default_workers(2, 128) == 1
+    assert default_workers(2, None) == 5
+
+def test_concurrency_exported_for_pool_sizing(monkeypatch):
+    """The chosen worker and thread counts reach the database pool through the environment."""
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    monkeypatch.delenv('GUNICORN_THREADS', raising=False)
+    monkeypatch.delenv('GUNICORN_WORKER_CLASS', raising=False)
+    settings = runpy.run_path(CONF)
+
+    assert (settings['workers'], settings['threads'], settings['worker_class']) == (3, 4, 'gthread')
+    assert settings['preload_app'] is True
+    assert os.environ['GUNICORN_THREADS'] == '4'
+
+    monkeypatch.delenv('GUNICORN_THREADS')
+    monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'gevent')
+    settings = runpy.run_path(CONF)
+    assert settings['preload_app'] is False
+    assert os.environ['GUNICORN_THREADS'] == '10'
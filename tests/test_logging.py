@@ -0,0 +1,97 @@
+import json
+import logging
+import subprocess
+import sys
+import pytest
+from app import create_app, db
+from app.models.user import User
+from app.utils.log import JsonFormatter, SamplingFilter
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app for testing."""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """A test client for the app."""
+    return app.test_client()
+
+def test_one_access_record_per_request(client, caplog):
+    """Each request logs one structured access record tagged with its request id."""
+    with caplog.at_level(logging.INFO, logger='app.requests'):
+        response = client.get('/api/medications/', headers={'X-Request-ID': 'abc123'})
+
+    assert response.headers['X-Request-ID'] == 'abc123'
+    records = [record for record in caplog.records if record.name == 'app.requests']
+    assert len(records) == 1
+    assert records[0].status == 200
+    assert records[0].path == '/api/medications/'
+    assert records[0].duration_ms >= 0
+
+    entry = json.loads(JsonFormatter().format(records[0]))
+    assert entry['message'] == 'GET /api/medications/ 200'
+    assert entry['method'] == 'GET'
+    assert entry['level'] == 'INFO'
+
+def test_sampling_keeps_warnings():
+    """Sampling drops routine records but never warnings or errors."""
+    sampler = SamplingFilter(rate=0)
+    info = logging.makeLogRecord({'levelno': logging.INFO})
+    warning = logging.makeLogRecord({'levelno': logging.WARNING})
+
+    assert not sampler.filter(info)
+    assert sampler.filter(warning)
+    assert SamplingFilter(rate=1).filter(info)
+
+def test_forked_child_keeps_logging():
+    """A forked worker starts its own listener, so its records still reach stdout."""
+    script = (
+        "import logging, os\n"
+        "from app.utils.log import configure_logging\n"
+        "configure_logging('INFO', 'json')\n"
+        "pid = os.fork()\n"
+        "if pid == 0:\n"
+        "    logging.getLogger('worker').info('from child')\n"
+        "    raise SystemExit(0)\n"
+        "os.waitpid(pid, 0)\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=30)
+
+    messages = [json.loads(line)['message'] for line in result.stdout.splitlines()]
+    assert messages == ['from child']
+
+def test_routes_never_log_secrets(app, client, caplog, capsys, monkeypatch):
+    """Auth and notification routes log through logging, without passwords or codes."""
+    with app.app_context():
+        db.session.add(User(email='user@example.com', password='Old-password1', first_name='A', last_name='B'))
+        db.session.commit()
+
+    monkeypatch.setenv('FLASK_ENV', 'development')
+    monkeypatch.setattr('app.utils.gmail_service.generate_verification_code', lambda: '481516')
+    monkeypatch.setattr('app.routes.mail.generate_verification_code', lambda: '481516')
+    with caplog.at_level(logging.DEBUG):
+        assert client.post('/api/auth/request-reset', json={'email': 'user@example.com'}).status_code == 200
+        assert client.post('/api/mail/send-reset', json={'email': 'user@example.com'}).status_code == 200
+        client.post('/api/auth/register', json={
+            'email': 'not-an-email', 'password': 'Hunter2-secret', 'first_name': 'A', 'last_name': 'B'
+        })
+        client.post('/api/notifications/password-reset', json={
+            'email': 'user@example.com', 'verification_code': '481516'
+        })
+        client.post('/api/auth/reset-password', json={
+            'email': 'user@example.com', 'verification_code': '481516', 'new_password': 'Hunter2-secret!'
+        })
+
+    assert capsys.readouterr().out == ''
+    assert 'Hunter2-secret' not in caplog.text
+    assert '481516' not in caplog.text
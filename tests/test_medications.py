@@ -0,0 +1,404 @@
+import pytest
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from werkzeug.http import http_date
+from app import create_app, db
+from app.models.medication import Category, Medication, MedicationImage
+from app.models.user import User
+from app.utils.cache import DatabaseBackend, RedisBackend
+from app.utils.suggest import SuggestionIndex
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app with a small catalogue."""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+
+        categories = [
+            Category(name='Antibiotics', medication_type='human'),
+            Category(name='Dewormers', medication_type='animal')
+        ]
+        db.session.add_all(categories)
+        db.session.flush()
+
+        for i in range(12):
+            medication = Medication(
+                name=f'Medication {i}',
+                description=f'Description {i}',
+                price=1.0 + i,
+                stock_quantity=10 * i,
+                medication_type=categories[i % 2].medication_type,
+                category_id=categories[i % 2].id
+            )
+            db.session.add(medication)
+            db.session.flush()
+
+            # Only every other medication has a primary image
+            db.session.add_all([
+                MedicationImage(medication_id=medication.id, image_url=f'/img/{i}-a.jpg'),
+                MedicationImage(medication_id=medication.id, image_url=f'/img/{i}-b.jpg', is_primary=i % 2 == 0)
+            ])
+
+        db.session.add(User(
+            email='admin@example.com',
+            password='Admin1234',
+            first_name='Admin',
+            last_name='User',
+            is_admin=True
+        ))
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """A test client for the app."""
+    return app.test_client()
+
+@pytest.fixture
+def admin_auth_headers(client):
+    """Get auth headers for the admin user."""
+    response = client.post(
+        '/api/auth/login',
+        data=json.dumps({
+            'email': 'admin@example.com',
+            'password': 'Admin1234'
+        }),
+        content_type='application/json'
+    )
+    data = json.loads(response.data)
+
+    return {
+        'Authorization': f'Bearer {data["access_token"]}',
+        'Content-Type': 'application/json'
+    }
+
+class FakeRedis:
+    """Dict-backed stand-in for the subset of the redis-py API the cache uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode('utf-8')
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def incr(self, key):
+        value = int(self.data.get(key, b'0')) + 1
+        self.data[key] = str(value).encode('utf-8')
+        return value
+
+@pytest.fixture
+def count_queries(app):
+    """Count the SQL statements executed while the returned list is live."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def test_get_medications_thumbnails(client):
+    """Thumbnails prefer the primary image and fall back to the first one."""
+    response = client.get('/api/medications/?per_page=12')
+
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['total'] == 12
+
+    by_name = {med['name']: med for med in data['medications']}
+    assert by_name['Medication 0']['thumbnail_url'] == '/img/0-b.jpg'
+    assert by_name['Medication 1']['thumbnail_url'] == '/img/1-a.jpg'
+    assert by_name['Medication 1']['category_name'] == 'Dewormers'
+    assert len(by_name['Medication 1']['images']) == 2
+
+def test_get_medications_query_count_is_constant(client, count_queries):
+    """Listing a page costs the same number of queries whatever its size."""
+    client.get('/api/medications/?per_page=2')
+    small_page_queries = len(count_queries)
+
+    count_queries.clear()
+    client.get('/api/medications/?per_page=12')
+    large_page_queries = len(count_queries)
+
+    assert small_page_queries == large_page_queries
+    # ETag validator, COUNT, page (with categories joined) and images
+    assert large_page_queries <= 4
+
+def test_catalogue_responses_are_cached(client, count_queries):
+    """A repeated listing request only runs the cheap ETag validator."""
+    first = client.get('/api/medications/?per_page=5&page=1')
+    assert first.headers['X-Cache'] == 'MISS'
+
+    count_queries.clear()
+    second = client.get('/api/medications/?page=1&per_page=5')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert len(count_queries) == 1
+
+def test_admin_update_invalidates_cached_medication(client, admin_auth_headers):
+    """Price changes are visible immediately after an admin update."""
+    client.get('/api/medications/1')
+    client.get('/api/medications/')
+    client.get('/api/medications/2')
+
+    response = client.put(
+        '/api/medications/1',
+        data=json.dumps({'price': 99.5}),
+        headers=admin_auth_headers
+    )
+    assert response.status_code == 200
+
+    detail = client.get('/api/medications/1')
+    assert detail.headers['X-Cache'] == 'MISS'
+    assert json.loads(detail.data)['price'] == 99.5
+
+    listing = client.get('/api/medications/')
+    assert listing.headers['X-Cache'] == 'MISS'
+
+    # Other medications keep their cached entries
+    assert client.get('/api/medications/2').headers['X-Cache'] == 'HIT'
+
+def test_redis_backend(app, client):
+    """The Redis backend works against any redis-py compatible client."""
+    from app.utils.cache import cache
+    cache.init_app(app, backend=RedisBackend(FakeRedis()))
+
+    assert client.get('/api/categories/').headers['X-Cache'] == 'MISS'
+    assert client.get('/api/categories/').headers['X-Cache'] == 'HIT'
+
+    with app.app_context():
+        cache.invalidate('categories')
+    assert client.get('/api/categories/').headers['X-Cache'] == 'MISS'
+
+def test_database_backend_shares_invalidations(app, client):
+    """An invalidation made by one worker reaches another worker's local entries."""
+    worker_a, worker_b = DatabaseBackend(), DatabaseBackend()
+    app.extensions['response_cache'] = worker_a
+    assert client.get('/api/categories/').headers['X-Cache'] == 'MISS'
+    assert client.get('/api/categories/').headers['X-Cache'] == 'HIT'
+
+    from app.utils.cache import cache
+    app.extensions['response_cache'] = worker_b
+    with app.app_context():
+        cache.invalidate('categories')
+
+    app.extensions['response_cache'] = worker_a
+    assert client.get('/api/categories/').headers['X-Cache'] == 'MISS'
+
+def test_database_backend_bumps_in_the_callers_transaction(app, client, admin_auth_headers, count_queries):
+    """Version bumps are one statement, committed or rolled back with the write."""
+    from app.utils.cache import cache
+    app.extensions['response_cache'] = DatabaseBackend()
+    assert client.get('/api/medications/1').headers['X-Cache'] == 'MISS'
+
+    with app.app_context():
+        db.session.get(Medication, 1)
+        count_queries.clear()
+        cache.invalidate('medications', *[f'medication:{med_id}' for med_id in range(1, 101)])
+        assert len(count_queries) == 1
+        db.session.rollback()
+    assert client.get('/api/medications/1').headers['X-Cache'] == 'HIT'
+
+    # Renaming a category invalidates each of its medications
+    response = client.put('/api/categories/1', data=json.dumps({'name': 'Antibacterials'}),
+                          headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert client.get('/api/medications/1').headers['X-Cache'] == 'MISS'
+
+def test_memory_cache_refused_with_several_workers(monkeypatch):
+    """The per-process cache can't be used once gunicorn runs several workers."""
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    with pytest.raises(ValueError):
+        create_app('testing')
+
+def test_conditional_get_returns_not_modified(client, admin_auth_headers):
+    """Clients revalidating an unchanged catalogue get a bodiless 304."""
+    first = client.get('/api/medications/')
+    etag = first.headers['ETag']
+
+    response = client.get('/api/medications/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    detail = client.get('/api/medications/3')
+    response = client.get('/api/medications/3', headers={'If-Modified-Since': detail.headers['Last-Modified']})
+    assert response.status_code == 304
+
+    client.put(
+        '/api/medications/3',
+        data=json.dumps({'stock_quantity': 0}),
+        headers=admin_auth_headers
+    )
+
+    response = client.get('/api/medications/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_deleted_medication_invalidates_listing(client, admin_auth_headers):
+    """Deleting a medication changes the listing's validator; no date-based 304."""
+    first = client.get('/api/medications/')
+    fetched_at = http_date(datetime.now(timezone.utc) + timedelta(seconds=1))
+    # A deletion doesn't advance max(updated_at), so lists carry no Last-Modified
+    assert 'Last-Modified' not in first.headers
+
+    assert client.delete('/api/medications/3', headers=admin_auth_headers).status_code == 200
+
+    response = client.get('/api/medications/', headers={
+        'If-None-Match': first.headers['ETag'],
+        'If-Modified-Since': fetched_at,
+    })
+    assert response.status_code == 200
+    assert 3 not in [med['id'] for med in json.loads(response.data)['medications']]
+
+    response = client.get('/api/medications/', headers={'If-Modified-Since': fetched_at})
+    assert response.status_code == 200
+
+def test_cursor_pagination_walks_whole_catalogue(client):
+    """Following next_cursor visits every medication exactly once."""
+    seen = []
+    url = '/api/medications/?limit=5'
+    while url:
+        data = json.loads(client.get(url).data)
+        assert 'total' not in data
+        seen.extend(med['id'] for med in data['medications'])
+        url = f'/api/medications/?limit=5&after={data["next_cursor"]}' if data['next_cursor'] else None
+
+    assert sorted(seen) == list(range(1, 13))
+    assert len(seen) == len(set(seen))
+
+    response = client.get('/api/medications/?after=not-a-cursor')
+    assert response.status_code == 400
+
+def test_search_rejects_cursor_mode(client):
+    """Cursor order would lose the search ranking, so q can't be combined with it."""
+    assert client.get('/api/medications/?q=medication&limit=5').status_code == 400
+    assert client.get('/api/medications/?q=medication&per_page=5').status_code == 200
+
+def test_search_ranks_prefix_and_typo_matches(app, client):
+    """Search covers name, description and category, name matches first."""
+    with app.app_context():
+        db.session.add_all([
+            Medication(name='Albendazole', description='Use after amoxicillin course', price=3.0,
+                       stock_quantity=5, medication_type='animal', category_id=2),
+            Medication(name='Amoxicillin Capsules', description='Broad spectrum', price=4.0,
+                       stock_quantity=5, medication_type='human', category_id=1)
+        ])
+        db.session.commit()
+
+    def names(query):
+        data = json.loads(client.get(f'/api/medications/?{query}').data)
+        return [med['name'] for med in data['medications']]
+
+    assert names('q=amoxicillin') == ['Amoxicillin Capsules', 'Albendazole']
+    assert names('q=amox') == ['Amoxicillin Capsules', 'Albendazole']
+    assert names('q=amoxicilin') == ['Amoxicillin Capsules', 'Albendazole']
+    assert names('q=amox+capsule') == ['Amoxicillin Capsules']
+    assert len(names('q=dewormers&per_page=20')) == 7
+
+    # Renaming a category re-indexes its medications
+    with app.app_context():
+        db.session.get(Category, 2).name = 'Anthelmintics'
+        db.session.commit()
+    assert len(names('q=anthelmintic&per_page=20')) == 7
+    assert names('q=dewormers') == []
+
+def test_suggest_serves_prefix_matches_from_memory(app, client, admin_auth_headers, count_queries):
+    """Suggestions come from the in-memory index and follow admin writes."""
+    with app.app_context():
+        app.extensions['suggestions'].rebuild()
+
+    count_queries.clear()
+    data = json.loads(client.get('/api/medications/suggest?q=medication 1&limit=5').data)
+    assert count_queries == []
+    assert [s['name'] for s in data['suggestions']] == [
+        'Medication 1', 'Medication 10', 'Medication 11'
+    ]
+    assert json.loads(client.get('/api/medications/suggest?q=dewo').data)['suggestions'] == [
+        {'type': 'category', 'id': 2, 'name': 'Dewormers'}
+    ]
+
+    response = client.post('/api/medications/', data=json.dumps({
+        'name': 'Oral Rehydration Salts', 'price': 2.0, 'medication_type': 'human', 'stock_quantity': 3
+    }), headers=admin_auth_headers)
+    new_id = json.loads(response.data)['medication_id']
+    # Any word of the name can start the match
+    assert json.loads(client.get('/api/medications/suggest?q=rehyd').data)['suggestions'] == [
+        {'type': 'medication', 'id': new_id, 'name': 'Oral Rehydration Salts'}
+    ]
+
+    client.put(f'/api/medications/{new_id}', data=json.dumps({'name': 'ORS Sachets'}), headers=admin_auth_headers)
+    assert json.loads(client.get('/api/medications/suggest?q=rehyd').data)['suggestions'] == []
+    assert len(json.loads(client.get('/api/medications/suggest?q=sach').data)['suggestions']) == 1
+
+    client.delete(f'/api/medications/{new_id}', headers=admin_auth_headers)
+    assert json.loads(client.get('/api/medications/suggest?q=sach').data)['suggestions'] == []
+
+def test_failed_suggestion_build_backs_off(app, monkeypatch):
+    """A failing build is retried after a pause, not on every lookup."""
+    index = SuggestionIndex(app, retry_interval=30)
+    attempts = []
+
+    def broken_load():
+        attempts.append(1)
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(index, '_load', broken_load)
+    with app.app_context():
+        assert index.suggest('med') == []
+        assert index.suggest('med') == []
+        assert len(attempts) == 1
+
+        # Once the pause is over the next lookup builds the index
+        monkeypatch.undo()
+        index._retry_at = 0
+        assert [s['name'] for s in index.suggest('medication 1', limit=1)] == ['Medication 1']
+
+
+def test_facets_and_filters(client, count_queries):
+    """Facet counts cover every filtered row and come from one query."""
+    client.get('/api/medications/?per_page=1')
+    count_queries.clear()
+    data = json.loads(client.get('/api/medications/?facets=true&per_page=5&count=false').data)
+    facets = data['facets']
+    # ETag validator, one statement for all facets, the page and its images
+    assert len(count_queries) == 4
+
+    assert facets['category'] == [
+        {'id': 1, 'name': 'Antibiotics', 'count': 6},
+        {'id': 2, 'name': 'Dewormers', 'count': 6}
+    ]
+    assert facets['medication_type'] == {'human': 6, 'animal': 6}
+    assert facets['prescription'] == {'prescription': 0, 'otc': 12}
+    # Prices are 1.0 to 12.0
+    assert [bucket['count'] for bucket in facets['price']] == [9, 3, 0, 0, 0]
+    assert facets['price'][1] == {'min': 10, 'max': 50, 'count': 3}
+
+    data = json.loads(client.get(
+        '/api/medications/?facets=true&min_price=3&max_price=8&in_stock=true&type=human&per_page=20'
+    ).data)
+    # Medication i (id i + 1) costs i + 1 and has 10 * i in stock; even i are human
+    assert sorted(med['id'] for med in data['medications']) == [3, 5, 7]
+    assert data['total'] == 3
+    assert data['facets']['medication_type'] == {'human': 3}
+
+    data = json.loads(client.get('/api/medications/?in_stock=false&requires_prescription=false').data)
+    assert [med['id'] for med in data['medications']] == [1]
+    assert 'facets' not in data
@@ -0,0 +1,83 @@
+import logging
+import pytest
+from app import create_app, db
+from app.models.medication import Category, Medication
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app with Server-Timing enabled."""
+    app = create_app('testing')
+    app.config['METRICS_SERVER_TIMING'] = True
+    app.extensions['metrics'].server_timing = True
+
+    with app.app_context():
+        db.create_all()
+        category = Category(name='Antibiotics', medication_type='human')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add(Medication(name='Amoxicillin', price=2.0, stock_quantity=5,
+                                  medication_type='human', category_id=category.id))
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """A test client for the app."""
+    return app.test_client()
+
+def test_metrics_endpoint_reports_latency_and_queries(client):
+    """Requests are counted per endpoint with their SQL statements."""
+    response = client.get('/api/medications/')
+    assert response.status_code == 200
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('db;dur=') and 'app;dur=' in timing and 'total;dur=' in timing
+
+    client.get('/api/medications/')
+    body = client.get('/metrics').data.decode()
+
+    endpoint = 'endpoint="medications.get_medications"'
+    assert f'http_requests_total{{{endpoint},method="GET",status="200"}} 2' in body
+    assert f'http_request_duration_seconds_count{{{endpoint},method="GET"}} 2' in body
+    assert f'http_request_duration_seconds_bucket{{{endpoint},method="GET",le="+Inf"}} 2' in body
+    assert f'db_queries_total{{{endpoint}}}' in body
+    assert '# TYPE http_request_db_queries histogram' in body
+
+def test_slow_queries_are_logged(app, client, caplog):
+    """Statements over SLOW_QUERY_MS are logged with their endpoint."""
+    app.extensions['metrics'].slow_query_seconds = 0
+
+    with caplog.at_level(logging.WARNING, logger='app.sql'):
+        client.get('/api/medications/1')
+
+    slow = [record for record in caplog.records if record.name == 'app.sql']
+    assert slow and all(record.endpoint == 'medications.get_medication' for record in slow)
+    assert 'db_slow_queries_total{endpoint="medications.get_medication"}' in client.get('/metrics').data.decode()
+
+def test_metrics_token(app, client):
+    """A configured token protects the endpoint."""
+    app.extensions['metrics'].token = 'secret'
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+def test_metrics_disabled_without_required_token(app, client):
+    """Where a token is required, /metrics is off until one is configured."""
+    app.extensions['metrics'].require_token = True
+
+    assert client.get('/metrics').status_code == 404
+    app.extensions['metrics'].token = 'secret'
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+def test_failed_statement_releases_its_timer(app):
+    """A statement that raises doesn't leave its start time on the connection."""
+    with app.app_context():
+        connection = db.session.connection()
+        with pytest.raises(Exception):
+            connection.exec_driver_sql('SELECT * FROM no_such_table')
+        assert connection.info.get('query_started') == []
+        db.session.rollback()
@@ -0,0 +1,50 @@
+import os
+import pytest
+from flask_migrate import check, upgrade
+from sqlalchemy import text
+from app import create_app, db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+@pytest.fixture
+def app():
+    """Create a Flask app with an empty database."""
+    return create_app('testing')
+
+def test_migrations_build_schema_from_empty_database(app):
+    """`flask db upgrade` alone creates every table the models define."""
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        # Exits with an error if the migrated schema differs from the models
+        check(directory=MIGRATIONS)
+        db.session.remove()
+        db.drop_all()
+
+def test_duplicate_active_carts_are_merged(app):
+    """Lines for one medication spread over several duplicate carts end up as one line."""
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision='c9e4a7d21b58')
+        db.session.execute(text(
+            "INSERT INTO users (id, email, password_hash, first_name, last_name) "
+            "VALUES (1, 'a@example.com', 'x', 'A', 'B'), (2, 'b@example.com', 'x', 'B', 'C')"))
+        db.session.execute(text(
+            "INSERT INTO medications (id, name, price, medication_type) "
+            "VALUES (1, 'Amoxicillin', 2.0, 'human'), (2, 'Ibuprofen', 1.0, 'human')"))
+        # User 1: the keeper (cart 1) lacks medication 1, which two duplicates hold
+        db.session.execute(text(
+            "INSERT INTO carts (id, user_id, status) VALUES "
+            "(1, 1, 'active'), (2, 1, 'active'), (3, 1, 'active'), (4, 2, 'active')"))
+        db.session.execute(text(
+            "INSERT INTO cart_items (cart_id, medication_id, quantity) VALUES "
+            "(1, 2, 1), (2, 1, 2), (3, 1, 3), (3, 2, 4), (4, 1, 5)"))
+        db.session.commit()
+
+        upgrade(directory=MIGRATIONS)
+
+        carts = db.session.execute(text("SELECT id, status FROM carts ORDER BY id")).all()
+        assert carts == [(1, 'active'), (2, 'abandoned'), (3, 'abandoned'), (4, 'active')]
+        lines = db.session.execute(text(
+            "SELECT cart_id, medication_id, quantity FROM cart_items ORDER BY cart_id, medication_id")).all()
+        assert lines == [(1, 1, 5), (1, 2, 5), (4, 1, 5)]
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,266 @@
+import pytest
+import json
+import time
+from datetime import datetime
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User
+from app.models.medication import Category, Medication
+from app.models.order_stats import DailyOrderStats
+from app.utils.cache import DatabaseBackend, MemoryBackend
+
+@pytest.fixture
+def app():
+    """Create and configure a Flask app with users and a few medications."""
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+
+        db.session.add(User(
+            email='test@example.com',
+            password='Test1234',
+            first_name='Test',
+            last_name='User'
+        ))
+        db.session.add(User(
+            email='admin@example.com',
+            password='Admin1234',
+            first_name='Admin',
+            last_name='User',
+            is_admin=True
+        ))
+
+        category = Category(name='Painkillers', medication_type='human')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([
+            Medication(name='Paracetamol', price=5.0, stock_quantity=20,
+                       medication_type='human', category_id=category.id),
+            Medication(name='Ibuprofen', price=7.5, stock_quantity=3,
+                       medication_type='human', category_id=category.id)
+        ])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """A test client for the app."""
+    return app.test_client()
+
+def _auth_headers(client, email, password):
+    response = client.post(
+        '/api/auth/login',
+        data=json.dumps({'email': email, 'password': password}),
+        content_type='application/json'
+    )
+    data = json.loads(response.data)
+
+    return {
+        'Authorization': f'Bearer {data["access_token"]}',
+        'Content-Type': 'application/json'
+    }
+
+@pytest.fixture
+def auth_headers(client):
+    """Get auth headers for the test user."""
+    return _auth_headers(client, 'test@example.com', 'Test1234')
+
+@pytest.fixture
+def admin_auth_headers(client):
+    """Get auth headers for the admin user."""
+    return _auth_headers(client, 'admin@example.com', 'Admin1234')
+
+def _place_order(client, headers, items):
+    return client.post(
+        '/api/orders/',
+        data=json.dumps({
+            'items': items,
+            'total_amount': sum(item['price'] * item['quantity'] for item in items),
+            'payment_method': 'cash',
+            'delivery_address': 'Kampala'
+        }),
+        headers=headers
+    )
+
+def test_dashboard_totals(app, client, auth_headers, admin_auth_headers):
+    """Dashboard statistics match with and without the daily rollup."""
+    _place_order(client, auth_headers, [{'product_id': 1, 'name': 'Paracetamol', 'price': 5.0, 'quantity': 2}])
+    response = _place_order(client, auth_headers, [{'product_id': 2, 'name': 'Ibuprofen', 'price': 7.5, 'quantity': 1}])
+    order_id = json.loads(response.data)['order']['id']
+    client.post(f'/api/orders/{order_id}/cancel', headers=auth_headers)
+
+    response = client.get('/api/admin/dashboard', headers=admin_auth_headers)
+    assert response.status_code == 200
+    live = json.loads(response.data)
+    assert live['totalProducts'] == 2
+    assert live['totalOrders'] == 2
+    assert live['totalUsers'] == 1
+    assert live['todaysRevenue'] == 10.0
+    assert live['recentActivities'][0]['description'].startswith('Order placed by Test User')
+    assert [item['name'] for item in live['lowStockItems']] == ['Ibuprofen']
+
+    app.config['DASHBOARD_USE_ROLLUP'] = True
+    rollup = json.loads(client.get('/api/admin/dashboard', headers=admin_auth_headers).data)
+    assert rollup['totalOrders'] == live['totalOrders']
+    assert rollup['todaysRevenue'] == live['todaysRevenue']
+
+    with app.app_context():
+        stats = DailyOrderStats.query.one()
+        assert (stats.order_count, stats.cancelled_count) == (2, 1)
+
+        assert DailyOrderStats.rebuild() == 1
+        stats = DailyOrderStats.query.one()
+        assert (stats.order_count, stats.cancelled_count, stats.revenue) == (2, 1, 10.0)
+
+def test_user_is_loaded_once_per_request(app, client, admin_auth_headers):
+    """Token verification and the admin check share a single User lookup."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get('/api/admin/dashboard', headers=admin_auth_headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    user_lookups = [s for s in statements if s.lstrip().startswith('SELECT users.')]
+    assert len(user_lookups) == 1
+
+def test_order_reserves_stock_at_server_prices(app, client, auth_headers):
+    """Orders use database prices, take stock atomically and return it on cancel."""
+    response = _place_order(client, auth_headers, [
+        {'product_id': 1, 'name': 'Cheap', 'price': 0.01, 'quantity': 2},
+        {'product_id': 2, 'name': 'Ibuprofen', 'price': 7.5, 'quantity': 3}
+    ])
+    assert response.status_code == 201
+    order = json.loads(response.data)['order']
+    assert order['total_amount'] == 32.5
+    assert [item['name'] for item in order['items']] == ['Paracetamol', 'Ibuprofen']
+
+    # Ibuprofen is now out of stock, so the whole order is rejected
+    response = _place_order(client, auth_headers, [
+        {'product_id': 1, 'price': 5.0, 'quantity': 1},
+        {'product_id': 2, 'price': 7.5, 'quantity': 1}
+    ])
+    assert response.status_code == 409
+    assert json.loads(response.data)['shortages'][0]['product_id'] == 2
+
+    with app.app_context():
+        assert [m.stock_quantity for m in Medication.query.order_by(Medication.id)] == [18, 0]
+
+    response = client.post(f'/api/orders/{order["id"]}/cancel', headers=auth_headers)
+    assert response.status_code == 200
+    response = client.post(f'/api/orders/{order["id"]}/cancel', headers=auth_headers)
+    assert response.status_code == 400
+
+    with app.app_context():
+        assert [m.stock_quantity for m in Medication.query.order_by(Medication.id)] == [20, 3]
+
+def test_user_cursor_includes_users_without_join_date(app, client, admin_auth_headers):
+    """Users with a NULL created_at are listed last instead of breaking the cursor."""
+    with app.app_context():
+        db.session.add_all([
+            User(email=f'user{i}@example.com', password='Test1234', first_name='U', last_name=str(i))
+            for i in range(4)
+        ])
+        db.session.commit()
+        undated = sorted(user.id for user in User.query.filter(
+            User.email.in_(['test@example.com', 'user2@example.com'])))
+        User.query.filter(User.id.in_(undated)).update({'created_at': None}, synchronize_session=False)
+        db.session.commit()
+
+    seen = []
+    url = '/api/admin/users?limit=2'
+    while url:
+        response = client.get(url, headers=admin_auth_headers)
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        seen.extend(user['id'] for user in data['users'])
+        url = f'/api/admin/users?limit=2&after={data["next_cursor"]}' if data['next_cursor'] else None
+
+    assert len(seen) == len(set(seen)) == 5
+    assert seen[-2:] == undated
+
+def test_order_rejects_unknown_products(client, auth_headers):
+    """Items must reference existing medications."""
+    response = _place_order(client, auth_headers, [{'product_id': 99, 'price': 1.0, 'quantity': 1}])
+    assert response.status_code == 400
+    assert json.loads(response.data)['missing_product_ids'] == [99]
+
+@pytest.mark.parametrize('backend', [MemoryBackend, DatabaseBackend])
+def test_large_order_uses_constant_statements(app, client, auth_headers, backend):
+    """Placing an order issues the same number of statements for 1 or 200 lines."""
+    # The database backend bumps every line's cache version in the order's transaction
+    app.extensions['response_cache'] = backend()
+    with app.app_context():
+        category_id = Category.query.first().id
+        db.session.add_all([
+            Medication(name=f'Bulk {i}', price=1.0, stock_quantity=10,
+                       medication_type='human', category_id=category_id)
+            for i in range(200)
+        ])
+        db.session.commit()
+        bulk_ids = [m.id for m in Medication.query.filter(Medication.name.like('Bulk %'))]
+        engine = db.engine
+
+    def count_statements(items):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            # Ignore the periodic JWT blocklist refresh
+            if 'token_blocklist' not in statement:
+                statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = _place_order(client, auth_headers, items)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        assert response.status_code == 201
+        return len(statements), json.loads(response.data)['order']
+
+    small, _ = count_statements([{'product_id': 1, 'price': 5.0, 'quantity': 1}])
+    assert client.get(f'/api/medications/{bulk_ids[-1]}').headers['X-Cache'] == 'MISS'
+    assert client.get(f'/api/medications/{bulk_ids[-1]}').headers['X-Cache'] == 'HIT'
+    large, order = count_statements([
+        {'product_id': medication_id, 'price': 1.0, 'quantity': 2} for medication_id in bulk_ids
+    ])
+
+    assert large == small
+    # Stock changed, so the cached detail is stale
+    assert client.get(f'/api/medications/{bulk_ids[-1]}').headers['X-Cache'] == 'MISS'
+    assert len(order['items']) == 200
+    assert order['total_amount'] == 400.0
+    assert len({item['id'] for item in order['items']}) == 200
+
+    with app.app_context():
+        assert Medication.query.filter(Medication.name.like('Bulk %'), Medication.stock_quantity == 8).count() == 200
+
+def test_dashboard_uses_utc_day_on_non_utc_host(app, client, auth_headers, admin_auth_headers, monkeypatch):
+    """Today's revenue comes from the UTC day the rollup was keyed on, whatever the host zone."""
+    # Pick a zone whose local date differs from the UTC date right now
+    zone = 'Etc/GMT-14' if datetime.utcnow().hour >= 12 else 'Etc/GMT+12'
+    monkeypatch.setenv('TZ', zone)
+    time.tzset()
+    try:
+        assert datetime.now().date() != datetime.utcnow().date()
+        _place_order(client, auth_headers, [{'product_id': 1, 'name': 'Paracetamol', 'price': 5.0, 'quantity': 2}])
+
+        live = json.loads(client.get('/api/admin/dashboard', headers=admin_auth_headers).data)
+        app.config['DASHBOARD_USE_ROLLUP'] = True
+        rollup = json.loads(client.get('/api/admin/dashboard', headers=admin_auth_headers).data)
+        assert live['todaysRevenue'] == rollup['todaysRevenue'] == 10.0
+    finally:
+        monkeypatch.undo()
+        time.tzset()